@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 import logging
-
-from requests.exceptions import HTTPError
+import sys
+from contextlib import ExitStack
 
 from ntk.ntk_parser import Parser
+from ntk.profiler import profile
 
 logging.basicConfig(
     format='%(asctime)s %(levelname)s %(message)s',
@@ -12,11 +13,22 @@ logging.basicConfig(
 )
 
 
+def run_command(args):
+    with ExitStack() as stack:
+        if getattr(args, 'profile', False):
+            stack.enter_context(profile(args.profile_output))
+        return args.func(args)
+
+
 def main():
     parser = Parser().create_parser()
     args = parser.parse_args()
+    # imported once the arguments are parsed, "ntk -h" exits before and doesn't pay for requests
+    from requests.exceptions import HTTPError
+
+    exit_code = 0
     try:
-        args.func(args)
+        exit_code = run_command(args)
     except AttributeError:
         print('Use ntk -h or --help to see available commands')
     except (TypeError, HTTPError) as e:
@@ -25,6 +37,8 @@ def main():
         logging.exception(e, exc_info=False)
     except KeyboardInterrupt:
         pass
+    # commands return 1 when files failed, e.g. push with --continue_on_error
+    sys.exit(exit_code or 0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ntk.utils import format_size, get_template_name
+
+BENCH_SIZES = [100, 1000, 10000, 50000]
+# share of the files of a generated theme by kind
+THEME_SHARES = {
+    'layouts': 0.01,
+    'configs': 0.01,
+    'locales': 0.04,
+    'templates': 0.12,
+    'partials': 0.30,
+    'sass': 0.14,
+    'scripts': 0.12,
+    'media': 0.26,
+}
+# files per directory of the nested directories, and their depth
+FANOUT = 8
+MAX_DEPTH = 4
+# sass partials imported by one compiled source, as a binary tree of imports
+SASS_GROUP_SIZE = 24
+# range of the size in bytes of a generated media file
+MEDIA_SIZES = (256, 8192)
+MEDIA_HEADERS = {
+    '.png': b'\x89PNG\r\n\x1a\n',
+    '.jpg': b'\xff\xd8\xff\xe0',
+    '.woff2': b'wOF2',
+    '.webp': b'RIFF',
+}
+WORDS = ['product', 'cart', 'checkout', 'price', 'image', 'title', 'summary', 'review', 'account', 'order']
+
+
+def get_nested_directory(kind, index, file_count):
+    """Directory of the index-th file of a kind, nested deeper as the kind holds more files."""
+    directories = [kind]
+    capacity = FANOUT
+    level = 0
+    while capacity < file_count and level < MAX_DEPTH:
+        level += 1
+        capacity *= FANOUT
+    for depth in range(level, 0, -1):
+        directories.append(f'section_{index // FANOUT ** depth % FANOUT}')
+    return '/'.join(directories)
+
+
+def get_counts(file_count):
+    counts = {kind: int(file_count * share) for kind, share in THEME_SHARES.items()}
+    counts['layouts'] = max(counts['layouts'], 1)
+    # the rounding left overs are partials
+    counts['partials'] += file_count - sum(counts.values())
+    return counts
+
+
+def _write(directory, template_name, content):
+    pathfile = os.path.join(directory, template_name)
+    os.makedirs(os.path.dirname(pathfile), exist_ok=True)
+    with open(pathfile, 'wb' if isinstance(content, bytes) else 'w') as output_file:
+        output_file.write(content)
+
+
+def _get_sentence(rng, word_count):
+    return ' '.join(rng.choice(WORDS) for _ in range(word_count)).capitalize()
+
+
+def _get_template(rng, index, partial_names):
+    includes = ''.join(
+        f'  {{% include "{rng.choice(partial_names)}" %}}\n' for _ in range(rng.randint(1, 4)) if partial_names)
+    loops = ''.join(
+        f'  {{% for {word} in {word}s %}}\n'
+        f'    {{% if {word}.visible %}}<div class="{word}">{{{{ {word}.{rng.choice(WORDS)}|default:"" }}}}</div>'
+        f'{{% else %}}{{% trans "{_get_sentence(rng, 3)}" %}}{{% endif %}}\n'
+        f'  {{% empty %}}<p>{_get_sentence(rng, 6)}</p>\n'
+        f'  {{% endfor %}}\n'
+        for word in rng.sample(WORDS, rng.randint(2, 5)))
+    return (
+        f'{{% extends "layouts/base_0.html" %}}\n{{% load i18n %}}\n'
+        f'{{% block title %}}{_get_sentence(rng, 4)} {index}{{% endblock %}}\n'
+        f'{{% block content %}}\n{includes}{loops}{{% endblock %}}\n')
+
+
+def _get_partial(rng, index):
+    word = rng.choice(WORDS)
+    return (
+        f'{{% load i18n %}}\n<section class="{word}-{index}">\n'
+        f'  {{% if {word} %}}<h2>{{{{ {word}.title }}}}</h2>{{% endif %}}\n'
+        f'  <p>{{% trans "{_get_sentence(rng, 8)}" %}}</p>\n</section>\n')
+
+
+def _get_sass_partial(rng, group, index, children):
+    imports = ''.join(f'@import "part_{child}";\n' for child in children)
+    color = f'#{rng.randrange(0x1000000):06x}'
+    return (
+        f'{imports}$color-{group}-{index}: {color};\n'
+        f'.block-{group}-{index} {{\n  color: $color-{group}-{index};\n'
+        f'  &__title {{ margin: {rng.randint(0, 32)}px; }}\n'
+        f'  .{rng.choice(WORDS)} {{ padding: {rng.randint(0, 16)}px {rng.randint(0, 16)}px; }}\n}}\n')
+
+
+def generate_theme(directory, file_count, seed=0):
+    """
+    Write a synthetic theme of about `file_count` files into `directory`, with the proportions of a large
+    theme: nested templates and partials, locales and configs, sass sources importing trees of partials,
+    css and js assets and binary media. The same seed writes the same theme. Returns the count by kind.
+    """
+    rng = random.Random(seed)
+    counts = get_counts(file_count)
+
+    for index in range(counts['layouts']):
+        _write(directory, f'layouts/base_{index}.html', (
+            '{% load i18n %}<!DOCTYPE html>\n<html>\n<head><title>{% block title %}{% endblock %}</title>\n'
+            '<link rel="stylesheet" href="{% static "pages/page_0.css" %}"></head>\n'
+            '<body>{% block content %}{% endblock %}</body>\n</html>\n'))
+
+    for index in range(counts['configs']):
+        settings = {f'{word}_{key}': rng.choice([True, False, rng.randint(0, 100), _get_sentence(rng, 3)])
+                    for key, word in enumerate(rng.sample(WORDS, 6))}
+        _write(directory, f'configs/settings_{index}.json', json.dumps({'current': settings}, indent=2))
+
+    for index in range(counts['locales']):
+        messages = {word: {f'{word}_{key}': _get_sentence(rng, 5) for key in range(20)} for word in WORDS}
+        _write(directory, f'locales/locale_{index}.json', json.dumps(messages, indent=2, ensure_ascii=False))
+
+    partial_names = []
+    for index in range(counts['partials']):
+        template_name = f'{get_nested_directory("partials", index, counts["partials"])}/partial_{index}.html'
+        partial_names.append(template_name)
+        _write(directory, template_name, _get_partial(rng, index))
+
+    for index in range(counts['templates']):
+        template_name = f'{get_nested_directory("templates", index, counts["templates"])}/template_{index}.html'
+        _write(directory, template_name, _get_template(rng, index, partial_names))
+
+    # each compiled source imports the root of its group, each partial imports its children in the group
+    group_count = max(1, counts['sass'] // (SASS_GROUP_SIZE + 1)) if counts['sass'] else 0
+    part_count = counts['sass'] - group_count
+    for group in range(group_count):
+        size = part_count // group_count + (1 if group < part_count % group_count else 0)
+        for index in range(size):
+            children = [child for child in [2 * index + 1, 2 * index + 2] if child < size]
+            _write(directory, f'sass/modules/group_{group}/_part_{index}.scss',
+                   _get_sass_partial(rng, group, index, children))
+        root_import = f'@import "../modules/group_{group}/part_0";\n' if size else ''
+        _write(directory, f'sass/pages/page_{group}.scss', f'{root_import}body {{ margin: 0; }}\n')
+
+    for index in range(counts['scripts']):
+        word = rng.choice(WORDS)
+        if index % 2:
+            _write(directory, f'assets/js/script_{index}.js', (
+                f'(function () {{\n  var {word}s = document.querySelectorAll(".{word}");\n'
+                f'  for (var i = 0; i < {word}s.length; i++) {{\n'
+                f'    {word}s[i].dataset.index = i + {index};\n  }}\n}})();\n'))
+        else:
+            _write(directory, f'assets/css/style_{index}.css', f'.{word}-{index} {{ display: block; }}\n')
+
+    extensions = list(MEDIA_HEADERS)
+    for index in range(counts['media']):
+        extension = extensions[index % len(extensions)]
+        media_directory = get_nested_directory('assets/media', index, counts['media'])
+        _write(directory, f'{media_directory}/media_{index}{extension}',
+               MEDIA_HEADERS[extension] + rng.randbytes(rng.randint(*MEDIA_SIZES)))
+    return counts
+
+
+@contextmanager
+def _in_directory(directory):
+    cwd = os.getcwd()
+    os.chdir(directory)
+    # the commands log every file, only the results of the benchmarks are of interest
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+        os.chdir(cwd)
+
+
+def _timed(results, name, func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    results[name] = time.perf_counter() - start
+    return value
+
+
+def run_benchmark(directory, file_count, seed=0):
+    """
+    Time the steps of push, pull and watch which don't touch the network on a generated theme of `file_count`
+    files, the pull writes are served by a local mirror of the theme. Returns the seconds of each step.
+    """
+    from ntk.command import Command
+    from ntk.hashing import FileHasher
+    from ntk.local import LocalSession
+    from ntk.objects import ObjectStore
+
+    theme_directory = os.path.join(directory, 'mirror', '1')
+    results = {}
+    _timed(results, 'generate', generate_theme, theme_directory, file_count, seed)
+
+    with _in_directory(theme_directory):
+        command = Command()
+        command.config.sass_output_style = 'nested'
+        pathfiles = _timed(results, 'discovery', command._get_accept_files, [])
+        _timed(results, 'template names', lambda: [get_template_name(pathfile) for pathfile in pathfiles])
+        _timed(results, 'sass', command._compile_sass)
+
+        # older than the racy interval of the hash cache, like the files of a theme edited a while ago
+        mtime = time.time() - 3600
+        for pathfile in pathfiles:
+            os.utime(pathfile, (mtime, mtime))
+        hash_cache = os.path.join(directory, 'hashes.json')
+        hasher = FileHasher(cache_path=hash_cache)
+        _timed(results, 'hash', hasher.digests, pathfiles)
+        hasher.save()
+        _timed(results, 'hash cached', FileHasher(cache_path=hash_cache).digests, pathfiles)
+
+    # the listing a pull receives, read from the mirror beforehand
+    mirror = Path(os.path.join(directory, 'mirror')).as_uri()
+    templates = LocalSession(os.path.join(directory, 'mirror'))._get_templates(1)
+    pull_directory = os.path.join(directory, 'pull')
+    os.makedirs(pull_directory)
+    with _in_directory(pull_directory):
+        command = Command()
+        command.gateway.store = mirror
+        command.object_store = ObjectStore(directory=os.path.join(directory, 'objects'))
+
+        def save_templates():
+            for template in templates:
+                command._save_template(template)
+        _timed(results, 'pull writes', save_templates)
+        # the files hold the same content, none is written again
+        _timed(results, 'pull unchanged', save_templates)
+    return results
+
+
+def run_benchmarks(sizes=BENCH_SIZES, directory=None, seed=0):
+    """Run the benchmarks for each theme size, the themes are kept in `directory` when given."""
+    results = {}
+    for size in sizes:
+        if directory:
+            size_directory = os.path.join(directory, str(size))
+            if os.path.exists(size_directory):
+                shutil.rmtree(size_directory)
+            results[size] = run_benchmark(size_directory, size, seed)
+            continue
+        with tempfile.TemporaryDirectory() as tmp_directory:
+            results[size] = run_benchmark(tmp_directory, size, seed)
+    return results
+
+
+def format_results(results):
+    """Lines of a table of the seconds of each step by theme size, with the files per second."""
+    sizes = list(results)
+    steps = list(results[sizes[0]]) if sizes else []
+    lines = [f'{"step":<16}' + ''.join(f'{f"{size} files":>24}' for size in sizes)]
+    for step in steps:
+        cells = []
+        for size in sizes:
+            elapsed = results[size][step]
+            cells.append(f'{elapsed:>9.3f}s {size / elapsed if elapsed else 0:>9.0f}/s')
+        lines.append(f'{step:<16}' + ''.join(f'{cell:>24}' for cell in cells))
+    return lines
+
+
+def get_theme_size(directory):
+    return format_size(sum(
+        os.path.getsize(os.path.join(root, filename)) for root, _, filenames in os.walk(directory)
+        for filename in filenames))
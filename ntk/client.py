@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+from ntk.conf import DAEMON_SOCKET
+
+ACTIONS = ['push', 'pull', 'delete', 'ping', 'stop']
+
+
+def send_request(action, filenames=(), socket_path=DAEMON_SOCKET):
+    """Send one request to the daemon and return its response, raises OSError when it isn't running."""
+    # absolute paths, the client may run from another directory than the daemon
+    request = {'action': action, 'filenames': [os.path.abspath(filename) for filename in filenames]}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with client.makefile('r', encoding='utf-8') as response_file:
+            return json.loads(response_file.readline())
+
+
+def main(argv=None):
+    # only the standard library is imported, a request takes milliseconds, e.g. for editor plugins on every save
+    parser = argparse.ArgumentParser(prog='ntk-client', description='Send a request to a running ntk daemon.')
+    parser.add_argument('action', choices=ACTIONS)
+    parser.add_argument('filenames', nargs='*')
+    parser.add_argument('--socket', dest='socket_path', default=DAEMON_SOCKET, help='Path of the daemon socket')
+    args = parser.parse_args(argv)
+
+    try:
+        response = send_request(args.action, args.filenames, socket_path=args.socket_path)
+    except (OSError, ValueError) as error:
+        print(f'ntk daemon is not running on {args.socket_path}, start it with "ntk daemon" -> {error}',
+              file=sys.stderr)
+        sys.exit(2)
+
+    for line in response.get('log', []):
+        print(line, file=sys.stderr)
+    if response.get('error'):
+        print(f'ERROR {response["error"]}', file=sys.stderr)
+    for template_name, reason in response.get('failed', {}).items():
+        print(f'ERROR {template_name} failed -> {reason}', file=sys.stderr)
+    sys.exit(0 if response.get('ok') else 1)
+
+
+if __name__ == '__main__':
+    main()
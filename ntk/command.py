@@ -1,19 +1,32 @@
-import asyncio
 import glob
+import hashlib
+import json
 import logging
 import os
 import time
-import sass
-
-from watchfiles import awatch, Change
+from concurrent.futures import ThreadPoolExecutor
 
+from ntk.bench import BENCH_SIZES, format_results, generate_theme, get_theme_size, run_benchmarks
 from ntk.conf import (
-    Config, CONTENT_FILE_EXTENSIONS, MEDIA_FILE_EXTENSIONS, GLOB_PATTERN, SASS_DESTINATION, SASS_SOURCE,
-    SASS_EXTENSIONS,
+    Config, CONFIG_FILE, CONTENT_FILE_EXTENSIONS, MEDIA_FILE_EXTENSIONS, GLOB_PATTERN, SASS_DESTINATION, SASS_SOURCE,
+    SASS_EXTENSIONS, SASS_SOURCE_EXTENSIONS, DEFAULT_WORKERS, JOURNAL_DIRECTORY, NTK_DIRECTORY, dump_configs,
+    load_configs,
 )
 from ntk.decorator import parser_config
-from ntk.gateway import Gateway
-from ntk.utils import get_template_name, progress_bar
+from ntk.gateway import create_session, Gateway, is_unreachable
+from ntk.hashing import FileHasher, hash_content
+from ntk.journal import Journal
+from ntk.images import ImageOptimizer
+from ntk.metrics import Metrics
+from ntk.minify import Minifier
+from ntk.objects import ObjectStore
+from ntk.offline import OfflineQueue
+from ntk.retry import RetryQueue
+from ntk.scheduler import schedule_uploads
+from ntk.trace import Tracer
+from ntk.progress import Progress, progress_bar
+from ntk.utils import atomic_write, format_size, get_file_state, get_template_name, RateLimiter
+from ntk.validation import validate_files
 
 
 logging.basicConfig(
@@ -23,133 +36,807 @@ logging.basicConfig(
 )
 logging.getLogger('watchfiles').setLevel(logging.WARNING)
 
+# pause between two uploads to the same store to stay below its rate limit
+UPLOAD_INTERVAL = 0.07
+# minimum pause between the starts of two deletes, whatever the number of workers
+DELETE_INTERVAL = 0.07
+# minimum pause between the starts of two fetches of a pull with filenames, whatever the number of workers
+FETCH_INTERVAL = 0.07
+# a pull of more filenames lists the whole theme once instead of fetching the files one by one
+PULL_LISTING_THRESHOLD = 20
+# seconds between two checks of watch whether an unreachable store is back
+OFFLINE_PROBE_INTERVAL = 5
+
 
 class Command:
     def __init__(self):
         self.config = Config()
+        self.metrics = Metrics()
         self.gateway = Gateway(store=self.config.store, apikey=self.config.apikey)
+        self.gateway.metrics = self.metrics
+        self.minifier = None
+        self.image_optimizer = None
+        # optimized images uploaded instead of the local files, by template name
+        self.optimized_images = {}
+        self.hasher = FileHasher()
+        self.object_store = ObjectStore()
+        # digest of the files pushed by watch and of the css files written by the sass step, by template name
+        self.pushed_digests = {}
+        # accepted files kept by the daemon between requests, None globs them on every call
+        self.file_index = None
+        # changes of watch queued while the store is unreachable, None raises the network errors
+        self.offline_queue = None
+        self.validate = True
+        # error of each file left out by the last validation, by template name
+        self.invalid_templates = {}
 
     def _get_accept_files(self, template_names):
+        filenames = list(map(lambda x: os.path.abspath(x), template_names or []))
+        if filenames and self.file_index is not None and set(filenames) <= self.file_index:
+            # the index may still hold deleted files
+            return [filename for filename in filenames if os.path.exists(filename)]
+
         files = []
         glob_list = map(lambda x: os.path.abspath(x), GLOB_PATTERN)
-        for pattern in glob_list:
-            files.extend(glob.glob(pattern, recursive=True))
+        with self.metrics.timer('discovery'):
+            for pattern in glob_list:
+                files.extend(glob.glob(pattern, recursive=True))
+        if self.file_index is not None:
+            self.file_index = set(files)
 
         if template_names:
-            filenames = list(map(lambda x: os.path.abspath(x), template_names))
             template_names = list(filter(lambda x: x in files, filenames))
         else:
             template_names = files
 
         return template_names
 
-    def _handle_files_change(self, changes):
+    def _handle_files_change(self, changes, retry_queue=None):
+        from watchfiles import Change
+
         valid_extensions = tuple(CONTENT_FILE_EXTENSIONS + MEDIA_FILE_EXTENSIONS + SASS_EXTENSIONS)
         for event_type, pathfile in changes:
             if not pathfile.endswith(valid_extensions):
                 continue
             template_name = get_template_name(pathfile)
+            if template_name.split('/')[0] == NTK_DIRECTORY:
+                # the caches of ntk hold css, js, json and images too, they are not part of the theme
+                continue
+            if event_type in [Change.added, Change.modified] and self._is_pushed(template_name):
+                continue
             if event_type in [Change.added, Change.modified]:
                 logging.info(f'[{self.config.env}] {event_type.name.title()} {template_name}')
-                self._push_templates([template_name], compile_sass=True)
+                if self.offline_queue:
+                    # still offline, pushed with the queue once the store is back
+                    self.offline_queue.add('upload', [template_name])
+                elif not self._push_templates([template_name], compile_sass=True, retry_queue=retry_queue):
+                    self.pushed_digests.pop(template_name, None)
             elif event_type == Change.deleted:
                 logging.info(f'[{self.config.env}] {event_type.name.title()} {template_name}')
-                self._delete_templates([template_name])
+                # pushed again when it is restored with the same content
+                self.pushed_digests.pop(template_name, None)
+                if self.offline_queue:
+                    self.offline_queue.add('delete', [template_name])
+                else:
+                    self._delete_templates([template_name], retry_queue=retry_queue)
+
+        self._report_optimizers()
+        self._retry_watch_failures(retry_queue)
+
+    def _retry_watch_failures(self, retry_queue):
+        if retry_queue and retry_queue.failures:
+            self._retry_failures(retry_queue)
+            self._report_failures(retry_queue)
+            # the next changes of the failed files are pushed again
+            for _, template_name in retry_queue.failures:
+                self.pushed_digests.pop(template_name, None)
+            retry_queue.clear()
+
+    def _queue_offline(self, action, template_names, error):
+        """Queue the changes which couldn't reach the store, until `_flush_offline_queue` finds it back."""
+        self.offline_queue.add(action, [get_template_name(template_name) for template_name in template_names])
+        logging.warning(
+            f'[{self.config.env}] {self.config.store} is unreachable, {len(self.offline_queue)} changes are queued '
+            f'until it is back -> {error}')
 
-    def _push_templates(self, template_names, compile_sass=False):
+    def _is_offline_error(self, error):
+        return self.offline_queue is not None and is_unreachable(error)
+
+    def _flush_offline_queue(self, retry_queue=None):
+        """
+        Push the changes queued while the store was unreachable in one batch once it answers again, returns
+        False while it is still unreachable.
+        """
+        if not self.offline_queue:
+            return True
+        if not self.gateway.is_reachable():
+            return False
+
+        pending = self.offline_queue.take()
+        logging.info(f'[{self.config.env}] {self.config.store} is back, pushing {len(pending)} queued changes')
+        uploads = [template_name for template_name, action in pending.items() if action == 'upload']
+        deletes = [template_name for template_name, action in pending.items() if action == 'delete']
+        if uploads and not self._push_templates(uploads, compile_sass=True, retry_queue=retry_queue):
+            for template_name in uploads:
+                self.pushed_digests.pop(template_name, None)
+        if deletes:
+            self._delete_templates(deletes, retry_queue=retry_queue)
+        # the changes which lost the store again were queued back
+        self.offline_queue.save()
+        self._report_optimizers()
+        self._retry_watch_failures(retry_queue)
+        return not self.offline_queue
+
+    def _is_pushed(self, template_name):
+        """
+        Whether the content of the file was already pushed, e.g. saved without changes or a css output of the
+        sass step pushed with its source. Records the content as pushed otherwise.
+        """
+        try:
+            digest, _ = self.hasher.digest(template_name)
+        except OSError:
+            return False
+        if self.pushed_digests.get(template_name) == digest:
+            return True
+        self.pushed_digests[template_name] = digest
+        return False
+
+    def _push_templates(self, template_names, compile_sass=False, journal=None, retry_queue=None):
+        """
+        Upload templates, returns False when an upload failed and the remaining files were not pushed.
+        With a retry queue the failed uploads are queued and the remaining files are pushed.
+        """
         template_names = self._get_accept_files(template_names)
+        css_files = []
+        if compile_sass and any(
+                get_template_name(template_name).split('/')[0] == SASS_SOURCE for template_name in template_names):
+            # upload the css outputs which changed together with their sources
+            css_files = [os.path.abspath(css_file) for css_file in self._compile_sass()]
+            template_names += [css_file for css_file in css_files if css_file not in template_names]
+        if self._validate_templates(template_names):
+            if retry_queue is None:
+                logging.error(f'[{self.config.env}] Nothing was uploaded, fix the invalid files first')
+                return False
+            template_names = [
+                template_name for template_name in template_names
+                if get_template_name(template_name) not in self.invalid_templates
+            ]
         template_count = len(template_names)
 
         logging.info(f'[{self.config.env}] Connecting to {self.config.store}')
         logging.info(f'[{self.config.env}] Uploading {template_count} files to theme id {self.config.theme_id}')
 
-        for template_name in template_names:
-            if compile_sass and get_template_name(template_name).split('/')[0] == SASS_SOURCE:
-                self._compile_sass()
-
-        for template_name in progress_bar(
-                template_names, prefix=f'[{self.config.env}] Progress:', suffix='Complete', length=50):
+        if journal and journal.completed:
+            template_names = [
+                template_name for template_name in template_names
+                if not journal.is_completed(get_template_name(template_name), **get_file_state(template_name))
+            ]
+            logging.info(
+                f'[{self.config.env}] Resuming, {template_count - len(template_names)} files were already uploaded')
 
+        template_names = schedule_uploads(template_names)
+        self._optimize_images(template_names)
+        for index, template_name in enumerate(progress_bar(
+                template_names, prefix=f'[{self.config.env}] Progress:', suffix='Complete', length=50,
+                metrics=self.metrics)):
             relative_pathfile = get_template_name(template_name)
-            template_name = get_template_name(template_name)
+            if journal:
+                # stat before reading, a change while uploading is pushed again by the next resume
+                state = get_file_state(relative_pathfile)
 
-            files = {}
-            content = ''
+            try:
+                reason = self._upload_template(relative_pathfile)
+            except Exception as error:
+                if self._is_offline_error(error):
+                    # the remaining files would fail the same way
+                    self._queue_offline('upload', template_names[index:], error)
+                    return True
+                if retry_queue is None:
+                    raise
+                reason = f'{error}'
+
+            if reason:
+                if retry_queue is None:
+                    return False
+                retry_queue.add('upload', relative_pathfile, reason)
+                continue
+            if journal:
+                journal.record(relative_pathfile, **state)
+            if template_name in css_files:
+                # recorded once it is on the store, so the watch event of a css file which failed pushes it again
+                self.pushed_digests[relative_pathfile], _ = self.hasher.digest(relative_pathfile)
+        return True
+
+    def _upload_template(self, relative_pathfile):
+        """Upload one template, returns the reason of the failure or None."""
+        files = {}
+        content = ''
+        with self.metrics.timer('io', 'read', template=relative_pathfile):
             if relative_pathfile.endswith(tuple(MEDIA_FILE_EXTENSIONS)):
-                files = {'file': (relative_pathfile, open(relative_pathfile, 'rb'))}
+                upload_pathfile = self.optimized_images.get(relative_pathfile, relative_pathfile)
+                files = {'file': (relative_pathfile, open(upload_pathfile, 'rb'))}
             else:
                 with open(relative_pathfile, "r", encoding="utf-8") as f:
                     content = f.read()
                     f.close()
 
-            response = self.gateway.create_or_update_template(
-                theme_id=self.config.theme_id, template_name=relative_pathfile, content=content, files=files)
+        content = self._minify(relative_pathfile, content)
+        response = self.gateway.create_or_update_template(
+            theme_id=self.config.theme_id, template_name=relative_pathfile, content=content, files=files)
 
-            time.sleep(0.07)
-            if not response.ok:
-                return
+        time.sleep(UPLOAD_INTERVAL)
+        return None if response.ok else f'status {response.status_code}'
+
+    def _validate_templates(self, template_names):
+        """
+        Check the json and html files before any request, so all the invalid files are reported at once
+        instead of being rejected one by one by the store. Returns the error of each invalid file.
+        """
+        self.invalid_templates = {}
+        if not self.validate:
+            return self.invalid_templates
+        with self.metrics.timer('validate'):
+            self.invalid_templates = validate_files(
+                [get_template_name(template_name) for template_name in template_names])
+        if self.invalid_templates:
+            logging.error(f'[{self.config.env}] {len(self.invalid_templates)} files are invalid:')
+            for template_name, error in sorted(self.invalid_templates.items()):
+                logging.error(f'[{self.config.env}] \t{template_name} -> {error}')
+        return self.invalid_templates
+
+    def _set_optimizers(self, parser):
+        self.validate = not getattr(parser, 'skip_validation', False)
+        if getattr(parser, 'minify', False):
+            self.minifier = Minifier()
+        if getattr(parser, 'optimize_images', False) or getattr(parser, 'image_quality', None):
+            quality = getattr(parser, 'image_quality', None)
+            if quality is not None and not 1 <= quality <= 95:
+                raise TypeError(f'[{parser.env}] argument --image_quality must be between 1 and 95.')
+            self.image_optimizer = ImageOptimizer(quality=quality)
+
+    def _optimize_images(self, template_names):
+        if not self.image_optimizer:
+            return
+        with self.metrics.timer('images', 'optimize'):
+            self.optimized_images.update(
+                self.image_optimizer.optimize([get_template_name(template_name) for template_name in template_names]))
+
+    def _minify(self, template_name, content):
+        if not self.minifier or not self.minifier.can_minify(template_name):
+            return content
+        with self.metrics.timer('minify', template=template_name):
+            return self.minifier.minify(template_name, content)
+
+    def _report_optimizers(self):
+        for optimizer in [self.minifier, self.image_optimizer]:
+            if optimizer:
+                for line in optimizer.report():
+                    logging.info(f'[{self.config.env}] {line}')
+
+    def _get_environments(self, parser):
+        if getattr(parser, 'all_envs', False):
+            environments = list(load_configs(CONFIG_FILE))
+            if not environments:
+                raise TypeError(f'[{parser.env}] argument --all_envs requires environments in config.yml.')
+            return environments
+        return [env.strip() for env in parser.env.split(',') if env.strip()]
+
+    def _read_templates(self, template_names):
+        """Read the files to upload into memory, so they can be pushed to several environments."""
+        templates = []
+        self._optimize_images(template_names)
+        for template_name in template_names:
+            relative_pathfile = get_template_name(template_name)
+            files = {}
+            content = ''
+            with self.metrics.timer('io', 'read', template=relative_pathfile):
+                if relative_pathfile.endswith(tuple(MEDIA_FILE_EXTENSIONS)):
+                    upload_pathfile = self.optimized_images.get(relative_pathfile, relative_pathfile)
+                    with open(upload_pathfile, 'rb') as media_file:
+                        data = media_file.read()
+                    files = {'file': (relative_pathfile, data)}
+                else:
+                    with open(relative_pathfile, "r", encoding="utf-8") as template_file:
+                        content = template_file.read()
+            if not files:
+                content = self._minify(relative_pathfile, content)
+                data = content.encode('utf-8')
+            templates.append({
+                'name': relative_pathfile,
+                'content': content,
+                'files': files,
+                'size': len(data),
+            })
+        return templates
+
+    def _upload_templates(self, config, gateway, templates, remote_only_templates=(), retry_queue=None):
+        """
+        Upload templates to the theme of one environment, then delete its `remote_only_templates` when every
+        upload succeeded. Stops on the first failure without a retry queue, with a retry queue the failures are
+        queued, the remaining files are pushed and the failed ones retried.
+        """
+        result = {'env': config.env, 'theme_id': config.theme_id, 'uploaded': 0, 'deleted': 0, 'failed': {}}
+        templates_by_name = {template['name']: template for template in templates}
+        rate_limiter = RateLimiter(DELETE_INTERVAL)
 
-    def _pull_templates(self, template_names):
+        def upload(template_name):
+            template = templates_by_name[template_name]
+            response = gateway.create_or_update_template(
+                theme_id=config.theme_id, template_name=template_name, content=template['content'],
+                files=template['files'])
+            time.sleep(UPLOAD_INTERVAL)
+            return None if response.ok else f'status {response.status_code}'
+
+        def delete(template_name):
+            rate_limiter.wait()
+            response = gateway.delete_template(theme_id=config.theme_id, template_name=template_name)
+            return None if response.ok else f'status {response.status_code}'
+
+        actions = {'upload': upload, 'delete': delete}
+
+        def run(action, template_names):
+            """Returns the number of files which succeeded."""
+            succeeded = 0
+            for template_name in template_names:
+                try:
+                    reason = actions[action](template_name)
+                except Exception as error:
+                    # one unreachable store must not stop the other environments
+                    reason = f'{error}'
+                if not reason:
+                    succeeded += 1
+                elif retry_queue is None:
+                    result['failed'][template_name] = reason
+                    break
+                else:
+                    retry_queue.add(action, template_name, reason)
+            if retry_queue and retry_queue.failures:
+                queued = len(retry_queue.failures)
+                retry_queue.retry(actions, env=config.env)
+                succeeded += queued - len(retry_queue.failures)
+                result['failed'] = {name: reason for (_, name), reason in retry_queue.failures.items()}
+            return succeeded
+
+        start = time.perf_counter()
+        result['uploaded'] = run('upload', list(templates_by_name))
+        # never prune after a failed push, the theme would miss both the old and the new files
+        if remote_only_templates and not result['failed']:
+            result['deleted'] = run('delete', remote_only_templates)
+        result['elapsed'] = time.perf_counter() - start
+        return result
+
+    def _push_environments(self, parser, environments):
+        targets = []
+        for env in environments:
+            config = Config()
+            config.env = env
+            config.read_config()
+            if getattr(parser, 'sass_output_style', None):
+                config.sass_output_style = parser.sass_output_style
+            config.save(write_file=False)
+
+            gateway = Gateway(store=config.store, apikey=config.apikey)
+            gateway.metrics = self.metrics
+            if getattr(parser, 'http2', False):
+                gateway.session = create_session(http2=True)
+            targets.append((config, gateway))
+
+        self.config.env = ','.join(environments)
+        # the environments are configured here instead of by parser_config, which traces a single one
+        if getattr(parser, 'trace', None):
+            self.metrics.tracer = Tracer()
+        remote_only_templates = {}
+        if getattr(parser, 'prune', False):
+            # the files to delete from every environment are listed before anything is pushed
+            for config, gateway in targets:
+                remote_only_templates[config.env] = self._get_remote_only_templates(config, gateway)
+            if getattr(parser, 'dry_run', False):
+                return 0
+        template_names = self._get_accept_files(parser.filenames or [])
+        if self._validate_templates(template_names):
+            if not getattr(parser, 'continue_on_error', False):
+                raise TypeError(f'[{self.config.env}] Nothing was uploaded, fix the invalid files first.')
+            template_names = [
+                template_name for template_name in template_names
+                if get_template_name(template_name) not in self.invalid_templates
+            ]
+        templates = self._read_templates(schedule_uploads(template_names))
+        size = sum(template['size'] for template in templates)
+        logging.info(
+            f'[{self.config.env}] Uploading {len(templates)} files ({format_size(size)}) '
+            f'to {len(targets)} environments')
+
+        continue_on_error = getattr(parser, 'continue_on_error', False)
+        # one worker per environment, each uploads at its own pace to its own store and retries its own failures
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            results = list(executor.map(
+                lambda target: self._upload_templates(
+                    *target, templates, remote_only_templates=remote_only_templates.get(target[0].env, []),
+                    retry_queue=RetryQueue() if continue_on_error else None),
+                targets))
+
+        for result in results:
+            summary = (
+                f'[{result["env"]}] Uploaded {result["uploaded"]} of {len(templates)} files to theme id '
+                f'{result["theme_id"]} in {result["elapsed"]:.2f}s')
+            if remote_only_templates.get(result['env']):
+                summary += f', pruned {result["deleted"]} of {len(remote_only_templates[result["env"]])} files'
+            if result['failed']:
+                failed = ', '.join(
+                    f'{template_name} ({reason})' for template_name, reason in result['failed'].items())
+                logging.error(f'{summary}, failed on {failed}')
+            else:
+                logging.info(summary)
+        self._report_optimizers()
+        self._report_metrics(parser)
+        return 1 if self.invalid_templates or any(result['failed'] for result in results) else 0
+
+    def _get_local_digests(self, template_names):
+        """Hash the local files changed since they were last hashed, returns the digest and size of each."""
+        with self.metrics.timer('io', 'hash'):
+            local_digests = self.hasher.digests(template_names)
+        self.hasher.save()
+        return local_digests
+
+    def _get_changes(self, local_digests, templates):
+        """
+        Compare the local files with the templates of the theme. The listing holds no checksum of the media
+        files, those on both sides are unverified instead of unchanged.
+        """
+        remote_digests = {}
+        for template in templates:
+            content = None if template.get('file') else hashlib.sha256(
+                (template.get('content') or '').encode('utf-8')).hexdigest()
+            remote_digests[str(template['name'])] = content
+
+        changes = {'added': [], 'modified': [], 'deleted': [], 'unverified': [], 'unchanged': []}
+        for template_name, (digest, _) in sorted(local_digests.items()):
+            if template_name not in remote_digests:
+                changes['added'].append(template_name)
+            elif remote_digests[template_name] is None:
+                changes['unverified'].append(template_name)
+            elif remote_digests[template_name] != digest:
+                changes['modified'].append(template_name)
+            else:
+                changes['unchanged'].append(template_name)
+        changes['deleted'] = sorted(set(remote_digests) - set(local_digests))
+        return changes
+
+    def _fetch_templates(self, template_names, workers=DEFAULT_WORKERS):
+        """
+        Fetch the named templates in the order of the names, concurrently with up to `workers` requests,
+        or from one listing of the theme when there are more than PULL_LISTING_THRESHOLD names.
+        """
+        template_names = [get_template_name(filename) for filename in template_names]
+        if len(template_names) > PULL_LISTING_THRESHOLD:
+            response = self.gateway.get_templates(theme_id=self.config.theme_id)
+            templates = response.json()
+            if not isinstance(templates, list):
+                return templates
+            templates = {str(template['name']): template for template in templates}
+            for template_name in template_names:
+                if template_name not in templates:
+                    logging.warning(f'[{self.config.env}] Missing {template_name} in theme id {self.config.theme_id}')
+            return [templates[template_name] for template_name in template_names if template_name in templates]
+
+        rate_limiter = RateLimiter(FETCH_INTERVAL)
+
+        def fetch(template_name):
+            rate_limiter.wait()
+            response = self.gateway.get_template(theme_id=self.config.theme_id, template_name=template_name)
+            # the failure was logged by the gateway
+            return response.json() if response.ok else None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return [template for template in executor.map(fetch, template_names) if template]
+
+    def _pull_templates(self, template_names, journal=None, workers=DEFAULT_WORKERS):
+        """Download templates, returns False when the list of templates could not be fetched."""
         templates = []
         if template_names:
-            for filename in template_names:
-                template_name = get_template_name(filename)
-                response = self.gateway.get_template(theme_id=self.config.theme_id, template_name=template_name)
-                templates.append(response.json())
+            templates = self._fetch_templates(template_names, workers=workers)
         else:
             response = self.gateway.get_templates(theme_id=self.config.theme_id)
             templates = response.json()
 
         if not isinstance(templates, list):
-            return
+            return False
 
         template_count = len(templates)
         logging.info(f'[{self.config.env}] Connecting to {self.config.store}')
         logging.info(f'[{self.config.env}] Pulling {template_count} files from theme id {self.config.theme_id} ')
-        current_files = []
-        for template in progress_bar(templates, prefix=f'[{self.config.env}] Progress:', suffix='Complete', length=50):
-            template_name = str(template['name'])
-            current_pathfile = os.path.abspath(template_name)
-            current_files.append(current_pathfile.replace('\\', '/'))
+        if journal and journal.completed:
+            templates = [
+                template for template in templates
+                if not (journal.is_completed(str(template['name'])) and os.path.exists(str(template['name'])))
+            ]
+            logging.info(
+                f'[{self.config.env}] Resuming, {template_count - len(templates)} files were already downloaded')
+
+        for template in progress_bar(
+                templates, prefix=f'[{self.config.env}] Progress:', suffix='Complete', length=50,
+                metrics=self.metrics):
+            self._save_template(template)
+            if journal:
+                journal.record(str(template['name']))
+            time.sleep(0.08)
+        return True
+
+    def _save_template(self, template, directory='.'):
+        template_name = str(template['name'])
+        current_pathfile = os.path.abspath(os.path.join(directory, template_name))
+
+        if template['file']:
+            data = self._download_file(template['file'])
+        else:
+            data = (template.get('content') or '').encode('utf-8')
+        if self._is_saved(current_pathfile, data):
+            # rewriting the same content would only change its mtime, and the hash cache with it
+            return
 
-            # create directories
-            dirs = os.path.dirname(current_pathfile)
-            if not os.path.exists(dirs):
-                os.makedirs(dirs)
+        with self.metrics.timer('io', 'write', template=template_name):
+            # create directories, other workers may create the same directories concurrently
+            os.makedirs(os.path.dirname(current_pathfile), exist_ok=True)
 
             # write file
             if template['file']:
-                response = self.gateway._request("GET", template['file'])
                 with open(current_pathfile, "wb") as media_file:
-                    media_file.write(response.content)
+                    media_file.write(data)
                     media_file.close()
             else:
                 with open(current_pathfile, "w", encoding="utf-8") as template_file:
                     template_file.write(template.get('content'))
                     template_file.close()
 
-            time.sleep(0.08)
+    def _download_file(self, url):
+        """Content of a media file, from the object store when the file didn't change since its last download."""
+        headers = self.object_store.get_validators(url)
+        if headers:
+            response = self.gateway._request("GET", url, headers=headers)
+        else:
+            response = self.gateway._request("GET", url)
+        if response.status_code == 304:
+            try:
+                return self.object_store.read(url)
+            except OSError:
+                # evicted by another run in the meantime
+                response = self.gateway._request("GET", url)
+        if response.ok:
+            self.object_store.add(
+                url, response.content, etag=response.headers.get('etag'),
+                last_modified=response.headers.get('last-modified'))
+        return response.content
+
+    def _is_saved(self, pathfile, data):
+        """Whether the file holds the bytes `data` already."""
+        try:
+            digest, _ = self.hasher.digest(pathfile)
+        except OSError:
+            return False
+        return digest == hash_content(data, text=not pathfile.endswith(tuple(MEDIA_FILE_EXTENSIONS)))[0]
+
+    def _get_theme_ids(self, parser):
+        if getattr(parser, 'all_themes', False):
+            theme_ids = []
+            response = self.gateway.get_themes()
+            themes = response.json() if response.ok else {}
+            while themes:
+                theme_ids.extend(theme['id'] for theme in themes.get('results', []))
+                next_url = themes.get('next')
+                themes = self.gateway._request("GET", next_url, apikey=self.config.apikey).json() if next_url else {}
+            return theme_ids
+
+        try:
+            return [int(theme_id) for theme_id in parser.theme_ids.split(',') if theme_id.strip()]
+        except ValueError:
+            raise TypeError(f'[{self.config.env}] argument --theme_ids must be comma separated theme ids.')
+
+    @parser_config(theme_id_required=False)
+    def _checkout_themes(self, parser):
+        """Download several themes concurrently, each theme into a directory named by its theme id."""
+        theme_ids = self._get_theme_ids(parser)
+        if not theme_ids:
+            logging.warning(f'[{self.config.env}] Missing Themes in {self.config.store}')
+            return
+
+        workers = getattr(parser, 'workers', None) or DEFAULT_WORKERS
+        if not getattr(parser, 'http2', False):
+            self.gateway.session = create_session(pool_size=workers)
+        logging.info(f'[{self.config.env}] Connecting to {self.config.store}')
+        logging.info(f'[{self.config.env}] Checking out {len(theme_ids)} themes with {workers} workers')
+
+        progress = Progress(prefix=f'[{self.config.env}] Progress:', suffix='Complete', metrics=self.metrics)
+
+        def save_template(template, directory):
+            progress.start()
+            try:
+                self._save_template(template, directory)
+            finally:
+                progress.advance()
+
+        # all themes share one connection pool and one cap on the concurrent downloads
+        with progress, ThreadPoolExecutor(max_workers=workers) as executor:
+            listings = executor.map(lambda theme_id: self.gateway.get_templates(theme_id=theme_id), theme_ids)
+            downloads = {}
+            for theme_id, response in zip(theme_ids, listings):
+                templates = response.json()
+                if not isinstance(templates, list):
+                    continue
+                directory = str(theme_id)
+                self._write_theme_config(theme_id, directory)
+                # the downloads of the first themes start while the next themes are listed
+                progress.add_total(len(templates))
+                downloads[theme_id] = [
+                    executor.submit(save_template, template, directory) for template in templates
+                ]
+
+            for theme_futures in downloads.values():
+                for future in theme_futures:
+                    future.result()
 
-    def _delete_templates(self, template_names):
+        for theme_id, theme_futures in downloads.items():
+            logging.info(
+                f'[{self.config.env}] Theme id {theme_id} checked out {len(theme_futures)} files into {theme_id}/')
+        self.object_store.save()
+        self._report_metrics(parser)
+
+    def _write_theme_config(self, theme_id, directory):
+        """Write config.yml for the current environment into the directory of a checked out theme."""
+        os.makedirs(directory, exist_ok=True)
+        config_file = os.path.join(directory, os.path.basename(CONFIG_FILE))
+        configs = dict(load_configs(config_file))
+        configs[self.config.env] = {
+            'apikey': self.config.apikey,
+            'store': self.config.store,
+            'theme_id': theme_id,
+            'sass': {
+                'output_style': self.config.sass_output_style or 'nested'
+            }
+        }
+        dump_configs(configs, config_file)
+
+    def _delete_templates(self, template_names, retry_queue=None, workers=1):
+        """Delete with up to `workers` concurrent requests, stops on the first failure without a retry queue."""
+        template_names = [get_template_name(template_name) for template_name in template_names]
         template_count = len(template_names)
         logging.info(f'[{self.config.env}] Connecting to {self.config.store}')
         logging.info(f'[{self.config.env}] Deleting {template_count} files from theme id {self.config.theme_id}')
 
-        for template_name in progress_bar(
-                template_names, prefix=f'[{self.config.env}] Progress:', suffix='Complete', length=50):
-            template_name = get_template_name(template_name)
-            response = self.gateway.delete_template(theme_id=self.config.theme_id, template_name=template_name)
-            if not response.ok:
-                return
+        rate_limiter = RateLimiter(DELETE_INTERVAL)
+        progress = Progress(
+            template_count, prefix=f'[{self.config.env}] Progress:', suffix='Complete', metrics=self.metrics)
+
+        def delete(template_name):
+            rate_limiter.wait()
+            progress.start()
+            try:
+                return self._delete_template(template_name)
+            except Exception as error:
+                if self._is_offline_error(error):
+                    self._queue_offline('delete', [template_name], error)
+                    return None
+                if retry_queue is None:
+                    raise
+                return f'{error}'
+            finally:
+                progress.advance()
+
+        with progress, ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(delete, template_name) for template_name in template_names]
+            for template_name, future in zip(template_names, futures):
+                reason = future.result()
+                if reason:
+                    if retry_queue is None:
+                        for pending_future in futures:
+                            pending_future.cancel()
+                        return
+                    retry_queue.add('delete', template_name, reason)
+
+    def _delete_template(self, template_name):
+        """Delete one template, returns the reason of the failure or None."""
+        response = self.gateway.delete_template(theme_id=self.config.theme_id, template_name=template_name)
+        return None if response.ok else f'status {response.status_code}'
+
+    def _retry_failures(self, retry_queue, journal=None):
+        """Retry the queued uploads and deletes, returns True when all of them succeeded."""
+        def upload(template_name):
+            state = get_file_state(template_name) if journal else None
+            reason = self._upload_template(template_name)
+            if journal and not reason:
+                journal.record(template_name, **state)
+            return reason
+
+        return retry_queue.retry({'upload': upload, 'delete': self._delete_template}, env=self.config.env)
+
+    def _report_failures(self, retry_queue):
+        """Log the templates which still failed after the retries, returns the exit code of the command."""
+        if not retry_queue or not retry_queue.failures:
+            return 0
+
+        logging.error(
+            f'[{self.config.env}] {len(retry_queue.failures)} files failed after {retry_queue.attempts} retries:')
+        for (action, template_name), reason in retry_queue.failures.items():
+            logging.error(f'[{self.config.env}] \t{action.capitalize()} {template_name} failed -> {reason}')
+        return 1
 
     def _compile_sass(self):
+        """
+        Compile the sass sources to css in memory and only write the css files whose content changed, so the
+        unchanged ones don't trigger watch events. Returns the template names of the changed css files.
+        """
+        import sass
+
         logging.info(f'[{self.config.env}] Processing {SASS_SOURCE} to {SASS_DESTINATION}.')
+        changed_files = []
         try:
-            sass.compile(dirname=(SASS_SOURCE, SASS_DESTINATION), output_style=self.config.sass_output_style)
-            logging.info(f'[{self.config.env}] Sass successfully processed.')
+            with self.metrics.timer('sass', 'compile', source=SASS_SOURCE, destination=SASS_DESTINATION):
+                sources = sorted(
+                    source for extension in SASS_SOURCE_EXTENSIONS
+                    for source in glob.glob(f'{SASS_SOURCE}/**/*{extension}', recursive=True))
+                for source in sources:
+                    # partials are only compiled when they are imported
+                    if os.path.basename(source).startswith('_'):
+                        continue
+                    css_file = os.path.join(
+                        SASS_DESTINATION, os.path.splitext(os.path.relpath(source, SASS_SOURCE))[0] + '.css')
+                    content = sass.compile(
+                        filename=source, output_style=self.config.sass_output_style).encode('utf-8')
+                    if self._write_if_changed(css_file, content):
+                        changed_files.append(get_template_name(css_file))
+            logging.info(f'[{self.config.env}] Sass successfully processed, {len(changed_files)} css files changed.')
         except Exception as error:
             logging.error(f'[{self.config.env}] Sass processing failed, see error below.')
             logging.error(f'[{self.config.env}] {error}')
+        return changed_files
+
+    def _write_if_changed(self, pathfile, content):
+        """Write the bytes `content` to `pathfile` unless it holds them already, returns True when written."""
+        if os.path.exists(pathfile):
+            with open(pathfile, 'rb') as current_file:
+                if current_file.read() == content:
+                    return False
+        os.makedirs(os.path.dirname(pathfile) or '.', exist_ok=True)
+        with atomic_write(pathfile, 'wb') as output_file:
+            output_file.write(content)
+        return True
+
+    def _open_journal(self, parser, operation):
+        journal = Journal(os.path.join(
+            JOURNAL_DIRECTORY, f'{operation}-{self.config.env}-{self.config.theme_id}.jsonl'))
+        if getattr(parser, 'resume', False):
+            journal.load()
+        else:
+            # a new run starts from the first file, forget the files of an earlier interrupted run
+            journal.clear()
+        return journal
+
+    def _open_offline_queue(self):
+        # one queue per environment and theme, the changes are never flushed into another theme
+        return OfflineQueue(os.path.join(
+            NTK_DIRECTORY, f'watch_queue-{self.config.env}-{self.config.theme_id}.jsonl'))
+
+    def _close_journal(self, journal, operation, completed, interrupted=True):
+        """Clear the journal of a completed run, the hint to resume is only logged when the run stopped early."""
+        if completed:
+            journal.clear()
+            return
+        journal.close()
+        if interrupted:
+            logging.warning(
+                f'[{self.config.env}] {operation.capitalize()} was interrupted, run "ntk {operation} --resume" '
+                'to continue with the remaining files.')
+
+    def _report_metrics(self, parser):
+        for line in self.metrics.summary():
+            logging.info(f'[{self.config.env}] {line}')
+
+        if getattr(parser, 'metrics_json', None):
+            self.metrics.save(parser.metrics_json)
+            logging.info(f'[{self.config.env}] Metrics were written to {parser.metrics_json}')
+
+        if self.metrics.tracer and getattr(parser, 'trace', None):
+            self.metrics.tracer.save(parser.trace)
+            logging.info(f'[{self.config.env}] Trace was written to {parser.trace}')
 
     @parser_config(theme_id_required=False)
     def init(self, parser):
@@ -176,20 +863,141 @@ class Command:
         else:
             logging.warning(f'[{self.config.env}] Missing Themes in {self.config.store}')
 
+    @parser_config()
+    def status(self, parser):
+        response = self.gateway.get_templates(theme_id=self.config.theme_id)
+        templates = response.json()
+        if not isinstance(templates, list):
+            return
+
+        local_digests = self._get_local_digests(self._get_accept_files([]))
+        logging.info(
+            f'[{self.config.env}] Comparing {len(local_digests)} local files with {len(templates)} files '
+            f'of theme id {self.config.theme_id}')
+        changes = self._get_changes(local_digests, templates)
+
+        labels = {
+            'added': 'Added, not on the store',
+            'modified': 'Modified',
+            'deleted': 'Deleted, only on the store',
+            'unverified': 'Unverified, media files not compared by content',
+        }
+        for change, label in labels.items():
+            if changes[change]:
+                logging.info(f'[{self.config.env}] {label}:')
+                for template_name in changes[change]:
+                    logging.info(f'[{self.config.env}] \t{template_name}')
+
+        # the unverified files may differ, they count in the upload
+        upload_size = sum(
+            local_digests[name][1] for name in changes['added'] + changes['modified'] + changes['unverified'])
+        logging.info(
+            f'[{self.config.env}] {len(changes["added"])} added, {len(changes["modified"])} modified, '
+            f'{len(changes["deleted"])} deleted, {len(changes["unverified"])} unverified, '
+            f'{len(changes["unchanged"])} unchanged, {format_size(upload_size)} to upload')
+
     @parser_config()
     def pull(self, parser):
-        self._pull_templates(parser.filenames)
+        workers = getattr(parser, 'workers', None) or DEFAULT_WORKERS
+        if parser.filenames and not getattr(parser, 'http2', False):
+            # shared by the concurrent fetches of the named files, --http2 sessions are created by parser_config
+            self.gateway.session = create_session(pool_size=workers)
+        journal = self._open_journal(parser, 'pull')
+        completed = False
+        try:
+            completed = self._pull_templates(parser.filenames, journal=journal, workers=workers)
+        finally:
+            self._close_journal(journal, 'pull', completed)
+            self.hasher.save()
+            self.object_store.save()
+        self._report_metrics(parser)
 
-    @parser_config(write_file=True)
     def checkout(self, parser):
-        self._pull_templates([])
+        if getattr(parser, 'theme_ids', None) or getattr(parser, 'all_themes', False):
+            self._checkout_themes(parser)
+        else:
+            self._checkout(parser)
+
+    @parser_config(write_file=True)
+    def _checkout(self, parser):
+        journal = self._open_journal(parser, 'checkout')
+        completed = False
+        try:
+            completed = self._pull_templates([], journal=journal)
+        finally:
+            self._close_journal(journal, 'checkout', completed)
+            self.hasher.save()
+            self.object_store.save()
+        self._report_metrics(parser)
 
-    @parser_config()
     def push(self, parser):
-        self._push_templates(parser.filenames or [])
+        if getattr(parser, 'dry_run', False) and not getattr(parser, 'prune', False):
+            raise TypeError(f'[{parser.env}] argument --dry_run requires --prune.')
+        self._set_optimizers(parser)
+        environments = self._get_environments(parser)
+        if len(environments) > 1:
+            return self._push_environments(parser, environments)
+        else:
+            parser.env = environments[0] if environments else parser.env
+            return self._push(parser)
+
+    @parser_config()
+    def _push(self, parser):
+        prune = getattr(parser, 'prune', False)
+        if prune:
+            remote_only_templates = self._get_remote_only_templates()
+            if getattr(parser, 'dry_run', False):
+                return
+
+        journal = self._open_journal(parser, 'push')
+        retry_queue = RetryQueue() if getattr(parser, 'continue_on_error', False) else None
+        completed = False
+        # went through every file, the failures which are left are listed by _report_failures
+        finished = False
+        try:
+            completed = self._push_templates(parser.filenames or [], journal=journal, retry_queue=retry_queue)
+            finished = completed
+            if retry_queue:
+                completed = self._retry_failures(retry_queue, journal=journal)
+            # never prune after a failed push, the theme would miss both the old and the new files
+            if prune and completed and remote_only_templates:
+                self._delete_templates(
+                    remote_only_templates, retry_queue=retry_queue,
+                    workers=getattr(parser, 'workers', None) or DEFAULT_WORKERS)
+                if retry_queue:
+                    completed = self._retry_failures(retry_queue, journal=journal)
+        finally:
+            self._close_journal(journal, 'push', completed, interrupted=not finished)
+        self._report_optimizers()
+        self._report_metrics(parser)
+        return self._report_failures(retry_queue) or (1 if self.invalid_templates else 0)
+
+    def _get_remote_only_templates(self, config=None, gateway=None):
+        """
+        List the templates of the theme which don't exist locally, logged as the preview of the prune. Uses the
+        theme of the current environment unless the config and gateway of another one are given.
+        """
+        config = config or self.config
+        gateway = gateway or self.gateway
+        response = gateway.get_templates(theme_id=config.theme_id)
+        templates = response.json()
+        if not isinstance(templates, list):
+            return []
+
+        local_names = {get_template_name(pathfile) for pathfile in self._get_accept_files([])}
+        template_names = sorted({str(template['name']) for template in templates} - local_names)
+        logging.info(
+            f'[{config.env}] Prune will delete {len(template_names)} files only on theme id '
+            f'{config.theme_id}' + (':' if template_names else ''))
+        for template_name in template_names:
+            logging.info(f'[{config.env}] \t{template_name}')
+        return template_names
 
     @parser_config()
     def watch(self, parser):
+        import asyncio
+        from watchfiles import awatch
+
         current_pathfile = os.path.abspath(".")
 
         logging.info(f'[{self.config.env}] Current store {self.config.store}')
@@ -198,13 +1006,120 @@ class Command:
         logging.info(f'[{self.config.env}] Watching for file changes in {current_pathfile}')
         logging.info(f'[{self.config.env}] Press Ctrl + C to stop')
 
+        retry_queue = RetryQueue() if getattr(parser, 'continue_on_error', False) else None
+        self._set_optimizers(parser)
+        self.offline_queue = self._open_offline_queue()
+        if self.offline_queue.load():
+            logging.info(f'[{self.config.env}] Resuming {len(self.offline_queue)} changes queued by the last watch')
+
         async def main():
-            async for changes in awatch('.'):
-                self._handle_files_change(changes)
+            self._flush_offline_queue(retry_queue)
+            # wakes up without changes to check whether an unreachable store is back
+            async for changes in awatch('.', rust_timeout=OFFLINE_PROBE_INTERVAL * 1000, yield_on_timeout=True):
+                self._flush_offline_queue(retry_queue)
+                if changes:
+                    self._handle_files_change(changes, retry_queue=retry_queue)
+
+        try:
+            asyncio.run(main())
+        finally:
+            self.offline_queue.close()
+            self.hasher.save()
+            self._report_metrics(parser)
+
+    @parser_config()
+    def daemon(self, parser):
+        import socket
+
+        if not hasattr(socket, 'AF_UNIX'):
+            raise TypeError(f'[{self.config.env}] ntk daemon requires Unix sockets, use WSL on Windows.')
+        from ntk.daemon import DaemonServer
+
+        self._set_optimizers(parser)
+        # kept warm between the requests, --http2 sessions are created by parser_config
+        if not getattr(parser, 'http2', False):
+            self.gateway.session = create_session()
+        self.file_index = set(self._get_accept_files([]))
+
+        with DaemonServer(self._handle_daemon_request, socket_path=parser.socket_path) as server:
+            logging.info(f'[{self.config.env}] Current store {self.config.store}')
+            logging.info(f'[{self.config.env}] Current theme id {self.config.theme_id}')
+            logging.info(f'[{self.config.env}] Indexed {len(self.file_index)} files')
+            logging.info(f'[{self.config.env}] Listening on {parser.socket_path}, send requests with ntk-client')
+            logging.info(f'[{self.config.env}] Press Ctrl + C to stop')
+            try:
+                server.serve_forever()
+            finally:
+                self.hasher.save()
+                self.object_store.save()
+                self._report_metrics(parser)
 
-        asyncio.run(main())
+    def _handle_daemon_request(self, request):
+        """Push, pull or delete the files of a request of ntk-client, returns the response."""
+        action = request.get('action')
+        template_names = request.get('filenames') or []
+        retry_queue = RetryQueue()
+        try:
+            if action == 'push':
+                ok = self._push_templates(template_names, compile_sass=True, retry_queue=retry_queue)
+                self._report_optimizers()
+            elif action == 'pull':
+                ok = self._pull_templates(template_names)
+            elif action == 'delete':
+                self._delete_templates(template_names, retry_queue=retry_queue)
+                ok = True
+            elif action == 'ping':
+                ok = True
+            else:
+                return {'ok': False, 'error': f'Unknown action {action}'}
+        except Exception as error:
+            logging.exception(f'[{self.config.env}] {action} failed -> {error}', exc_info=False)
+            return {'ok': False, 'error': f'{error}'}
+
+        failed = {template_name: reason for (_, template_name), reason in retry_queue.failures.items()}
+        if action == 'push':
+            failed.update(self.invalid_templates)
+        return {'ok': ok and not failed, 'failed': failed}
 
     @parser_config()
     def compile_sass(self, parser):
         logging.info(f'[{self.config.env}] Sass output style {self.config.sass_output_style}.')
         self._compile_sass()
+
+    def cache(self, parser):
+        # the object store is shared by all themes, no config is needed
+        object_store = ObjectStore()
+        if parser.max_size is None:
+            max_size = object_store.max_size
+        else:
+            max_size = parser.max_size * 1024 * 1024
+        removed_count, removed_size = object_store.gc(max_size=max_size)
+        count, size = object_store.stats()
+        logging.info(
+            f'Object store {object_store.directory}: removed {removed_count} files ({format_size(removed_size)}), '
+            f'{count} files ({format_size(size)}) left')
+
+    def bench(self, parser):
+        # the benchmarks run on generated themes with a local mirror, no config or store is needed
+        if parser.action == 'generate':
+            if not parser.directory:
+                raise TypeError('[bench] argument directory is required.')
+            counts = generate_theme(parser.directory, parser.files, seed=parser.seed)
+            logging.info(
+                f'Generated {sum(counts.values())} files ({get_theme_size(parser.directory)}) in {parser.directory}: '
+                + ', '.join(f'{count} {kind}' for kind, count in counts.items()))
+            return
+
+        sizes = BENCH_SIZES
+        if parser.sizes:
+            try:
+                sizes = [int(size) for size in parser.sizes.split(',') if size.strip()]
+            except ValueError:
+                raise TypeError('[bench] argument --sizes must be comma separated numbers of files.')
+        results = run_benchmarks(sizes=sizes, directory=parser.directory, seed=parser.seed)
+        for line in format_results(results):
+            logging.info(line)
+        if parser.output:
+            with atomic_write(parser.output, encoding='utf-8') as output_file:
+                json.dump(results, output_file, indent=2)
+            logging.info(f'Results written to {parser.output}')
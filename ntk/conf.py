@@ -1,11 +1,24 @@
 
 import logging
 import os
-import yaml
+
+from ntk.utils import atomic_write, is_local_store
 
 CONFIG_FILE_NAME = './config.yml'
 CONFIG_FILE = os.path.abspath(CONFIG_FILE_NAME)
 
+NTK_DIRECTORY = '.ntk'
+PROFILE_OUTPUT = f'{NTK_DIRECTORY}/profile'
+JOURNAL_DIRECTORY = f'{NTK_DIRECTORY}/journal'
+MINIFY_CACHE_DIRECTORY = f'{NTK_DIRECTORY}/minify'
+IMAGES_CACHE_DIRECTORY = f'{NTK_DIRECTORY}/images'
+HASH_CACHE = f'{NTK_DIRECTORY}/hashes.json'
+DAEMON_SOCKET = f'{NTK_DIRECTORY}/daemon.sock'
+# downloaded media files shared by all themes, see ntk cache gc
+OBJECTS_DIRECTORY = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'ntk', 'objects')
+OBJECTS_MAX_SIZE = 1024 * 1024 * 1024
+
 CONTENT_FILE_EXTENSIONS = ['.html', '.json', '.css', '.js']
 MEDIA_FILE_EXTENSIONS = [
     '.woff2', '.gif', '.ico', '.png', '.jpg', '.jpeg', '.svg', '.eot', '.tff', '.ttf', '.woff',
@@ -13,6 +26,20 @@ MEDIA_FILE_EXTENSIONS = [
 ]
 
 SASS_EXTENSIONS = ['.scss']
+# sources compiled to css, the indented syntax too like sass.compile(dirname=...)
+SASS_SOURCE_EXTENSIONS = ['.scss', '.sass']
+
+ASSETS_DIRECTORY = 'assets'
+# assets minified before upload with --minify
+MINIFY_EXTENSIONS = ['.css', '.js', '.json']
+# files checked before upload, json is parsed and the block tags of html are balanced
+VALIDATE_EXTENSIONS = ['.json', '.html']
+# assets optimized before upload with --optimize_images, jpeg only with --image_quality
+PNG_EXTENSIONS = ['.png']
+JPEG_EXTENSIONS = ['.jpg', '.jpeg']
+
+# concurrent requests of the commands which download or upload in parallel
+DEFAULT_WORKERS = 4
 
 SASS_SOURCE = 'sass'
 SASS_DESTINATION = 'assets'
@@ -52,6 +79,52 @@ GLOB_PATTERN = [
 ]
 
 
+# parsed config files by path, each entry is kept until the (mtime, size) of the file changes
+_configs_cache = {}
+
+
+def _get_file_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_configs(path=CONFIG_FILE):
+    """Parse the config file once per process, later calls reuse the result until the file changes."""
+    if not os.path.exists(path):
+        return {}
+
+    file_key = _get_file_key(path)
+    cached = _configs_cache.get(path)
+    if file_key and cached and cached[0] == file_key:
+        return cached[1]
+
+    import yaml
+
+    # the libyaml based loader is many times faster than the pure python one
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(path, "r") as yamlfile:
+        configs = yaml.load(yamlfile, Loader=loader) or {}
+        yamlfile.close()
+
+    if file_key:
+        _configs_cache[path] = (file_key, configs)
+    return configs
+
+
+def dump_configs(configs, path=CONFIG_FILE):
+    import yaml
+
+    with atomic_write(path) as yamlfile:
+        yaml.dump(configs, yamlfile)
+
+    file_key = _get_file_key(path)
+    if file_key:
+        _configs_cache[path] = (file_key, configs)
+
+
 class Config(object):
     apikey = None
     store = None
@@ -88,7 +161,8 @@ class Config(object):
 
     def validate_config(self):
         error_msgs = []
-        if self.apikey_required and not self.apikey:
+        # a local directory mirroring a store needs no api key
+        if self.apikey_required and not self.apikey and not is_local_store(self.store):
             error_msgs.append('-a/--apikey')
         if self.store_required and not self.store:
             error_msgs.append('-s/--store')
@@ -107,22 +181,19 @@ class Config(object):
         return True
 
     def read_config(self, update=True):
-        configs = {}
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, "r") as yamlfile:
-                configs = yaml.load(yamlfile, Loader=yaml.FullLoader)
-                yamlfile.close()
-            if configs and configs.get(self.env) and update:
-                self.apikey = configs[self.env].get('apikey')
-                self.store = configs[self.env].get('store')
-                self.theme_id = configs[self.env].get('theme_id')
-                if configs[self.env].get('sass'):
-                    self.sass_output_style = configs[self.env]['sass'].get('output_style')
+        configs = load_configs(CONFIG_FILE)
+        if configs.get(self.env) and update:
+            self.apikey = configs[self.env].get('apikey')
+            self.store = configs[self.env].get('store')
+            self.theme_id = configs[self.env].get('theme_id')
+            if configs[self.env].get('sass'):
+                self.sass_output_style = configs[self.env]['sass'].get('output_style')
 
         return configs
 
     def write_config(self):
-        configs = self.read_config(update=False)
+        # copy, the loaded configs are shared with the cache
+        configs = dict(self.read_config(update=False))
 
         new_config = {
             'apikey': self.apikey,
@@ -135,9 +206,7 @@ class Config(object):
         # If the config has been changed, then the config will be saved to config.yml.
         if configs.get(self.env) != new_config:
             configs[self.env] = new_config
-            with open(CONFIG_FILE, 'w') as yamlfile:
-                yaml.dump(configs, yamlfile)
-                yamlfile.close()
+            dump_configs(configs, CONFIG_FILE)
             logging.info(f'[{self.env}] Configuration was updated.')
 
     def save(self, write_file=True):
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from ntk.conf import DAEMON_SOCKET
+
+
+class LogCapture(logging.Handler):
+    """Collect the log records of one request, they are sent back to the client."""
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line per connection, answered by one JSON response line."""
+
+    def handle(self):
+        capture = LogCapture()
+        logging.getLogger().addHandler(capture)
+        try:
+            try:
+                request = json.loads(self.rfile.readline())
+                if not isinstance(request, dict):
+                    raise ValueError('expected an object')
+            except ValueError as error:
+                response = {'ok': False, 'error': f'Invalid request -> {error}'}
+            else:
+                if request.get('action') == 'stop':
+                    # shutdown() waits for serve_forever() to return, it can't be called from its thread
+                    threading.Thread(target=self.server.shutdown).start()
+                    response = {'ok': True}
+                else:
+                    response = self.server.handle_request(request)
+        finally:
+            logging.getLogger().removeHandler(capture)
+        response['log'] = capture.lines
+        self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """
+    Serve the requests of the clients on a Unix socket, one at a time, so consecutive uploads keep the pace
+    of the store rate limit. `handle_request` takes the request and returns the response, both dicts.
+    """
+
+    def __init__(self, handle_request, socket_path=DAEMON_SOCKET):
+        self.handle_request = handle_request
+        self.socket_path = socket_path
+        if is_running(socket_path):
+            raise TypeError(f'ntk daemon is already running on {socket_path}.')
+        if os.path.exists(socket_path):
+            # left by a daemon which was killed
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        super().__init__(socket_path, DaemonRequestHandler)
+
+    def server_bind(self):
+        # the daemon holds the api key, only the user who started it may connect
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def is_running(socket_path=DAEMON_SOCKET):
+    if not os.path.exists(socket_path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
@@ -1,6 +1,9 @@
 import functools
 import logging
 
+from ntk.conf import DEFAULT_WORKERS
+from ntk.trace import Tracer
+
 logging.basicConfig(
     format='%(asctime)s %(levelname)s %(message)s',
     level=logging.INFO,
@@ -20,8 +23,16 @@ def parser_config(*args, **kwargs):
             self.config.parser_config(parser, write_file=kwargs.get('write_file', False))
             self.gateway.store = self.config.store
             self.gateway.apikey = self.config.apikey
+            if getattr(parser, 'trace', None):
+                self.metrics.tracer = Tracer()
+            if getattr(parser, 'http2', False) and self.gateway.session is None:
+                from ntk.gateway import create_session
+
+                # one connection per store, shared by the concurrent requests of the command
+                self.gateway.session = create_session(
+                    pool_size=getattr(parser, 'workers', None) or DEFAULT_WORKERS, http2=True)
 
-            func(self, parser, **func_kwargs)
+            return func(self, parser, **func_kwargs)
 
         return _wrapper
 
@@ -1,24 +1,142 @@
-import requests
+import logging
+import sys
+import time
+from types import SimpleNamespace
 from urllib.parse import urljoin
 
 from ntk.decorator import check_error
+from ntk.local import get_local_root, LocalSession
+from ntk.metrics import Metrics
+from ntk.utils import is_local_store
+
+
+def create_session(pool_size=1, http2=False):
+    """
+    Session keeping up to `pool_size` connections alive, to be shared by concurrent requests. With `http2`
+    the concurrent requests to a store are multiplexed over one HTTP/2 connection when the store supports it.
+    """
+    if http2:
+        try:
+            return HTTP2Session(pool_size=pool_size)
+        except ImportError as error:
+            logging.warning(f'Falling back to HTTP/1.1, {error}')
+
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def is_unreachable(error):
+    """Whether a request failed before the store answered, e.g. the network is down or the DNS lookup failed."""
+    import requests
+
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    # only imported by the sessions of --http2
+    httpx = sys.modules.get('httpx')
+    return httpx is not None and isinstance(error, httpx.TransportError)
+
+
+class HTTP2Response:
+    """The attributes of a requests response which ntk uses, for a response of httpx."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        self.http_version = response.http_version
+        self.request = SimpleNamespace(body=response.request.content)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self._response.text
+
+    def json(self, **kwargs):
+        return self._response.json(**kwargs)
+
+
+class HTTP2Session:
+    """
+    Session of httpx negotiating HTTP/2 with each store, concurrent requests are multiplexed as streams over
+    one connection. Stores without HTTP/2, and plain http urls, are served over HTTP/1.1 by the same session.
+    """
+
+    def __init__(self, pool_size=1):
+        # optional dependency, python -m pip install "next-theme-kit[http2]"
+        import httpx
+        import h2  # noqa: F401
+
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        # no timeout, like requests
+        self.client = httpx.Client(http2=True, limits=limits, timeout=None)
+
+    def request(self, method, url, headers=None, data=None, files=None):
+        # requests leaves out the fields without value
+        data = {name: value for name, value in (data or {}).items() if value is not None}
+        request = self.client.build_request(method, url, headers=headers, data=data or None, files=files or None)
+        # build the body in memory like requests does, the bytes sent are known
+        request.read()
+        return HTTP2Response(self.client.send(request))
+
+    def close(self):
+        self.client.close()
 
 
 class Gateway:
     def __init__(self, store, apikey):
         self.store = store
         self.apikey = apikey
+        self.metrics = Metrics()
+        self.session = None
+        self._local_session = None
 
-    def _request(self, request_type, url, apikey=None, payload={}, files={}):
-        headers = {}
-        if apikey:
-            headers = {'Authorization': f'Bearer {apikey}'}
+    def _get_session(self):
+        if is_local_store(self.store):
+            # the store may change with the env of the command, see parser_config
+            root = get_local_root(self.store)
+            if self._local_session is None or self._local_session.root != root:
+                self._local_session = LocalSession(root)
+            return self._local_session
+
+        import requests
 
-        response = requests.request(request_type, url, headers=headers, data=payload, files=files)
-        if response.status_code == 429 and "throttled" in response.content.decode():
-            return self._request(request_type, url, apikey, payload, files)
+        return self.session or requests
+
+    def _request(self, request_type, url, apikey=None, payload={}, files={}, headers=None):
+        headers = dict(headers or {})
+        if apikey:
+            headers['Authorization'] = f'Bearer {apikey}'
+
+        start = time.perf_counter()
+        response = self._get_session().request(request_type, url, headers=headers, data=payload, files=files)
+        throttled = response.status_code == 429 and "throttled" in response.content.decode()
+        self.metrics.record_request(
+            request_type, url, response, time.perf_counter() - start, throttled=throttled,
+            template_name=payload.get('name') if isinstance(payload, dict) else None)
+        if throttled:
+            self.metrics.record_retry()
+            return self._request(request_type, url, apikey, payload, files, headers)
         return response
 
+    def is_reachable(self):
+        """Whether the store answers, whatever the status of the response."""
+        try:
+            self._request("HEAD", self.store)
+        except Exception as error:
+            if is_unreachable(error):
+                return False
+            raise
+        return True
+
     @check_error(error_format='Missing Themes in {store}')
     def get_themes(self):
         api_path = '/api/admin/themes/'
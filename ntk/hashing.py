@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ntk.conf import DEFAULT_WORKERS, HASH_CACHE, MEDIA_FILE_EXTENSIONS
+from ntk.utils import atomic_write, get_template_name
+
+# part of the cache, bump it when the digest of a file changes
+HASHING_VERSION = 1
+# files from this size are hashed from a memory map instead of being read into memory
+MMAP_THRESHOLD = 1024 * 1024
+# a file modified this close to its hashing may change again within the same mtime, it is hashed again
+RACY_INTERVAL_NS = 2 * 10 ** 9
+
+
+def hash_content(data, text=False):
+    """
+    Digest and size of the bytes `data`. Text is hashed with its newlines normalized, as it is read to be
+    pushed, other content as it is.
+    """
+    if text:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+
+def hash_file(pathfile, text=False):
+    """Digest and size of the content of a file, see `hash_content`."""
+    with open(pathfile, 'rb') as hashed_file:
+        if text:
+            return hash_content(hashed_file.read(), text=True)
+
+        size = os.fstat(hashed_file.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return hash_content(hashed_file.read())
+        # hashlib releases the GIL on large buffers, the threads of the pool hash in parallel
+        with mmap.mmap(hashed_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            return hashlib.sha256(mapped_file).hexdigest(), size
+
+
+class FileHasher:
+    """
+    Hash the files of the theme in a thread pool, keeping the digest of each file with its inode, size and
+    mtime in a cache under `.ntk/`, so only the files changed since the last run are hashed again.
+    """
+
+    def __init__(self, cache_path=HASH_CACHE, workers=DEFAULT_WORKERS):
+        self.cache_path = cache_path
+        self.workers = workers
+        self.hashed_count = 0
+        self._entries = None
+        self._changed = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        self._entries = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as cache_file:
+                    cache = json.load(cache_file)
+                if cache.get('version') == HASHING_VERSION:
+                    self._entries = cache['files']
+            except (OSError, ValueError, KeyError) as error:
+                logging.warning(f'Ignoring the hash cache {self.cache_path} -> {error}')
+        return self._entries
+
+    def digest(self, pathfile):
+        """Digest and size of the content of the file, hashed only when its stat changed."""
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self.load()
+
+        template_name = get_template_name(pathfile)
+        stat = os.stat(pathfile)
+        state = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+        entry = self._entries.get(template_name)
+        if entry and entry['state'] == state:
+            return entry['digest'], entry['size']
+
+        digest, size = hash_file(pathfile, text=not template_name.endswith(tuple(MEDIA_FILE_EXTENSIONS)))
+        with self._lock:
+            self.hashed_count += 1
+            # not cached, the file may change again without its mtime changing
+            if stat.st_mtime_ns < time.time_ns() - RACY_INTERVAL_NS:
+                self._entries[template_name] = {'state': state, 'digest': digest, 'size': size}
+                self._changed = True
+        return digest, size
+
+    def digests(self, pathfiles):
+        """Digest and size of the content of each file by template name, hashed in parallel."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return dict(zip(map(get_template_name, pathfiles), executor.map(self.digest, pathfiles)))
+
+    def save(self):
+        """Write the cache when files were hashed, forgetting the files which don't exist anymore."""
+        with self._lock:
+            if not self._changed:
+                return
+            entries = {
+                template_name: entry for template_name, entry in self._entries.items()
+                if os.path.exists(template_name)
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with atomic_write(self.cache_path, encoding='utf-8') as cache_file:
+                json.dump({'version': HASHING_VERSION, 'files': entries}, cache_file)
+            self._changed = False
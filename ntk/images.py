@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from ntk.conf import ASSETS_DIRECTORY, IMAGES_CACHE_DIRECTORY, JPEG_EXTENSIONS, PNG_EXTENSIONS
+from ntk.utils import atomic_write, format_size
+
+# part of the cache key, bump it when the output of optimize_image changes
+IMAGES_VERSION = 2
+
+
+def optimize_image(source, destination, quality=None):
+    """
+    Recompress the image at `source` into `destination`, png losslessly and jpeg only with a `quality`,
+    animated images are left as they are.
+    An empty `destination` means the image could not be made smaller, returns the size of `destination`.
+    """
+    # optional dependency, python -m pip install "next-theme-kit[images]"
+    from PIL import Image
+
+    with Image.open(source) as image:
+        options = {'optimize': True}
+        if image.info.get('icc_profile'):
+            options['icc_profile'] = image.info['icc_profile']
+        if image.format == 'JPEG' and quality:
+            options.update(quality=quality, progressive=True, exif=image.info.get('exif', b''))
+        elif image.format != 'PNG':
+            options = None
+        if getattr(image, 'is_animated', False):
+            # saved without save_all an animated png would keep its first frame only
+            options = None
+
+        with atomic_write(destination, 'wb') as destination_file:
+            if options:
+                image.save(destination_file, format=image.format, **options)
+            if options and destination_file.tell() >= os.path.getsize(source):
+                destination_file.seek(0)
+                destination_file.truncate()
+    return os.path.getsize(destination)
+
+
+class ImageOptimizer:
+    """
+    Optimize the png and jpeg images of assets in a process pool before they are uploaded, the local
+    files are left untouched. Outputs are cached by the hash of their source, so each image is only
+    optimized once.
+    """
+
+    def __init__(self, quality=None, cache_directory=IMAGES_CACHE_DIRECTORY, workers=None):
+        self.quality = quality
+        self.cache_directory = cache_directory
+        self.workers = workers
+        self.results = []
+        # re-encoding a jpeg is never lossless, jpeg images are only optimized with a quality
+        self.extensions = tuple(PNG_EXTENSIONS + (JPEG_EXTENSIONS if quality else []))
+
+    def can_optimize(self, template_name):
+        return template_name.split('/')[0] == ASSETS_DIRECTORY and template_name.lower().endswith(self.extensions)
+
+    def optimize(self, template_names):
+        """Optimize the images, returns the path of the file to upload instead of each optimized image."""
+        template_names = [template_name for template_name in template_names if self.can_optimize(template_name)]
+        if not template_names:
+            return {}
+
+        try:
+            import PIL  # noqa: F401
+        except ImportError as error:
+            logging.warning(f'Images are uploaded as written, {error}')
+            return {}
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+        jobs = {}
+        cached = {}
+        for template_name in template_names:
+            with open(template_name, 'rb') as image_file:
+                data = image_file.read()
+            key = f'{IMAGES_VERSION}:{self.quality}:'.encode('utf-8') + data
+            extension = os.path.splitext(template_name)[1].lower()
+            cache_path = os.path.join(self.cache_directory, f'{hashlib.sha256(key).hexdigest()}{extension}')
+            cached[template_name] = (cache_path, len(data), os.path.exists(cache_path))
+            if not cached[template_name][2]:
+                jobs[template_name] = cache_path
+
+        if jobs:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {
+                    template_name: executor.submit(optimize_image, template_name, cache_path, self.quality)
+                    for template_name, cache_path in jobs.items()
+                }
+                for template_name, future in futures.items():
+                    try:
+                        future.result()
+                    except Exception as error:
+                        logging.warning(f'Optimizing {template_name} failed, uploading it as written -> {error}')
+                        del cached[template_name]
+
+        upload_paths = {}
+        for template_name, (cache_path, size, was_cached) in cached.items():
+            optimized_size = os.path.getsize(cache_path)
+            if optimized_size:
+                upload_paths[template_name] = cache_path
+            self.results.append((template_name, size, optimized_size or size, was_cached))
+        return upload_paths
+
+    def report(self):
+        """Lines of the bytes saved for shoppers by the optimized images since the last report."""
+        results, self.results = self.results, []
+        if not results:
+            return []
+
+        total_size = sum(result[1] for result in results)
+        total_saved = total_size - sum(result[2] for result in results)
+        optimized_count = sum(1 for result in results if result[2] < result[1])
+        cached_count = sum(1 for result in results if result[3])
+        return [
+            f'Optimized {optimized_count} of {len(results)} images ({cached_count} from cache), saved '
+            f'{format_size(total_saved)} of {format_size(total_size)} '
+            f'({100 * total_saved / total_size if total_size else 0:.0f}%)'
+        ]
@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+
+
+class JSONLinesFile:
+    """
+    A file of JSON lines which is only appended to, each write is flushed so the lines survive the process
+    being killed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def read_entries(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as lines_file:
+            for line in lines_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # the last line is cut when the process was killed while writing it
+                    continue
+
+    def append(self, entries):
+        """Write and flush the entries, the caller holds the lock."""
+        if self._file is None:
+            dirs = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.exists(dirs):
+                os.makedirs(dirs)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        for entry in entries:
+            self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Journal(JSONLinesFile):
+    """
+    Record the templates completed by a push or pull as JSON lines, flushed one by one, so a run
+    stopped by Ctrl+C or a network error can be resumed where it stopped with `--resume`.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.completed = {}
+
+    def load(self):
+        self.completed = {}
+        for entry in self.read_entries():
+            self.completed[entry['name']] = entry.get('state', {})
+        return self.completed
+
+    def is_completed(self, name, **state):
+        return name in self.completed and self.completed[name] == state
+
+    def record(self, name, **state):
+        with self._lock:
+            self.append([{'name': name, 'state': state}])
+            self.completed[name] = state
+
+    def clear(self):
+        """Forget the completed templates, e.g. once the run finished or when a new run starts."""
+        self.close()
+        self.completed = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, unquote, urlparse
+
+from ntk.conf import MEDIA_FILE_EXTENSIONS
+from ntk.utils import atomic_write
+
+THEMES_FILE = 'themes.json'
+THEMES_PATH = re.compile(r'^/api/admin/themes/$')
+TEMPLATES_PATH = re.compile(r'^/api/admin/themes/(\d+)/templates/$')
+
+
+def get_local_root(store):
+    if store.startswith('file://'):
+        return os.path.abspath(unquote(urlparse(store).path))
+    return os.path.abspath(os.path.expanduser(store))
+
+
+class LocalResponse:
+    """The attributes of a requests response which ntk uses, for a request served from disk."""
+
+    def __init__(self, status_code, content=b'', body=None, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.request = SimpleNamespace(body=body)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+
+def json_response(status_code, data, body=None):
+    return LocalResponse(
+        status_code, json.dumps(data).encode('utf-8'), body=body, headers={'content-type': 'application/json'})
+
+
+def not_found(body=None):
+    return json_response(404, {'detail': 'Not found.'}, body=body)
+
+
+class LocalSession:
+    """
+    Serve the requests of the theme API from a directory instead of a store, each theme is a directory named
+    by its id next to `themes.json`. Push, pull, watch and status run at disk speed through the same code and
+    metrics as over HTTP, e.g. for offline demos or as a baseline of the network time.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, data=None, files=None):
+        parsed_url = urlparse(url)
+        query = parse_qs(parsed_url.query)
+        template_name = query['name'][0] if 'name' in query else None
+        if THEMES_PATH.match(parsed_url.path):
+            if method == 'GET':
+                return json_response(200, {'results': self._get_themes()})
+            if method == 'POST':
+                return self._create_theme((data or {}).get('name'))
+        elif TEMPLATES_PATH.match(parsed_url.path):
+            theme_id = int(TEMPLATES_PATH.match(parsed_url.path).group(1))
+            if method == 'GET' and template_name:
+                return self._get_template(theme_id, template_name)
+            if method == 'GET':
+                return json_response(200, self._get_templates(theme_id))
+            if method == 'POST':
+                return self._create_or_update_template(theme_id, data or {}, files or {})
+            if method == 'DELETE' and template_name:
+                return self._delete_template(theme_id, template_name)
+        elif method in ['GET', 'HEAD']:
+            # media files, and the root itself to check the store is reachable
+            return self._get_file(unquote(parsed_url.path), headers or {}, method == 'HEAD')
+        return json_response(405, {'detail': f'Method "{method}" not allowed.'})
+
+    def _get_themes(self):
+        themes_path = os.path.join(self.root, THEMES_FILE)
+        themes = {}
+        if os.path.exists(themes_path):
+            with open(themes_path, 'r', encoding='utf-8') as themes_file:
+                themes = {theme['id']: theme for theme in json.load(themes_file)}
+        # directories copied into the root without themes.json
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if name.isdigit() and int(name) not in themes:
+                    themes[int(name)] = {'id': int(name), 'name': f'Theme {name}', 'active': False}
+        return sorted(themes.values(), key=lambda theme: theme['id'])
+
+    def _create_theme(self, name):
+        if not name:
+            return json_response(400, {'name': ['This field is required.']})
+        with self._lock:
+            themes = self._get_themes()
+            theme = {'id': max([theme['id'] for theme in themes], default=0) + 1, 'name': name, 'active': False}
+            os.makedirs(os.path.join(self.root, str(theme['id'])))
+            with atomic_write(os.path.join(self.root, THEMES_FILE), encoding='utf-8') as themes_file:
+                json.dump(themes + [theme], themes_file)
+        return json_response(201, theme, body=name)
+
+    def _get_path(self, theme_id, template_name):
+        theme_directory = os.path.join(self.root, str(theme_id))
+        path = os.path.abspath(os.path.join(theme_directory, template_name))
+        # a template name can't leave the directory of its theme
+        if os.path.commonpath([theme_directory, path]) != theme_directory:
+            return None
+        return path
+
+    def _read_template(self, theme_id, template_name, path):
+        template = {'theme': theme_id, 'name': template_name, 'content': '', 'file': None}
+        if template_name.endswith(tuple(MEDIA_FILE_EXTENSIONS)):
+            template['file'] = Path(path).as_uri()
+        else:
+            with open(path, 'r', encoding='utf-8') as template_file:
+                template['content'] = template_file.read()
+        return template
+
+    def _get_template(self, theme_id, template_name):
+        path = self._get_path(theme_id, template_name)
+        if not path or not os.path.isfile(path):
+            return not_found()
+        return json_response(200, self._read_template(theme_id, template_name, path))
+
+    def _get_templates(self, theme_id):
+        theme_directory = os.path.join(self.root, str(theme_id))
+        templates = []
+        for directory, _, filenames in sorted(os.walk(theme_directory)):
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                template_name = Path(os.path.relpath(path, theme_directory)).as_posix()
+                templates.append(self._read_template(theme_id, template_name, path))
+        return templates
+
+    def _create_or_update_template(self, theme_id, data, files):
+        template_name = data.get('name')
+        path = self._get_path(theme_id, template_name or '')
+        if not template_name or not path:
+            return json_response(400, {'name': ['This field is required.']})
+
+        if 'file' in files:
+            content = files['file'][1]
+            content = content if isinstance(content, bytes) else content.read()
+        else:
+            content = (data.get('content') or '').encode('utf-8')
+        # the first push into an empty mirror creates the directory of the theme
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path, 'wb') as template_file:
+            template_file.write(content)
+        return json_response(201, self._read_template(theme_id, template_name, path), body=content)
+
+    def _delete_template(self, theme_id, template_name):
+        path = self._get_path(theme_id, template_name)
+        if not path or not os.path.isfile(path):
+            return not_found()
+        os.remove(path)
+        return LocalResponse(204)
+
+    def _get_file(self, path, headers, head=False):
+        path = os.path.abspath(path)
+        if os.path.commonpath([self.root, path]) != self.root:
+            return not_found()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return not_found()
+        if not os.path.isfile(path):
+            return LocalResponse(200)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if headers.get('If-None-Match') == etag:
+            return LocalResponse(304, headers={'etag': etag})
+        content = b''
+        if not head:
+            with open(path, 'rb') as media_file:
+                content = media_file.read()
+        return LocalResponse(200, content, headers={'etag': etag})
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlparse
+
+from ntk.utils import format_size
+
+# upper bounds in milliseconds of the request latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000]
+METRICS_PHASES = ['discovery', 'sass', 'io', 'network']
+
+
+def get_endpoint(method, url):
+    """Group a request url into an endpoint, e.g. `GET /api/admin/themes/{id}/templates/`."""
+    parsed_url = urlparse(url)
+    if parsed_url.path.startswith('/api/'):
+        path = re.sub(r'/\d+(?=/|$)', '/{id}', parsed_url.path)
+    else:
+        # media files are downloaded from the storage domain, one path per file
+        path = f'{parsed_url.netloc}/*'
+    return f'{method} {path}'
+
+
+def get_body_size(body):
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    return 0
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, elapsed, ok=True):
+        milliseconds = elapsed * 1000
+        self.count += 1
+        self.errors += 0 if ok else 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if milliseconds <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, percent):
+        """Upper bound in milliseconds of the histogram bucket holding the given percentile."""
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else round(self.max)
+        return 0
+
+    def to_dict(self):
+        histogram = {f'le_{bound}ms': count for bound, count in zip(LATENCY_BUCKETS, self.buckets)}
+        histogram['inf'] = self.buckets[-1]
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total / self.count, 2) if self.count else 0,
+            'max_ms': round(self.max, 2),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'histogram': histogram,
+        }
+
+
+class Metrics:
+    """
+    Collect request counts, transferred bytes, latencies and time per phase of a command run.
+    When a tracer is set, every timed block and request is also recorded as a trace span.
+    """
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        # requests multiplexed over an HTTP/2 connection, see create_session
+        self.http2_requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.endpoints = {}
+        self.phases = dict.fromkeys(METRICS_PHASES, 0.0)
+
+    @contextmanager
+    def timer(self, phase, name=None, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add_time(phase, elapsed)
+            if self.tracer:
+                self.tracer.add_span(name or phase, phase, start, elapsed, **args)
+
+    def add_time(self, phase, elapsed):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    def record_request(self, method, url, response, elapsed, throttled=False, template_name=None):
+        endpoint = get_endpoint(method, url)
+        request = getattr(response, 'request', None)
+        sent = get_body_size(getattr(request, 'body', None))
+        received = get_body_size(getattr(response, 'content', None))
+
+        with self._lock:
+            self.requests += 1
+            self.throttled += 1 if throttled else 0
+            self.http2_requests += 1 if getattr(response, 'http_version', None) == 'HTTP/2' else 0
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.phases['network'] += elapsed
+            self.endpoints.setdefault(endpoint, EndpointMetrics()).add(elapsed, ok=bool(response.ok))
+
+        if self.tracer:
+            if not template_name:
+                template_name = parse_qs(urlparse(url).query).get('name', [None])[0]
+            self.tracer.add_span(
+                endpoint, 'network', time.perf_counter() - elapsed, elapsed, template=template_name,
+                status=getattr(response, 'status_code', None), throttled=throttled or None)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'elapsed': round(self.elapsed, 3),
+                'requests': self.requests,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'http2_requests': self.http2_requests,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'phases': {phase: round(elapsed, 3) for phase, elapsed in self.phases.items()},
+                'endpoints': {endpoint: metrics.to_dict() for endpoint, metrics in sorted(self.endpoints.items())},
+            }
+
+    def summary(self):
+        """Human readable summary lines of the collected metrics."""
+        metrics = self.to_dict()
+        lines = [
+            f'Finished in {metrics["elapsed"]:.2f}s: {metrics["requests"]} requests, {metrics["retries"]} retries, '
+            f'{metrics["throttled"]} throttled, {format_size(metrics["bytes_sent"])} sent, '
+            f'{format_size(metrics["bytes_received"])} received',
+            'Time split: ' + ', '.join(f'{phase} {elapsed:.2f}s' for phase, elapsed in metrics['phases'].items()),
+        ]
+        if metrics['http2_requests']:
+            lines.append(f'HTTP/2: {metrics["http2_requests"]} of {metrics["requests"]} requests multiplexed')
+        for endpoint, endpoint_metrics in metrics['endpoints'].items():
+            lines.append(
+                f'{endpoint} {endpoint_metrics["count"]} requests, {endpoint_metrics["errors"]} errors, '
+                f'avg {endpoint_metrics["avg_ms"]:.0f}ms, p50 <={endpoint_metrics["p50_ms"]}ms, '
+                f'p95 <={endpoint_metrics["p95_ms"]}ms, max {endpoint_metrics["max_ms"]:.0f}ms')
+        return lines
+
+    def save(self, path):
+        dirs = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(dirs):
+            os.makedirs(dirs)
+        with open(path, 'w', encoding='utf-8') as metrics_file:
+            json.dump(self.to_dict(), metrics_file, indent=2)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from ntk.conf import ASSETS_DIRECTORY, MINIFY_CACHE_DIRECTORY, MINIFY_EXTENSIONS
+from ntk.utils import atomic_write, format_size
+
+# part of the cache key, bump it when the output of a minifier changes
+MINIFY_VERSION = 1
+
+
+def minify_css(content):
+    import sass
+
+    # plain css is valid scss, libsass compresses it like the compiled sass
+    return sass.compile(string=content, output_style='compressed')
+
+
+def minify_js(content):
+    # optional dependency, python -m pip install "next-theme-kit[minify]"
+    import rjsmin
+
+    return rjsmin.jsmin(content)
+
+
+def minify_json(content):
+    return json.dumps(json.loads(content), ensure_ascii=False, separators=(',', ':'))
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+    '.json': minify_json,
+}
+
+
+class Minifier:
+    """
+    Minify css, js and json assets before they are uploaded, the local files are left untouched.
+    Outputs are cached by the hash of their source, so unchanged files are not minified again.
+    """
+
+    def __init__(self, cache_directory=MINIFY_CACHE_DIRECTORY):
+        self.cache_directory = cache_directory
+        self.results = []
+        self._lock = threading.Lock()
+        self._missing = set()
+
+    def can_minify(self, template_name):
+        return template_name.split('/')[0] == ASSETS_DIRECTORY and template_name.endswith(tuple(MINIFY_EXTENSIONS))
+
+    def minify(self, template_name, content):
+        """Minified content of the template, or the content as written when it can't be minified."""
+        if not self.can_minify(template_name):
+            return content
+
+        extension = os.path.splitext(template_name)[1]
+        digest = hashlib.sha256(f'{MINIFY_VERSION}{extension}:{content}'.encode('utf-8')).hexdigest()
+        cache_path = os.path.join(self.cache_directory, f'{digest}{extension}')
+
+        cached = os.path.exists(cache_path)
+        if cached:
+            with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                minified = cache_file.read()
+        else:
+            try:
+                minified = MINIFIERS[extension](content)
+            except ImportError as error:
+                with self._lock:
+                    if extension not in self._missing:
+                        self._missing.add(extension)
+                        logging.warning(f'{extension} files are uploaded as written, {error}')
+                return content
+            except Exception as error:
+                logging.warning(f'Minifying {template_name} failed, uploading it as written -> {error}')
+                return content
+
+            os.makedirs(self.cache_directory, exist_ok=True)
+            with atomic_write(cache_path, encoding='utf-8') as cache_file:
+                cache_file.write(minified)
+
+        if len(minified) >= len(content):
+            minified = content
+        with self._lock:
+            self.results.append(
+                (template_name, len(content.encode('utf-8')), len(minified.encode('utf-8')), cached))
+        return minified
+
+    def report(self):
+        """Lines of the bytes saved by each minified file since the last report."""
+        with self._lock:
+            results, self.results = self.results, []
+        if not results:
+            return []
+
+        lines = []
+        for template_name, size, minified_size, cached in results:
+            saved = size - minified_size
+            lines.append(
+                f'Minified {template_name} {format_size(size)} -> {format_size(minified_size)}, '
+                f'saved {format_size(saved)} ({100 * saved / size if size else 0:.0f}%)'
+                + (' from cache' if cached else ''))
+        total_size = sum(result[1] for result in results)
+        total_saved = total_size - sum(result[2] for result in results)
+        cached_count = sum(1 for result in results if result[3])
+        lines.append(
+            f'Minified {len(results)} files ({cached_count} from cache), saved {format_size(total_saved)} '
+            f'of {format_size(total_size)}')
+        return lines
@@ -1,6 +1,7 @@
 import argparse
 
 from ntk.command import Command
+from ntk.conf import DAEMON_SOCKET, DEFAULT_WORKERS, PROFILE_OUTPUT
 
 
 class Parser:
@@ -14,6 +15,53 @@ class Parser:
         parser.add_argument('-e', '--env', action="store", dest="env", default='development', help=argparse.SUPPRESS)
         parser.add_argument(
             '-sos', '--sass_output_style', action="store", dest="sass_output_style", help=argparse.SUPPRESS)
+        self._add_global_arguments(parser, subcommand=True)
+
+    def _add_global_arguments(self, parser, subcommand=False):
+        # subcommands must not override values already parsed by the top-level parser
+        defaults = {
+            'profile': argparse.SUPPRESS if subcommand else False,
+            'profile_output': argparse.SUPPRESS if subcommand else PROFILE_OUTPUT,
+            'metrics_json': argparse.SUPPRESS if subcommand else None,
+            'trace': argparse.SUPPRESS if subcommand else None,
+            'http2': argparse.SUPPRESS if subcommand else False,
+        }
+        parser.add_argument(
+            '--profile', action="store_true", dest="profile", default=defaults['profile'], help=argparse.SUPPRESS)
+        parser.add_argument(
+            '--profile_output', action="store", dest="profile_output", default=defaults['profile_output'],
+            help=argparse.SUPPRESS)
+        parser.add_argument(
+            '--metrics_json', action="store", dest="metrics_json", default=defaults['metrics_json'],
+            help=argparse.SUPPRESS)
+        parser.add_argument(
+            '--trace', action="store", dest="trace", default=defaults['trace'], help=argparse.SUPPRESS)
+        parser.add_argument(
+            '--http2', action="store_true", dest="http2", default=defaults['http2'], help=argparse.SUPPRESS)
+
+    def _add_resume_argument(self, parser):
+        parser.add_argument('--resume', action="store_true", dest="resume", default=False, help=argparse.SUPPRESS)
+
+    def _add_workers_argument(self, parser):
+        parser.add_argument(
+            '--workers', action="store", type=int, dest="workers", default=DEFAULT_WORKERS, help=argparse.SUPPRESS)
+
+    def _add_continue_on_error_argument(self, parser):
+        parser.add_argument(
+            '--continue_on_error', action="store_true", dest="continue_on_error", default=False,
+            help=argparse.SUPPRESS)
+
+    def _add_skip_validation_argument(self, parser):
+        parser.add_argument(
+            '--skip_validation', action="store_true", dest="skip_validation", default=False, help=argparse.SUPPRESS)
+
+    def _add_minify_argument(self, parser):
+        parser.add_argument('--minify', action="store_true", dest="minify", default=False, help=argparse.SUPPRESS)
+
+    def _add_images_arguments(self, parser):
+        parser.add_argument(
+            '--optimize_images', action="store_true", dest="optimize_images", default=False, help=argparse.SUPPRESS)
+        parser.add_argument('--image_quality', action="store", type=int, dest="image_quality", help=argparse.SUPPRESS)
 
     def create_parser(self):
         option_commands = '''
@@ -22,7 +70,28 @@ options:
     -s, --store                  Full domain of the store
     -t, --theme_id               ID of the theme
     -e, --env                    Environment to run the command (default [development])
-    -sos, --sass_output_style    Specify Sass output style: nested, expanded, compact, or compressed'''
+    -sos, --sass_output_style    Specify Sass output style: nested, expanded, compact, or compressed
+    --profile                    Profile CPU time and memory allocations of the command
+    --profile_output             Path prefix of the profile reports (default [.ntk/profile])
+    --metrics_json               Write the performance metrics of push, pull, checkout or watch to a JSON file
+    --trace                      Write a Chrome trace-event JSON file of push, pull, checkout or watch
+    --http2                      Multiplex the requests over one HTTP/2 connection when the store supports it,
+                                 requires the http2 extra'''
+        resume_option = '''
+    --resume                     Continue an interrupted run, skipping the files it already completed'''
+        skip_validation_option = '''
+    --skip_validation            Upload json and html files without checking first that the json parses and the
+                                 template tags are closed'''
+        minify_option = '''
+    --minify                     Minify css, js and json files of assets before upload, your local files are
+                                 left untouched'''
+        images_option = '''
+    --optimize_images            Recompress png images of assets losslessly before upload, your local files are
+                                 left untouched
+    --image_quality              Also recompress jpeg images of assets with this quality from 1 to 95, lossy'''
+        continue_on_error_option = '''
+    --continue_on_error          Keep going past failed files, retry them with backoff at the end of the run and
+                                 exit with status 1 when some still fail'''
 
         # create the top-level parser
         parser = argparse.ArgumentParser(
@@ -35,15 +104,20 @@ available commands:
     list         List all available themes on the store
     checkout     Pull theme from the store into your current directory and create config.yml
     pull         Pull theme from the store into your current directory
+    status       Show which files a push would add or modify, without transferring them (alias diff)
     push         Push all theme files from your current direcotry to the store
     watch        Watch for changes in your current directory and push updates to the store
+    daemon       Keep the config and connections warm and push, pull or delete the files sent by ntk-client
     sass         Process Sass files to CSS files in assets directory
+    cache        Evict the least recently used downloaded media files (ntk cache gc)
+    bench        Generate synthetic themes and time the local steps of push, pull and watch on them
 ''' + option_commands,
             usage=argparse.SUPPRESS,
             epilog='Use "ntk [command] --help" for more information about a command.',
             formatter_class=argparse.RawTextHelpFormatter,
             add_help=argparse.SUPPRESS
         )
+        self._add_global_arguments(parser)
         subparsers = parser.add_subparsers(title='Available Commands', help=argparse.SUPPRESS)
 
         # create the parser for the "init" command
@@ -81,10 +155,20 @@ Usage:
             description='''
 Usage:
     ntk checkout [options]
-''' + option_commands,
+''' + option_commands + '''
+    --theme_ids                  Checkout comma separated theme ids concurrently, each into a directory named by
+                                 its theme id, e.g. --theme_ids 1,2,3
+    --all_themes                 Checkout every theme on the store concurrently, see also --theme_ids
+    --workers                    Number of concurrent downloads of --theme_ids and --all_themes (default [4])'''
+            + resume_option,
             formatter_class=argparse.RawTextHelpFormatter)
         parser_checkout.set_defaults(func=self.command.checkout)
         self._add_config_arguments(parser_checkout)
+        self._add_resume_argument(parser_checkout)
+        parser_checkout.add_argument('--theme_ids', action="store", dest="theme_ids", help=argparse.SUPPRESS)
+        parser_checkout.add_argument(
+            '--all_themes', action="store_true", dest="all_themes", default=False, help=argparse.SUPPRESS)
+        self._add_workers_argument(parser_checkout)
 
         # create the parser for the "pull" command
         parser_pull = subparsers.add_parser(
@@ -94,11 +178,28 @@ Usage:
             description='''
 Usage:
     ntk pull [options] [Filename ...]
-''' + option_commands,
+''' + option_commands + resume_option + '''
+    --workers                    Number of concurrent downloads of the files named by filenames (default [4])''',
             formatter_class=argparse.RawTextHelpFormatter)
         parser_pull.set_defaults(func=self.command.pull)
         parser_pull.add_argument('filenames', metavar='filenames', type=str, nargs='*', help=argparse.SUPPRESS)
         self._add_config_arguments(parser_pull)
+        self._add_resume_argument(parser_pull)
+        self._add_workers_argument(parser_pull)
+
+        # create the parser for the "status" command
+        parser_status = subparsers.add_parser(
+            'status',
+            aliases=['diff'],
+            help='Compare your current directory with the theme',
+            usage=argparse.SUPPRESS,
+            description='''
+Usage:
+    ntk status [options]
+''' + option_commands,
+            formatter_class=argparse.RawTextHelpFormatter)
+        parser_status.set_defaults(func=self.command.status)
+        self._add_config_arguments(parser_status)
 
         # create the parser for the "push" command
         parser_push = subparsers.add_parser(
@@ -108,11 +209,29 @@ Usage:
             description='''
 Usage:
     ntk push [options] [Filename ...]
-''' + option_commands,
+''' + option_commands + '''
+    --all_envs                   Push to every environment in config.yml, see also -e/--env with comma separated
+                                 environments, e.g. -e staging,production
+    --prune                      Delete the files of the theme which don't exist in your current directory, the
+                                 files are listed before the push and deleted once the push succeeded
+    --dry_run                    With --prune, only list the files to delete, nothing is pushed or deleted
+    --workers                    Number of concurrent deletes of --prune (default [4])'''
+            + resume_option + continue_on_error_option + skip_validation_option + minify_option + images_option,
             formatter_class=argparse.RawTextHelpFormatter)
         parser_push.set_defaults(func=self.command.push)
         parser_push.add_argument('filenames', metavar='filenames', type=str, nargs='*', help=argparse.SUPPRESS)
         self._add_config_arguments(parser_push)
+        parser_push.add_argument(
+            '--all_envs', action="store_true", dest="all_envs", default=False, help=argparse.SUPPRESS)
+        self._add_resume_argument(parser_push)
+        self._add_continue_on_error_argument(parser_push)
+        self._add_skip_validation_argument(parser_push)
+        self._add_minify_argument(parser_push)
+        self._add_images_arguments(parser_push)
+        parser_push.add_argument('--prune', action="store_true", dest="prune", default=False, help=argparse.SUPPRESS)
+        parser_push.add_argument(
+            '--dry_run', action="store_true", dest="dry_run", default=False, help=argparse.SUPPRESS)
+        self._add_workers_argument(parser_push)
 
         # create the parser for the "watch" command
         parser_watch = subparsers.add_parser(
@@ -122,10 +241,34 @@ Usage:
             description='''
 Usage:
     ntk watch [options]
-''' + option_commands,
+''' + option_commands + continue_on_error_option + skip_validation_option + minify_option + images_option,
             formatter_class=argparse.RawTextHelpFormatter)
         parser_watch.set_defaults(func=self.command.watch)
         self._add_config_arguments(parser_watch)
+        self._add_continue_on_error_argument(parser_watch)
+        self._add_skip_validation_argument(parser_watch)
+        self._add_minify_argument(parser_watch)
+        self._add_images_arguments(parser_watch)
+
+        # create the parser for the "daemon" command
+        parser_daemon = subparsers.add_parser(
+            'daemon',
+            help='Serve push, pull and delete requests of ntk-client',
+            usage=argparse.SUPPRESS,
+            description='''
+Usage:
+    ntk daemon [options]
+''' + option_commands + '''
+    --socket                     Path of the Unix socket to listen on (default [.ntk/daemon.sock])'''
+            + skip_validation_option + minify_option + images_option,
+            formatter_class=argparse.RawTextHelpFormatter)
+        parser_daemon.set_defaults(func=self.command.daemon)
+        self._add_config_arguments(parser_daemon)
+        self._add_skip_validation_argument(parser_daemon)
+        self._add_minify_argument(parser_daemon)
+        self._add_images_arguments(parser_daemon)
+        parser_daemon.add_argument(
+            '--socket', action="store", dest="socket_path", default=DAEMON_SOCKET, help=argparse.SUPPRESS)
 
         # create the parser for the "sass" command
         parser_watch = subparsers.add_parser(
@@ -139,4 +282,47 @@ Usage:
             formatter_class=argparse.RawTextHelpFormatter)
         parser_watch.set_defaults(func=self.command.compile_sass)
         self._add_config_arguments(parser_watch)
+
+        # create the parser for the "cache" command
+        parser_cache = subparsers.add_parser(
+            'cache',
+            help='Manage the store of downloaded media files shared by all themes',
+            usage=argparse.SUPPRESS,
+            description='''
+Usage:
+    ntk cache gc [options]
+
+options:
+    --max_size                   Evict the least recently used files until the store holds at most this many
+                                 megabytes (default [1024])''',
+            formatter_class=argparse.RawTextHelpFormatter)
+        parser_cache.set_defaults(func=self.command.cache)
+        parser_cache.add_argument('action', choices=['gc'], help=argparse.SUPPRESS)
+        parser_cache.add_argument('--max_size', action="store", type=int, dest="max_size", help=argparse.SUPPRESS)
+
+        # create the parser for the "bench" command
+        parser_bench = subparsers.add_parser(
+            'bench',
+            help='Generate synthetic themes and benchmark the local steps of push, pull and watch',
+            usage=argparse.SUPPRESS,
+            description='''
+Usage:
+    ntk bench generate DIRECTORY [options]
+    ntk bench run [DIRECTORY] [options]
+
+options:
+    --files                      Number of files of the generated theme (default [1000])
+    --sizes                      Comma separated numbers of files of the benchmarked themes
+                                 (default [100,1000,10000,50000])
+    --seed                       Seed of the generated themes, the same seed generates the same theme (default [0])
+    --output                     Write the seconds of each step by theme size into this JSON file''',
+            formatter_class=argparse.RawTextHelpFormatter)
+        parser_bench.set_defaults(func=self.command.bench)
+        parser_bench.add_argument('action', choices=['generate', 'run'], help=argparse.SUPPRESS)
+        parser_bench.add_argument('directory', nargs='?', help=argparse.SUPPRESS)
+        parser_bench.add_argument(
+            '--files', action="store", type=int, dest="files", default=1000, help=argparse.SUPPRESS)
+        parser_bench.add_argument('--sizes', action="store", dest="sizes", help=argparse.SUPPRESS)
+        parser_bench.add_argument('--seed', action="store", type=int, dest="seed", default=0, help=argparse.SUPPRESS)
+        parser_bench.add_argument('--output', action="store", dest="output", help=argparse.SUPPRESS)
         return parser
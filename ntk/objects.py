@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from ntk.conf import OBJECTS_DIRECTORY, OBJECTS_MAX_SIZE
+from ntk.utils import atomic_write, format_size
+
+INDEX_FILE = 'index.json'
+
+
+class ObjectStore:
+    """
+    Content-addressed store of the downloaded media files, shared by all themes and directories. Files are
+    kept by the sha256 of their content, with the url they were downloaded from and its validators, so the
+    next download of the url is a conditional request answered from the store when the file didn't change.
+    The least recently used files are evicted once the store outgrows `max_size` bytes.
+    """
+
+    def __init__(self, directory=OBJECTS_DIRECTORY, max_size=OBJECTS_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.added_size = 0
+        self._urls = None
+        self._changed = False
+        self._lock = threading.Lock()
+
+    def _get_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def _load(self):
+        if self._urls is not None:
+            return self._urls
+        self._urls = {}
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as index_file:
+                    self._urls = json.load(index_file)
+            except (OSError, ValueError) as error:
+                logging.warning(f'Ignoring the index of the object store {index_path} -> {error}')
+        return self._urls
+
+    def get_validators(self, url):
+        """Headers of a conditional request of the url, empty when the store doesn't hold its content."""
+        with self._lock:
+            entry = self._load().get(url)
+        if not entry or not os.path.exists(self._get_path(entry['digest'])):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, url):
+        """Content of the url held by the store, marked as recently used."""
+        with self._lock:
+            path = self._get_path(self._load()[url]['digest'])
+        with open(path, 'rb') as object_file:
+            data = object_file.read()
+        os.utime(path)
+        return data
+
+    def add(self, url, data, etag=None, last_modified=None):
+        """Keep the content downloaded from the url, returns its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._get_path(digest)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with atomic_write(path, 'wb') as object_file:
+                    object_file.write(data)
+                self.added_size += len(data)
+            self._load()[url] = {'digest': digest, 'etag': etag, 'last_modified': last_modified}
+            self._changed = True
+        return digest
+
+    def save(self):
+        """Write the index of the urls, evicting the least recently used files when the store grew too large."""
+        with self._lock:
+            if not self._changed:
+                return
+            self._write_index()
+            self._changed = False
+            added_size, self.added_size = self.added_size, 0
+        if added_size:
+            self.gc()
+
+    def gc(self, max_size=None):
+        """
+        Remove the least recently used files until the store holds at most `max_size` bytes, and the urls
+        of the removed files. Returns the number of removed files and their size.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        objects = self._get_objects()
+        total_size = sum(size for _, size, _ in objects)
+        removed_count = removed_size = 0
+        for _, size, path in sorted(objects):
+            if total_size - removed_size <= max_size:
+                break
+            os.remove(path)
+            removed_count += 1
+            removed_size += size
+
+        if removed_count:
+            with self._lock:
+                urls = self._load()
+                for url, entry in list(urls.items()):
+                    if not os.path.exists(self._get_path(entry['digest'])):
+                        del urls[url]
+                self._write_index()
+            logging.info(
+                f'Evicted {removed_count} files ({format_size(removed_size)}) from the object store '
+                f'{self.directory}, {format_size(total_size - removed_size)} left')
+        return removed_count, removed_size
+
+    def stats(self):
+        """Number of files and total size of the store."""
+        objects = self._get_objects()
+        return len(objects), sum(size for _, size, _ in objects)
+
+    def _get_objects(self):
+        """Last use, size and path of each file of the store."""
+        objects = []
+        for root, _, filenames in os.walk(self.directory):
+            # the index is next to the directories of the files
+            if root == self.directory:
+                continue
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                objects.append((stat.st_mtime, stat.st_size, path))
+        return objects
+
+    def _write_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_write(os.path.join(self.directory, INDEX_FILE), encoding='utf-8') as index_file:
+            json.dump(self._urls, index_file)
@@ -0,0 +1,56 @@
+import json
+import os
+
+from ntk.journal import JSONLinesFile
+from ntk.utils import atomic_write
+
+
+class OfflineQueue(JSONLinesFile):
+    """
+    Uploads and deletes of watch which couldn't reach the store, recorded as JSON lines flushed one by one
+    so they survive a restart of watch. Only the last action of a template is kept, e.g. a file saved several
+    times then deleted while offline is deleted once when the store is reachable again.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        # template name -> 'upload' or 'delete'
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def load(self):
+        self.pending = {}
+        for entry in self.read_entries():
+            self.pending.pop(entry['name'], None)
+            self.pending[entry['name']] = entry['action']
+        return self.pending
+
+    def add(self, action, template_names):
+        with self._lock:
+            self.append([{'name': template_name, 'action': action} for template_name in template_names])
+            for template_name in template_names:
+                # the last change of a template is flushed last
+                self.pending.pop(template_name, None)
+                self.pending[template_name] = action
+
+    def take(self):
+        """
+        Empty the queue and return its entries. The file keeps them until `save`, so a flush interrupted by
+        a crash is replayed by the next watch.
+        """
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        return pending
+
+    def save(self):
+        """Rewrite the file with the pending entries, it is removed once nothing is pending."""
+        self.close()
+        with self._lock:
+            if self.pending:
+                with atomic_write(self.path, encoding='utf-8') as queue_file:
+                    for template_name, action in self.pending.items():
+                        queue_file.write(json.dumps({'name': template_name, 'action': action}) + '\n')
+            elif os.path.exists(self.path):
+                os.remove(self.path)
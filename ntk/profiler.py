@@ -0,0 +1,60 @@
+import cProfile
+import logging
+import os
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_TOP_ALLOCATIONS = 25
+
+
+def write_allocations_report(snapshot, output, peak=0, top=PROFILE_TOP_ALLOCATIONS):
+    """Write the top memory allocations of a tracemalloc snapshot grouped by source line."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+    statistics = snapshot.statistics('lineno')
+    total = sum(stat.size for stat in statistics)
+
+    with open(output, 'w', encoding='utf-8') as report_file:
+        report_file.write(f'Top {top} allocations (peak {peak / 1024:.1f} KiB, total {total / 1024:.1f} KiB)\n\n')
+        for index, stat in enumerate(statistics[:top], 1):
+            frame = stat.traceback[0]
+            report_file.write(
+                f'#{index}: {frame.filename}:{frame.lineno} {stat.size / 1024:.1f} KiB ({stat.count} blocks)\n')
+        other = statistics[top:]
+        if other:
+            other_size = sum(stat.size for stat in other)
+            report_file.write(f'{len(other)} other: {other_size / 1024:.1f} KiB\n')
+
+
+@contextmanager
+def profile(output):
+    """
+    Profile CPU time and memory allocations of the wrapped block.
+    The cProfile stats are written to `<output>.prof` (open with pstats or snakeviz) and
+    the tracemalloc top allocations report to `<output>.memory.txt`.
+    """
+    dirs = os.path.dirname(os.path.abspath(output))
+    if not os.path.exists(dirs):
+        os.makedirs(dirs)
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats_file = f'{output}.prof'
+        memory_file = f'{output}.memory.txt'
+        profiler.dump_stats(stats_file)
+        write_allocations_report(snapshot, memory_file, peak=peak)
+        logging.info(f'Profile stats written to {stats_file}')
+        logging.info(f'Memory allocations report written to {memory_file}')
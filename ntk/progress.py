@@ -0,0 +1,136 @@
+import sys
+import threading
+import time
+
+from ntk.utils import format_size
+
+# seconds between two redraws of the progress bar on a terminal
+PROGRESS_REDRAW_INTERVAL = 0.1
+# seconds between two summary lines when stdout is not a terminal, e.g. in CI logs
+PROGRESS_SUMMARY_INTERVAL = 10
+
+
+class Progress:
+    """
+    Progress of files and bytes with throughput and ETA, updated safely from several workers. The bytes are
+    those sent and received since the start, as counted by `metrics`. On a terminal the bar is redrawn in
+    place at a capped rate, otherwise a summary line is printed every PROGRESS_SUMMARY_INTERVAL seconds and
+    once done.
+    """
+
+    def __init__(self, total=0, prefix='', suffix='', decimals=1, length=50, fill='█', stream=None, metrics=None):
+        self.stream = stream or sys.stdout
+        isatty = getattr(self.stream, 'isatty', None)
+        self.isatty = bool(isatty and isatty())
+        self.interval = PROGRESS_REDRAW_INTERVAL if self.isatty else PROGRESS_SUMMARY_INTERVAL
+        self.prefix = prefix
+        self.suffix = suffix
+        self.decimals = decimals
+        self.length = length
+        self.fill = fill
+
+        self.total = total
+        self.completed = 0
+        self.in_flight = 0
+        self.metrics = metrics
+        self._transferred_at_start = self._get_transferred()
+
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        # the summary lines start after the first interval, the bar is drawn at once
+        self._last_draw = None if self.isatty else self.started
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_total(self, count):
+        """Add items found while the work is already running, e.g. the files of one more listing."""
+        with self._lock:
+            self.total += count
+            self._draw()
+
+    def start(self, count=1):
+        with self._lock:
+            self.in_flight += count
+            self._draw()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.completed += count
+            self.in_flight = max(0, self.in_flight - count)
+            self._draw()
+
+    def close(self):
+        with self._lock:
+            if not self.total:
+                return
+            self._draw(force=True)
+            if self.isatty:
+                self.stream.write('\n')
+                self.stream.flush()
+
+    def format_line(self, now=None):
+        elapsed = (time.monotonic() if now is None else now) - self.started
+        percent = 100 * self.completed / self.total if self.total else 100
+        details = [f'{self.completed}/{self.total} files']
+        size = self._get_transferred() - self._transferred_at_start
+        if size:
+            details.append(f'{format_size(size)} at {format_size(size / elapsed if elapsed else 0)}/s')
+        if self.in_flight:
+            details.append(f'{self.in_flight} in flight')
+        remaining = self.total - self.completed
+        if self.completed and remaining > 0:
+            details.append(f'ETA {elapsed / self.completed * remaining:.0f}s')
+
+        current_time = time.strftime('%Y-%m-%d %H:%M:%S')
+        status = f'{percent:.{self.decimals}f}% {self.suffix} ({", ".join(details)})'
+        if self.isatty:
+            filled_length = int(self.length * self.completed // self.total) if self.total else self.length
+            bar = self.fill * filled_length + '-' * (self.length - filled_length)
+            # clear the rest of the previous, possibly longer, line
+            return f'\r{current_time} INFO {self.prefix} |{bar}| {status}\033[K'
+        return f'{current_time} INFO {self.prefix} {status}\n'
+
+    def _get_transferred(self):
+        if self.metrics is None:
+            return 0
+        return self.metrics.bytes_sent + self.metrics.bytes_received
+
+    def _draw(self, force=False):
+        """Write the progress unless it was written less than `interval` seconds ago, call with the lock held."""
+        if not self.total:
+            return
+        now = time.monotonic()
+        if not force and self._last_draw is not None and now - self._last_draw < self.interval:
+            return
+        self._last_draw = now
+        self.stream.write(self.format_line(now))
+        self.stream.flush()
+
+
+def progress_bar(iterable, prefix='', suffix='', decimals=1, length=100, fill='█', stream=None, metrics=None):
+    """
+    Call in a loop to report the progress of the items of `iterable`
+    @params:
+        iterable    - Required  : items to iterate, with a length (List)
+        prefix      - Optional  : prefix string (Str)
+        suffix      - Optional  : suffix string (Str)
+        decimals    - Optional  : positive number of decimals in percent complete (Int)
+        length      - Optional  : character length of bar (Int)
+        fill        - Optional  : bar fill character (Str)
+        stream      - Optional  : file to write the progress to, stdout by default
+        metrics     - Optional  : metrics counting the transferred bytes (Metrics)
+    """
+    total = len(iterable)
+
+    if total == 0:
+        return
+
+    with Progress(total, prefix=prefix, suffix=suffix, decimals=decimals, length=length, fill=fill,
+                  stream=stream, metrics=metrics) as progress:
+        for item in iterable:
+            yield item
+            progress.advance()
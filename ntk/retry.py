@@ -0,0 +1,46 @@
+import logging
+import time
+
+RETRY_ATTEMPTS = 3
+# seconds to wait before the first retry, doubled on each following attempt
+RETRY_BACKOFF = 2
+
+
+class RetryQueue:
+    """Templates which failed during a run, retried with exponential backoff once the run is done."""
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, backoff=RETRY_BACKOFF):
+        self.attempts = attempts
+        self.backoff = backoff
+        # (action, template name) -> reason of the last failure
+        self.failures = {}
+
+    def add(self, action, template_name, reason):
+        self.failures[(action, template_name)] = reason
+
+    def retry(self, actions, env=None):
+        """
+        Retry the failed templates, `actions` maps an action to a callable which takes the template name
+        and returns the reason of the failure or None on success.
+        """
+        for attempt in range(self.attempts):
+            if not self.failures:
+                break
+            delay = self.backoff * 2 ** attempt
+            logging.info(
+                f'[{env}] Retrying {len(self.failures)} failed files in {delay}s '
+                f'(attempt {attempt + 1} of {self.attempts})')
+            time.sleep(delay)
+            for action, template_name in list(self.failures):
+                try:
+                    reason = actions[action](template_name)
+                except Exception as error:
+                    reason = f'{error}'
+                if reason:
+                    self.failures[(action, template_name)] = reason
+                else:
+                    del self.failures[(action, template_name)]
+        return not self.failures
+
+    def clear(self):
+        self.failures = {}
@@ -0,0 +1,36 @@
+import os
+
+from ntk.conf import ASSETS_DIRECTORY, MEDIA_FILE_EXTENSIONS, SASS_SOURCE
+from ntk.utils import get_template_name
+
+# upload priorities, the theme is usable for previews once the first two groups are uploaded
+PRIORITY_TEMPLATES = 0
+PRIORITY_ASSETS = 1
+PRIORITY_MEDIA = 2
+
+
+def get_upload_priority(template_name):
+    """Layouts, templates and other html and json of the theme first, then css and js, media files last."""
+    if template_name.endswith(tuple(MEDIA_FILE_EXTENSIONS)):
+        return PRIORITY_MEDIA
+    if template_name.split('/')[0] in (ASSETS_DIRECTORY, SASS_SOURCE):
+        return PRIORITY_ASSETS
+    return PRIORITY_TEMPLATES
+
+
+def get_file_size(pathfile):
+    try:
+        return os.path.getsize(pathfile)
+    except OSError:
+        return 0
+
+
+def schedule_uploads(template_names):
+    """
+    Order the files to upload by priority, then by size. The uploads to a store are sequential, the smallest
+    files go first so the most files are live soonest.
+    """
+    return sorted(
+        template_names,
+        key=lambda template_name: (
+            get_upload_priority(get_template_name(template_name)), get_file_size(template_name)))
@@ -0,0 +1,58 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    Record spans as Chrome trace events, the saved file can be opened in chrome://tracing or
+    https://ui.perfetto.dev to see where the wall time of a command goes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.threads = {}
+
+    @contextmanager
+    def span(self, name, category, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.perf_counter() - start, **args)
+
+    def add_span(self, name, category, start, duration, **args):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.started) * 1000000, 3),
+            'dur': round(duration * 1000000, 3),
+            'pid': self.pid,
+            'tid': thread.ident,
+            'args': {key: value for key, value in args.items() if value is not None},
+        }
+        with self._lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    def to_dict(self):
+        with self._lock:
+            metadata = [
+                {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in self.threads.items()
+            ]
+            return {'traceEvents': metadata + sorted(self.events, key=lambda event: event['ts'])}
+
+    def save(self, path):
+        dirs = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(dirs):
+            os.makedirs(dirs)
+        with open(path, 'w', encoding='utf-8') as trace_file:
+            json.dump(self.to_dict(), trace_file)
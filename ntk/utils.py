@@ -1,5 +1,7 @@
 import os
+import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
 
 
@@ -7,37 +9,51 @@ def get_template_name(pathfile):
     return Path(os.path.relpath(pathfile)).as_posix()
 
 
-def progress_bar(iterable, prefix='', suffix='', decimals=1, length=100, fill='█', printEnd="\r"):
-    """
-    Call in a loop to create terminal progress bar
-    @params:
-        iteration   - Required  : current iteration (Int)
-        total       - Required  : total iterations (Int)
-        prefix      - Optional  : prefix string (Str)
-        suffix      - Optional  : suffix string (Str)
-        decimals    - Optional  : positive number of decimals in percent complete (Int)
-        length      - Optional  : character length of bar (Int)
-        fill        - Optional  : bar fill character (Str)
-        printEnd    - Optional  : end character (e.g. "\r", "\r\n") (Str)
-    """
-    total = len(iterable)
-
-    if total == 0:
-        return
-
-    # Progress Bar Printing Function
-    def print_progress_bar(iteration):
-        percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
-        filledLength = int(length * iteration // total)
-        bar = fill * filledLength + '-' * (length - filledLength)
-        current_time = time.strftime('%Y-%m-%d %H:%M:%S')
-        print(f'\r{current_time} INFO {prefix} |{bar}| {percent}% {suffix}', end=printEnd)
-
-    # Initial Call
-    print_progress_bar(0)
-    # Update Progress Bar
-    for i, item in enumerate(iterable):
-        yield item
-        print_progress_bar(i + 1)
-    # Print New Line on Complete
-    print()
+def get_file_state(pathfile):
+    """Modification time and size of a file, to tell whether it changed since it was last seen."""
+    stat = os.stat(pathfile)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def is_local_store(store):
+    """Whether the store is a directory mirroring a theme store, given as a file:// url or an existing path."""
+    return bool(store) and (store.startswith('file://') or os.path.isdir(store))
+
+
+@contextmanager
+def atomic_write(path, mode='w', **kwargs):
+    """Write into a temporary file next to `path` and rename it over `path` once completely written."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, mode, **kwargs) as tmp_file:
+            yield tmp_file
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RateLimiter:
+    """Space out the calls of several threads by at least `interval` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(size) < 1024 or unit == 'GB':
+            break
+        size /= 1024
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
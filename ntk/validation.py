@@ -0,0 +1,112 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from ntk.conf import VALIDATE_EXTENSIONS
+
+# fewer files are validated in this process, starting the pool would take longer than validating them
+POOL_THRESHOLD = 64
+# files validated by one task of the pool
+CHUNK_SIZE = 32
+
+# same delimiters as the template engine, a tag doesn't span lines
+TAG_PATTERN = re.compile(r'{%(.*?)%}')
+# comments are removed before the tags are matched, a {# #} comment doesn't span lines either
+COMMENT_PATTERN = re.compile(r'{#.*?#}')
+COMMENT_BLOCK_PATTERN = re.compile(r'{%\s*comment\b.*?%}.*?{%\s*endcomment\s*%}', re.DOTALL)
+# built-in tags closed by an end tag, other tags are not checked
+BLOCK_TAGS = [
+    'autoescape', 'block', 'blocktrans', 'blocktranslate', 'cache', 'comment', 'filter', 'for', 'if', 'ifchanged',
+    'localize', 'localtime', 'spaceless', 'timezone', 'verbatim', 'with',
+]
+# tags allowed between a block tag and its end tag
+BRANCH_TAGS = {
+    'elif': ['if'],
+    'else': ['if', 'for', 'ifchanged'],
+    'empty': ['for'],
+    'plural': ['blocktrans', 'blocktranslate'],
+}
+# the content of these tags is not parsed
+RAW_TAGS = ['comment', 'verbatim']
+
+
+def validate_json(content):
+    try:
+        json.loads(content)
+    except ValueError as error:
+        return f'{error}'
+    return None
+
+
+def _strip_comments(content):
+    """Remove the comments of a template, their newlines are kept so the tags stay on the same lines."""
+    content = COMMENT_PATTERN.sub('', content)
+    return COMMENT_BLOCK_PATTERN.sub(lambda match: '\n' * match.group(0).count('\n'), content)
+
+
+def validate_template(content):
+    """Error of the first unbalanced block tag of the template, e.g. an {% if %} without {% endif %}."""
+    content = _strip_comments(content)
+    # (tag, line) of the open block tags
+    stack = []
+    for match in TAG_PATTERN.finditer(content):
+        line = content.count('\n', 0, match.start()) + 1
+        bits = match.group(1).split()
+        if not bits:
+            return f'Empty tag on line {line}'
+        tag = bits[0]
+        if stack and stack[-1][0] in RAW_TAGS and tag != f'end{stack[-1][0]}':
+            continue
+
+        if tag in BLOCK_TAGS:
+            stack.append((tag, line))
+        elif tag.startswith('end') and tag[3:] in BLOCK_TAGS:
+            if not stack:
+                return f'Unexpected {{% {tag} %}} on line {line}'
+            if stack[-1][0] != tag[3:]:
+                return f'Unexpected {{% {tag} %}} on line {line}, expected {{% end{stack[-1][0]} %}}'
+            stack.pop()
+        elif tag in BRANCH_TAGS and (not stack or stack[-1][0] not in BRANCH_TAGS[tag]):
+            return f'Unexpected {{% {tag} %}} on line {line}'
+
+    if stack:
+        tag, line = stack[-1]
+        return f'Unclosed {{% {tag} %}} on line {line}'
+    return None
+
+
+VALIDATORS = {
+    '.json': validate_json,
+    '.html': validate_template,
+}
+
+
+def validate_file(template_name):
+    """Error of the file, None when it is valid."""
+    try:
+        with open(template_name, 'r', encoding='utf-8') as template_file:
+            content = template_file.read()
+    except (OSError, UnicodeDecodeError) as error:
+        return f'{error}'
+    return VALIDATORS[os.path.splitext(template_name)[1]](content)
+
+
+def _validate_files(template_names):
+    return [(template_name, validate_file(template_name)) for template_name in template_names]
+
+
+def validate_files(template_names, workers=None):
+    """
+    Parse the json files and check the block tags of the html files, in a process pool for large pushes.
+    Returns the error of each invalid file.
+    """
+    template_names = [
+        template_name for template_name in template_names if template_name.endswith(tuple(VALIDATE_EXTENSIONS))]
+    if len(template_names) < POOL_THRESHOLD:
+        results = _validate_files(template_names)
+    else:
+        chunks = [template_names[index:index + CHUNK_SIZE] for index in range(0, len(template_names), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for chunk_results in executor.map(_validate_files, chunks) for result in chunk_results]
+    return {template_name: error for template_name, error in results if error}
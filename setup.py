@@ -8,6 +8,21 @@ tests_require = [
     "pytest-cov",
 ]
 
+# minify js assets of ntk push --minify, css and json are minified without extra dependency
+minify_require = [
+    "rjsmin>=1.2",
+]
+
+# optimize images of ntk push --optimize_images
+images_require = [
+    "Pillow>=9.0",
+]
+
+# multiplex requests over HTTP/2 with --http2
+http2_require = [
+    "httpx[http2]>=0.23",
+]
+
 with open('README.md', 'r') as fh:
     long_description = fh.read()
 
@@ -29,9 +44,11 @@ setup(
     entry_points={
         'console_scripts': [
             'ntk = ntk.__main__:main',
+            'ntk-client = ntk.client:main',
         ],
     },
-    extras_require={"test": tests_require},
+    extras_require={"test": tests_require, "minify": minify_require, "images": images_require,
+                    "http2": http2_require},
     packages=find_packages(),
     python_requires='>=3.10'
 )
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ntk.bench import format_results, generate_theme, get_nested_directory, run_benchmarks
+from ntk.ntk_parser import Parser
+from ntk.validation import validate_files
+
+
+def list_files(directory):
+    return sorted(
+        os.path.relpath(os.path.join(root, filename), directory)
+        for root, _, filenames in os.walk(directory) for filename in filenames)
+
+
+class TestBench(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_get_nested_directory_should_nest_deeper_for_more_files(self):
+        self.assertEqual(get_nested_directory('partials', 5, 8), 'partials')
+        self.assertEqual(get_nested_directory('partials', 9, 64), 'partials/section_1')
+        self.assertEqual(get_nested_directory('partials', 100, 500), 'partials/section_1/section_4')
+        self.assertEqual(get_nested_directory('partials', 0, 10 ** 9).count('/'), 4)
+
+    def test_generate_theme_should_write_same_valid_theme_for_seed(self):
+        first = os.path.join(self.tmp_dir.name, 'first')
+        second = os.path.join(self.tmp_dir.name, 'second')
+
+        counts = generate_theme(first, 200, seed=3)
+        generate_theme(second, 200, seed=3)
+
+        files = list_files(first)
+        self.assertEqual(sum(counts.values()), 200)
+        self.assertEqual(len(files), 200)
+        self.assertEqual(files, list_files(second))
+        for template_name in files:
+            with open(os.path.join(first, template_name), 'rb') as first_file, \
+                    open(os.path.join(second, template_name), 'rb') as second_file:
+                self.assertEqual(first_file.read(), second_file.read())
+        self.assertTrue(any(name.startswith('partials/section_') for name in files))
+        self.assertTrue(any(name.startswith('sass/modules/') for name in files))
+        self.assertTrue(any(name.endswith('.png') for name in files))
+        # the generated templates and json files pass the validation of push
+        self.assertEqual(validate_files([os.path.join(first, template_name) for template_name in files]), {})
+
+    def test_run_benchmarks_should_time_every_step(self):
+        results = run_benchmarks([50], directory=self.tmp_dir.name)
+
+        self.assertEqual(list(results[50]), [
+            'generate', 'discovery', 'template names', 'sass', 'hash', 'hash cached', 'pull writes',
+            'pull unchanged'])
+        # sass compiled into the assets of the theme, the pull wrote every file of the mirror
+        theme_dir = os.path.join(self.tmp_dir.name, '50', 'mirror', '1')
+        self.assertTrue(os.path.exists(os.path.join(theme_dir, 'assets', 'pages', 'page_0.css')))
+        self.assertEqual(
+            list_files(os.path.join(self.tmp_dir.name, '50', 'pull')), list_files(theme_dir))
+        lines = format_results(results)
+        self.assertEqual(len(lines), 9)
+        self.assertTrue(lines[1].startswith('generate'))
+
+    def test_bench_command_should_write_results(self):
+        output = os.path.join(self.tmp_dir.name, 'results.json')
+        ntk_parser = Parser()
+        args = ntk_parser.create_parser().parse_args(
+            ['bench', 'run', self.tmp_dir.name, '--sizes', '20,40', '--output', output])
+
+        with self.assertLogs(level='INFO') as cm:
+            args.func(args)
+
+        with open(output) as output_file:
+            self.assertEqual(list(json.load(output_file)), ['20', '40'])
+        self.assertIn('20 files', cm.output[0])
+
+        args = ntk_parser.create_parser().parse_args(['bench', 'run', '--sizes', '20,x'])
+        with self.assertRaises(TypeError) as error:
+            args.func(args)
+        self.assertEqual(str(error.exception), '[bench] argument --sizes must be comma separated numbers of files.')
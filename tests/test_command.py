@@ -1,11 +1,16 @@
+import glob
 import os
+import tempfile
+import time
 import unittest
 from unittest.mock import call, MagicMock, mock_open, patch
 
 from watchfiles import Change
 
 from ntk import conf
-from ntk.command import Command
+from ntk.command import Command, PULL_LISTING_THRESHOLD, UPLOAD_INTERVAL
+from ntk.objects import ObjectStore
+from ntk.offline import OfflineQueue
 
 
 class TestCommand(unittest.TestCase):
@@ -28,7 +33,22 @@ class TestCommand(unittest.TestCase):
             'apikey': 'abcd1234',
             'theme_id': 1234,
             'store': 'http://development.com',
-            'sass_output_style': 'nested'
+            'sass_output_style': 'nested',
+            'metrics_json': None,
+            'trace': None,
+            'http2': False,
+            'all_envs': False,
+            'theme_ids': None,
+            'all_themes': False,
+            'workers': None,
+            'resume': False,
+            'continue_on_error': False,
+            'skip_validation': False,
+            'prune': False,
+            'dry_run': False,
+            'minify': False,
+            'optimize_images': False,
+            'image_quality': None,
         }
         with patch('builtins.open', mock_open(read_data='yaml data')):
             self.parser = MagicMock(**config)
@@ -37,6 +57,18 @@ class TestCommand(unittest.TestCase):
             self.mock_file = mock_open(read_data='{% load i18n %}\n\n<div class=\"mt-2\">My home page</div>')
             self.mock_gateway = mock_gateway
 
+        # the journal of push and pull is tested in test_journal, keep it off the disk here
+        journal_patcher = patch('ntk.command.Journal', autospec=True)
+        self.mock_journal = journal_patcher.start()
+        self.mock_journal.return_value.completed = {}
+        self.addCleanup(journal_patcher.stop)
+        file_state_patcher = patch('ntk.command.get_file_state', return_value={'mtime_ns': 1, 'size': 53})
+        file_state_patcher.start()
+        self.addCleanup(file_state_patcher.stop)
+        # the object store is tested in test_objects, keep it off the disk here
+        self.command.object_store = MagicMock(spec=ObjectStore)
+        self.command.object_store.get_validators.return_value = {}
+
     #####
     # init
     #####
@@ -192,7 +224,8 @@ class TestCommand(unittest.TestCase):
                 "file": None
             }
         ]
-        self.mock_gateway.return_value._request.return_value.content = b'\xc2\x89'
+        self.mock_gateway.return_value._request.return_value = MagicMock(
+            ok=True, status_code=200, headers={}, content=b'\xc2\x89')
 
         self.parser.filenames = None
         self.command.checkout(self.parser)
@@ -219,6 +252,89 @@ class TestCommand(unittest.TestCase):
 
         mock_write_config.assert_called_once()
 
+    @patch("os.makedirs", autospec=True)
+    @patch("builtins.open", autospec=True)
+    @patch("ntk.command.create_session", autospec=True)
+    @patch("ntk.command.dump_configs", autospec=True)
+    @patch("ntk.command.Config.write_config", autospec=True)
+    def test_checkout_command_with_theme_ids_should_download_every_theme_into_its_directory(
+        self, mock_write_config, mock_dump_configs, mock_create_session, mock_open_file, mock_makedirs
+    ):
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {
+                "theme": 1234,
+                "name": "layout/base.html",
+                "content": "{% load i18n %}\n\n<div class=\"mt-2\">My home page</div>",
+                "file": None
+            }
+        ]
+        self.parser.theme_ids = '1, 2'
+        self.parser.workers = 8
+        with patch("ntk.command.load_configs", return_value={}):
+            with self.assertLogs(level='INFO') as cm:
+                self.command.checkout(self.parser)
+
+        # one connection pool shared by all themes, sized to the concurrency cap
+        mock_create_session.assert_called_once_with(pool_size=8)
+        self.assertEqual(self.command.gateway.session, mock_create_session.return_value)
+        self.assertIn(call().get_templates(theme_id=1), self.mock_gateway.mock_calls)
+        self.assertIn(call().get_templates(theme_id=2), self.mock_gateway.mock_calls)
+        for theme_id in [1, 2]:
+            self.assertIn(
+                call(os.path.abspath(f'{theme_id}/layout/base.html'), 'w', encoding='utf-8'),
+                mock_open_file.mock_calls)
+            self.assertIn(
+                call({
+                    'development': {
+                        'apikey': 'abcd1234',
+                        'store': 'http://development.com',
+                        'theme_id': theme_id,
+                        'sass': {'output_style': 'nested'}
+                    }
+                }, os.path.join(str(theme_id), 'config.yml')),
+                mock_dump_configs.mock_calls)
+        mock_write_config.assert_not_called()
+        self.assertEqual(cm.output[1], 'INFO:root:[development] Checking out 2 themes with 8 workers')
+        self.assertIn('INFO:root:[development] Theme id 1 checked out 1 files into 1/', cm.output)
+        self.assertIn('INFO:root:[development] Theme id 2 checked out 1 files into 2/', cm.output)
+
+    @patch("os.makedirs", autospec=True)
+    @patch("builtins.open", autospec=True)
+    @patch("ntk.command.create_session", autospec=True)
+    @patch("ntk.command.dump_configs", autospec=True)
+    def test_checkout_command_with_all_themes_should_download_themes_of_every_page(
+        self, mock_dump_configs, mock_create_session, mock_open_file, mock_makedirs
+    ):
+        self.mock_gateway.return_value.get_themes.return_value.ok = True
+        self.mock_gateway.return_value.get_themes.return_value.json.return_value = {
+            'next': 'http://development.com/api/admin/themes/?page=2',
+            'results': [{'id': 1}, {'id': 2}]
+        }
+        self.mock_gateway.return_value._request.return_value.json.return_value = {
+            'next': None,
+            'results': [{'id': 3}]
+        }
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = []
+        self.parser.all_themes = True
+        with patch("ntk.command.load_configs", return_value={}):
+            with self.assertLogs(level='INFO') as cm:
+                self.command.checkout(self.parser)
+
+        self.assertIn(
+            call()._request('GET', 'http://development.com/api/admin/themes/?page=2', apikey='abcd1234'),
+            self.mock_gateway.mock_calls)
+        for theme_id in [1, 2, 3]:
+            self.assertIn(call().get_templates(theme_id=theme_id), self.mock_gateway.mock_calls)
+        mock_create_session.assert_called_once_with(pool_size=conf.DEFAULT_WORKERS)
+        self.assertEqual(cm.output[1], 'INFO:root:[development] Checking out 3 themes with 4 workers')
+
+    def test_checkout_command_with_invalid_theme_ids_should_raise_error(self):
+        self.parser.theme_ids = '1,theme'
+        with self.assertRaises(TypeError) as error:
+            self.command.checkout(self.parser)
+        self.assertEqual(
+            str(error.exception), '[development] argument --theme_ids must be comma separated theme ids.')
+
     #####
     # pull
     #####
@@ -250,7 +366,8 @@ class TestCommand(unittest.TestCase):
                 "file": None
             }
         ]
-        self.mock_gateway.return_value._request.return_value.content = b'\xc2\x89'
+        self.mock_gateway.return_value._request.return_value = MagicMock(
+            ok=True, status_code=200, headers={}, content=b'\xc2\x89')
 
         self.parser.filenames = None
         self.command.pull(self.parser)
@@ -290,7 +407,8 @@ class TestCommand(unittest.TestCase):
             "content": "",
             "file": "https://d36qje162qkq4w.cloudfront.net/media/sandbox/themes/5/assets/image.png"
         }
-        self.mock_gateway.return_value._request.return_value.content = b'\xc2\x89'
+        self.mock_gateway.return_value._request.return_value = MagicMock(
+            ok=True, status_code=200, headers={}, content=b'\xc2\x89')
 
         self.parser.filenames = ["assets/image.png"]
         self.command.pull(self.parser)
@@ -310,6 +428,175 @@ class TestCommand(unittest.TestCase):
 
         mock_write_config.assert_not_called()
 
+    def _pull_into_tmp_dir(self, filenames):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        self.parser.filenames = filenames
+        self.command.pull(self.parser)
+
+    @patch("ntk.command.create_session", autospec=True)
+    def test_pull_command_with_few_filenames_should_fetch_them_concurrently(self, mock_create_session):
+        def get_template(theme_id, template_name):
+            # the first fetch answers last
+            if template_name == 'layout/base.html':
+                time.sleep(0.05)
+            return MagicMock(ok=template_name != 'layout/missing.html', json=MagicMock(return_value={
+                'theme': theme_id, 'name': template_name, 'content': template_name, 'file': None}))
+        self.mock_gateway.return_value.get_template.side_effect = get_template
+        self.parser.workers = 3
+
+        with self.assertLogs(level='INFO') as cm:
+            self._pull_into_tmp_dir(['layout/base.html', 'layout/missing.html', 'layout/home.html'])
+            with open('layout/home.html') as template_file:
+                self.assertEqual(template_file.read(), 'layout/home.html')
+
+        mock_create_session.assert_called_once_with(pool_size=3)
+        self.assertEqual(self.mock_gateway.return_value.get_template.call_count, 3)
+        self.mock_gateway.return_value.get_templates.assert_not_called()
+        self.assertIn('INFO:root:[development] Pulling 2 files from theme id 1234 ', cm.output)
+
+    @patch("ntk.command.time.sleep", autospec=True)
+    def test_pull_command_with_many_filenames_should_filter_one_listing_of_the_theme(self, mock_sleep):
+        filenames = [f'partials/part_{index}.html' for index in range(PULL_LISTING_THRESHOLD)]
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {'theme': 1234, 'name': template_name, 'content': template_name, 'file': None}
+            for template_name in filenames + ['layout/base.html']
+        ]
+
+        with self.assertLogs(level='INFO') as cm:
+            self._pull_into_tmp_dir(filenames + ['layout/missing.html'])
+            self.assertEqual(sorted(os.listdir('partials')), sorted(os.path.basename(name) for name in filenames))
+            self.assertFalse(os.path.exists('layout'))
+
+        self.mock_gateway.return_value.get_templates.assert_called_once_with(theme_id=1234)
+        self.mock_gateway.return_value.get_template.assert_not_called()
+        self.assertIn('WARNING:root:[development] Missing layout/missing.html in theme id 1234', cm.output)
+        self.assertIn(f'INFO:root:[development] Pulling {PULL_LISTING_THRESHOLD} files from theme id 1234 ', cm.output)
+
+    def test_pull_command_should_read_unchanged_media_files_from_object_store(self):
+        url = 'https://d36qje162qkq4w.cloudfront.net/media/sandbox/themes/5/assets/image.png'
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {'theme': 1234, 'name': 'assets/image.png', 'content': '', 'file': url}]
+        objects_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(objects_dir.cleanup)
+        self.command.object_store = ObjectStore(directory=objects_dir.name)
+        self.mock_gateway.return_value._request.side_effect = [
+            MagicMock(ok=True, status_code=200, headers={'etag': '"abc"'}, content=b'\x89PNG'),
+            MagicMock(ok=False, status_code=304, headers={}, content=b''),
+        ]
+
+        self._pull_into_tmp_dir(None)
+        os.remove('assets/image.png')
+        self.command.object_store = ObjectStore(directory=objects_dir.name)
+        self.command.pull(self.parser)
+
+        with open('assets/image.png', 'rb') as image_file:
+            self.assertEqual(image_file.read(), b'\x89PNG')
+        self.assertEqual(self.mock_gateway.return_value._request.mock_calls, [
+            call('GET', url), call('GET', url, headers={'If-None-Match': '"abc"'})])
+
+    @patch("os.path.exists", autospec=True)
+    @patch("builtins.open", autospec=True)
+    def test_pull_command_with_resume_should_skip_files_downloaded_by_interrupted_pull(
+        self, mock_open_file, mock_exists
+    ):
+        mock_exists.side_effect = lambda path: path == 'layout/base.html'
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {"theme": 1234, "name": "layout/base.html", "content": "base", "file": None},
+            {"theme": 1234, "name": "layout/home.html", "content": "home", "file": None},
+        ]
+        journal = self.mock_journal.return_value
+        journal.completed = {'layout/base.html': {}}
+        journal.is_completed.side_effect = lambda name: name in journal.completed
+        self.parser.resume = True
+        self.parser.filenames = None
+        with self.assertLogs(level='INFO') as cm:
+            self.command.pull(self.parser)
+
+        self.mock_journal.assert_called_once_with(os.path.join(conf.JOURNAL_DIRECTORY, 'pull-development-1234.jsonl'))
+        journal.load.assert_called_once_with()
+        self.assertNotIn(
+            call(os.path.abspath('layout/base.html'), 'w', encoding='utf-8'), mock_open_file.mock_calls)
+        self.assertIn(call(os.path.abspath('layout/home.html'), 'w', encoding='utf-8'), mock_open_file.mock_calls)
+        journal.record.assert_called_once_with('layout/home.html')
+        # the journal is removed once the pull completed
+        journal.clear.assert_called_once_with()
+        self.assertIn('INFO:root:[development] Resuming, 1 files were already downloaded', cm.output)
+
+    def test_pull_command_should_not_rewrite_files_with_same_content(self):
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {"theme": 1234, "name": "layout/base.html", "content": "base", "file": None},
+            {"theme": 1234, "name": "layout/home.html", "content": "new home", "file": None},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cwd = os.getcwd()
+            os.chdir(tmp_dir)
+            self.addCleanup(os.chdir, cwd)
+            os.makedirs('layout')
+            for template_name, content in [('layout/base.html', 'base'), ('layout/home.html', 'old home')]:
+                with open(template_name, 'w', encoding='utf-8') as template_file:
+                    template_file.write(content)
+                os.utime(template_name, ns=(1, 1))
+
+            self.parser.filenames = None
+            self.command.pull(self.parser)
+
+            self.assertEqual(os.stat('layout/base.html').st_mtime_ns, 1)
+            with open('layout/home.html', encoding='utf-8') as template_file:
+                self.assertEqual(template_file.read(), 'new home')
+
+    #####
+    # status
+    #####
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_status_command_should_list_added_modified_and_deleted_files(self, mock_get_accept_files):
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {"theme": 1234, "name": "layout/base.html", "content": "base", "file": None},
+            {"theme": 1234, "name": "layout/home.html", "content": "old home", "file": None},
+            {"theme": 1234, "name": "layout/page.html", "content": "page", "file": None},
+            {"theme": 1234, "name": "assets/image.png", "content": "", "file": "https://cdn.com/assets/image.png"},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cwd = os.getcwd()
+            os.chdir(tmp_dir)
+            self.addCleanup(os.chdir, cwd)
+            os.makedirs('layout')
+            os.makedirs('assets')
+            for template_name, content in [
+                    ('layout/base.html', 'base'), ('layout/home.html', 'new home'), ('layout/new.html', 'new')]:
+                with open(template_name, 'w', encoding='utf-8') as template_file:
+                    template_file.write(content)
+            with open('assets/image.png', 'wb') as media_file:
+                media_file.write(b'\x89PNG')
+            mock_get_accept_files.return_value = [
+                os.path.abspath(name) for name in
+                ['layout/base.html', 'layout/home.html', 'layout/new.html', 'assets/image.png']]
+
+            with self.assertLogs(level='INFO') as cm:
+                self.command.status(self.parser)
+
+        self.assertEqual(cm.output, [
+            'INFO:root:[development] Comparing 4 local files with 4 files of theme id 1234',
+            'INFO:root:[development] Added, not on the store:',
+            'INFO:root:[development] \tlayout/new.html',
+            'INFO:root:[development] Modified:',
+            'INFO:root:[development] \tlayout/home.html',
+            'INFO:root:[development] Deleted, only on the store:',
+            'INFO:root:[development] \tlayout/page.html',
+            'INFO:root:[development] Unverified, media files not compared by content:',
+            'INFO:root:[development] \tassets/image.png',
+            'INFO:root:[development] 1 added, 1 modified, 1 deleted, 1 unverified, 1 unchanged, 15 B to upload',
+        ])
+        # nothing is transferred but the listing of the theme
+        self.assertEqual(self.mock_gateway.mock_calls, [
+            call(store=None, apikey=None),
+            call().get_templates(theme_id=1234),
+            call().get_templates().json(),
+        ])
+
     #####
     # push
     #####
@@ -344,6 +631,533 @@ class TestCommand(unittest.TestCase):
         )
         self.assertIn(expected_call, self.mock_gateway.mock_calls)
 
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_failed_upload_should_keep_journal_for_resume(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html', f'{os.getcwd()}/layout/home.html']
+        self.mock_gateway.return_value.create_or_update_template.side_effect = [
+            MagicMock(ok=True), MagicMock(ok=False)]
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        journal = self.mock_journal.return_value
+        self.mock_journal.assert_called_once_with(os.path.join(conf.JOURNAL_DIRECTORY, 'push-development-1234.jsonl'))
+        # a new push forgets the earlier interrupted push, then records the uploaded files only
+        self.assertEqual(journal.mock_calls[0], call.clear())
+        journal.record.assert_called_once_with('layout/base.html', mtime_ns=1, size=53)
+        journal.close.assert_called_once_with()
+        self.assertIn(
+            'WARNING:root:[development] Push was interrupted, run "ntk push --resume" to continue with the '
+            'remaining files.', cm.output)
+
+    @patch("ntk.retry.time.sleep", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_continue_on_error_should_push_remaining_files_and_retry_failed_files(
+        self, mock_get_accept_files, mock_sleep
+    ):
+        mock_get_accept_files.return_value = [
+            f'{os.getcwd()}/layout/base.html', f'{os.getcwd()}/layout/home.html', f'{os.getcwd()}/layout/page.html']
+        self.mock_gateway.return_value.create_or_update_template.side_effect = [
+            MagicMock(ok=False, status_code=500),
+            ConnectionError('Connection aborted.'),
+            MagicMock(ok=True),
+            # retries, layout/base.html succeeds on the first retry, layout/home.html never does
+            MagicMock(ok=True),
+            MagicMock(ok=False, status_code=502),
+            MagicMock(ok=False, status_code=502),
+            MagicMock(ok=False, status_code=400),
+        ]
+        self.parser.continue_on_error = True
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                exit_code = self.command.push(self.parser)
+
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(self.mock_gateway.return_value.create_or_update_template.call_count, 7)
+        # backoff between the retries, besides the pause after each upload
+        self.assertEqual(
+            [sleep_call for sleep_call in mock_sleep.mock_calls if sleep_call != call(UPLOAD_INTERVAL)],
+            [call(2), call(4), call(8)])
+        journal = self.mock_journal.return_value
+        self.assertEqual(
+            journal.record.mock_calls,
+            [call('layout/page.html', mtime_ns=1, size=53), call('layout/base.html', mtime_ns=1, size=53)])
+        journal.clear.assert_called_once_with()
+        self.assertIn('INFO:root:[development] Retrying 2 failed files in 2s (attempt 1 of 3)', cm.output)
+        # the push went through every file, there is nothing to resume
+        self.assertFalse(any('was interrupted' in line for line in cm.output))
+        journal.close.assert_called_once_with()
+        self.assertEqual(cm.output[-2], 'ERROR:root:[development] 1 files failed after 3 retries:')
+        self.assertEqual(cm.output[-1], 'ERROR:root:[development] \tUpload layout/home.html failed -> status 400')
+
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_continue_on_error_and_no_failure_should_return_zero(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        self.parser.continue_on_error = True
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            self.assertEqual(self.command.push(self.parser), 0)
+
+    def _create_invalid_theme(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        files = {
+            'configs/settings_data.json': '{"color": "red",}',
+            'locales/en.json': '{"home": "Home"',
+            'layouts/base.html': '{% block content %}{% endblock %}',
+            'templates/index.html': '{% load i18n %}\n{% block content %}{% if user %}{% endblock %}',
+        }
+        for template_name, content in files.items():
+            os.makedirs(os.path.dirname(template_name), exist_ok=True)
+            with open(template_name, 'w') as template_file:
+                template_file.write(content)
+        self.parser.filenames = None
+
+    def test_push_command_with_invalid_files_should_report_all_of_them_before_any_request(self):
+        self._create_invalid_theme()
+
+        with self.assertLogs(level='INFO') as cm:
+            self.assertEqual(self.command.push(self.parser), 1)
+
+        self.mock_gateway.return_value.create_or_update_template.assert_not_called()
+        self.assertIn('ERROR:root:[development] 3 files are invalid:', cm.output)
+        self.assertIn(
+            'ERROR:root:[development] \ttemplates/index.html -> Unexpected {% endblock %} on line 2, expected '
+            '{% endif %}', cm.output)
+        self.assertIn('ERROR:root:[development] Nothing was uploaded, fix the invalid files first', cm.output)
+
+    def test_push_command_with_invalid_files_and_continue_on_error_should_push_valid_files(self):
+        self._create_invalid_theme()
+        self.parser.continue_on_error = True
+
+        with self.assertLogs(level='INFO'):
+            self.assertEqual(self.command.push(self.parser), 1)
+
+        self.mock_gateway.return_value.create_or_update_template.assert_called_once_with(
+            theme_id=1234, template_name='layouts/base.html', content='{% block content %}{% endblock %}', files={})
+
+        self.parser.skip_validation = True
+        with self.assertLogs(level='INFO'):
+            self.assertEqual(self.command.push(self.parser), 0)
+        self.assertEqual(self.mock_gateway.return_value.create_or_update_template.call_count, 5)
+
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_prune_should_delete_remote_only_files_after_push(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {"theme": 1234, "name": "layout/base.html", "content": "base", "file": None},
+            {"theme": 1234, "name": "layout/old.html", "content": "old", "file": None},
+            {"theme": 1234, "name": "assets/old.png", "content": "", "file": "https://cdn.com/assets/old.png"},
+        ]
+        self.parser.prune = True
+        self.parser.workers = 2
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        gateway_calls = [
+            method_call[0] for method_call in self.mock_gateway.return_value.method_calls
+            if method_call[0] != 'get_templates().json']
+        # one listing, the upload, then the deletes
+        self.assertEqual(gateway_calls[:2], ['get_templates', 'create_or_update_template'])
+        self.assertCountEqual(
+            self.mock_gateway.return_value.delete_template.call_args_list,
+            [
+                call(theme_id=1234, template_name='assets/old.png'),
+                call(theme_id=1234, template_name='layout/old.html'),
+            ])
+        self.assertEqual(cm.output[:3], [
+            'INFO:root:[development] Prune will delete 2 files only on theme id 1234:',
+            'INFO:root:[development] \tassets/old.png',
+            'INFO:root:[development] \tlayout/old.html',
+        ])
+        self.assertIn('INFO:root:[development] Deleting 2 files from theme id 1234', cm.output)
+
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_prune_and_dry_run_should_only_list_remote_only_files(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {"theme": 1234, "name": "layout/old.html", "content": "old", "file": None},
+        ]
+        self.parser.prune = True
+        self.parser.dry_run = True
+        self.parser.filenames = None
+        with self.assertLogs(level='INFO') as cm:
+            self.command.push(self.parser)
+
+        self.mock_gateway.return_value.create_or_update_template.assert_not_called()
+        self.mock_gateway.return_value.delete_template.assert_not_called()
+        self.assertEqual(cm.output, [
+            'INFO:root:[development] Prune will delete 1 files only on theme id 1234:',
+            'INFO:root:[development] \tlayout/old.html',
+        ])
+
+    def test_push_command_with_dry_run_without_prune_should_raise_error(self):
+        self.parser.dry_run = True
+        with self.assertRaises(TypeError) as error:
+            self.command.push(self.parser)
+
+        self.assertEqual(str(error.exception), '[development] argument --dry_run requires --prune.')
+        self.mock_gateway.return_value.create_or_update_template.assert_not_called()
+
+    @patch("ntk.command.Gateway", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_envs_prune_and_dry_run_should_only_list_remote_only_files_of_each_environment(
+        self, mock_get_accept_files, mock_gateway
+    ):
+        configs = {
+            'staging': {'apikey': 'staging123', 'store': 'https://staging.com', 'theme_id': 1},
+            'production': {'apikey': 'production123', 'store': 'https://production.com', 'theme_id': 2},
+        }
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        staging_gateway, production_gateway = MagicMock(), MagicMock()
+        staging_gateway.get_templates.return_value.json.return_value = [
+            {"theme": 1, "name": "layout/old.html", "content": "old", "file": None}]
+        production_gateway.get_templates.return_value.json.return_value = [
+            {"theme": 2, "name": "layout/base.html", "content": "base", "file": None}]
+        mock_gateway.side_effect = [staging_gateway, production_gateway]
+        self.parser.env = 'staging,production'
+        self.parser.filenames = None
+        self.parser.prune = True
+        self.parser.dry_run = True
+        with patch("ntk.conf.load_configs", return_value=configs), patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                exit_code = self.command.push(self.parser)
+
+        self.assertEqual(exit_code, 0)
+        for gateway in [staging_gateway, production_gateway]:
+            gateway.create_or_update_template.assert_not_called()
+            gateway.delete_template.assert_not_called()
+        self.assertEqual(cm.output, [
+            'INFO:root:[staging] Prune will delete 1 files only on theme id 1:',
+            'INFO:root:[staging] \tlayout/old.html',
+            'INFO:root:[production] Prune will delete 0 files only on theme id 2',
+        ])
+
+    @patch("ntk.command.Gateway", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_envs_and_prune_should_delete_remote_only_files_of_each_pushed_environment(
+        self, mock_get_accept_files, mock_gateway
+    ):
+        configs = {
+            'staging': {'apikey': 'staging123', 'store': 'https://staging.com', 'theme_id': 1},
+            'production': {'apikey': 'production123', 'store': 'https://production.com', 'theme_id': 2},
+        }
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        staging_gateway, production_gateway = MagicMock(), MagicMock()
+        for gateway in [staging_gateway, production_gateway]:
+            gateway.get_templates.return_value.json.return_value = [
+                {"theme": 1, "name": "layout/old.html", "content": "old", "file": None}]
+            gateway.delete_template.return_value.ok = True
+        staging_gateway.create_or_update_template.return_value.ok = True
+        production_gateway.create_or_update_template.return_value.ok = False
+        production_gateway.create_or_update_template.return_value.status_code = 500
+        mock_gateway.side_effect = [staging_gateway, production_gateway]
+        self.parser.env = 'staging,production'
+        self.parser.filenames = None
+        self.parser.prune = True
+        with patch("ntk.conf.load_configs", return_value=configs), patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                exit_code = self.command.push(self.parser)
+
+        self.assertEqual(exit_code, 1)
+        staging_gateway.delete_template.assert_called_once_with(theme_id=1, template_name='layout/old.html')
+        # never prune after a failed push
+        production_gateway.delete_template.assert_not_called()
+        self.assertTrue(any(
+            line.startswith('INFO:root:[staging] Uploaded 1 of 1 files to theme id 1 in ')
+            and line.endswith(', pruned 1 of 1 files') for line in cm.output))
+
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_failed_push_should_not_prune(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        self.mock_gateway.return_value.get_templates.return_value.json.return_value = [
+            {"theme": 1234, "name": "layout/old.html", "content": "old", "file": None},
+        ]
+        self.mock_gateway.return_value.create_or_update_template.return_value.ok = False
+        self.parser.prune = True
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            self.command.push(self.parser)
+
+        self.mock_gateway.return_value.delete_template.assert_not_called()
+
+    @patch("ntk.retry.time.sleep")
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_continue_on_error_should_prune_only_once_failed_uploads_succeeded(
+        self, mock_get_accept_files, mock_sleep
+    ):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        gateway = self.mock_gateway.return_value
+        gateway.get_templates.return_value.json.return_value = [
+            {"theme": 1234, "name": "layout/old.html", "content": "old", "file": None},
+        ]
+        gateway.delete_template.return_value.ok = True
+        gateway.create_or_update_template.return_value = MagicMock(ok=False, status_code=500)
+        self.parser.prune = True
+        self.parser.continue_on_error = True
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file), self.assertLogs(level='INFO'):
+            self.assertEqual(self.command.push(self.parser), 1)
+
+        # every retry failed, the old file is kept
+        self.assertEqual(gateway.create_or_update_template.call_count, 4)
+        gateway.delete_template.assert_not_called()
+
+        gateway.create_or_update_template.reset_mock()
+        gateway.create_or_update_template.return_value = None
+        gateway.create_or_update_template.side_effect = [
+            MagicMock(ok=False, status_code=500), MagicMock(ok=True)]
+        with patch("builtins.open", self.mock_file), self.assertLogs(level='INFO'):
+            self.assertEqual(self.command.push(self.parser), 0)
+
+        # pruned once the retry uploaded the file
+        self.assertEqual(gateway.create_or_update_template.call_count, 2)
+        gateway.delete_template.assert_called_once_with(theme_id=1234, template_name='layout/old.html')
+
+    @patch("ntk.command.Minifier", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_minify_should_upload_minified_content_and_report_bytes_saved(
+        self, mock_get_accept_files, mock_minifier
+    ):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/assets/base.css']
+        mock_minifier.return_value.can_minify.return_value = True
+        mock_minifier.return_value.minify.return_value = 'a{color:red}'
+        mock_minifier.return_value.report.return_value = ['Minified assets/base.css 53 B -> 12 B, saved 41 B (77%)']
+        self.parser.minify = True
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        mock_minifier.return_value.minify.assert_called_once_with(
+            'assets/base.css', '{% load i18n %}\n\n<div class="mt-2">My home page</div>')
+        self.assertIn(
+            call().create_or_update_template(
+                theme_id=1234, template_name='assets/base.css', content='a{color:red}', files={}),
+            self.mock_gateway.mock_calls)
+        self.assertIn('INFO:root:[development] Minified assets/base.css 53 B -> 12 B, saved 41 B (77%)', cm.output)
+
+    @patch("ntk.command.ImageOptimizer", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_optimize_images_should_upload_optimized_image(
+        self, mock_get_accept_files, mock_image_optimizer
+    ):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/assets/banner.png']
+        mock_image_optimizer.return_value.optimize.return_value = {'assets/banner.png': '.ntk/images/abc.png'}
+        mock_image_optimizer.return_value.report.return_value = ['Optimized 1 of 1 images (0 from cache), saved 5 KB']
+        self.parser.optimize_images = True
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        mock_image_optimizer.assert_called_once_with(quality=None)
+        mock_image_optimizer.return_value.optimize.assert_called_once_with(['assets/banner.png'])
+        self.mock_file.assert_called_once_with('.ntk/images/abc.png', 'rb')
+        self.assertIn(
+            call().create_or_update_template(
+                theme_id=1234, template_name='assets/banner.png', content='',
+                files={'file': ('assets/banner.png', self.mock_file.return_value)}),
+            self.mock_gateway.mock_calls)
+        self.assertIn('INFO:root:[development] Optimized 1 of 1 images (0 from cache), saved 5 KB', cm.output)
+
+    def test_push_command_with_invalid_image_quality_should_raise_error(self):
+        self.parser.image_quality = 100
+        with self.assertRaises(TypeError) as error:
+            self.command.push(self.parser)
+        self.assertEqual(str(error.exception), '[development] argument --image_quality must be between 1 and 95.')
+
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_resume_should_upload_only_files_not_completed_or_changed(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html', f'{os.getcwd()}/layout/home.html']
+        journal = self.mock_journal.return_value
+        journal.completed = {'layout/base.html': {'mtime_ns': 1, 'size': 53}}
+        journal.is_completed.side_effect = lambda name, **state: journal.completed.get(name) == state
+        self.parser.resume = True
+        self.parser.filenames = None
+        with patch("builtins.open", self.mock_file):
+            self.command.push(self.parser)
+
+        journal.load.assert_called_once_with()
+        uploaded = [
+            template_call.kwargs['template_name']
+            for template_call in self.mock_gateway.return_value.create_or_update_template.call_args_list
+        ]
+        self.assertEqual(uploaded, ['layout/home.html'])
+        journal.clear.assert_called_once_with()
+
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_should_report_metrics_summary_and_write_metrics_json(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [
+            f'{os.getcwd()}/layout/base.html',
+        ]
+        self.mock_gateway.return_value.create_or_update_template.return_value.ok = True
+        self.command.config.parser_config(self.parser)
+        self.parser.filenames = None
+        self.parser.metrics_json = '.ntk/metrics.json'
+        with patch("builtins.open", self.mock_file), patch("ntk.command.Metrics.save") as mock_save:
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        mock_save.assert_called_once_with('.ntk/metrics.json')
+        self.assertRegex(cm.output[-3], r'^INFO:root:\[development\] Finished in \d+\.\d\ds: 0 requests')
+        self.assertRegex(cm.output[-2], r'^INFO:root:\[development\] Time split: discovery ')
+        self.assertEqual(cm.output[-1], 'INFO:root:[development] Metrics were written to .ntk/metrics.json')
+
+    @patch("ntk.command.Gateway", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_comma_separated_envs_should_upload_to_every_environment(
+        self, mock_get_accept_files, mock_gateway
+    ):
+        configs = {
+            'staging': {'apikey': 'staging123', 'store': 'https://staging.com', 'theme_id': 1},
+            'production': {'apikey': 'production123', 'store': 'https://production.com', 'theme_id': 2},
+        }
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        mock_gateway.return_value.create_or_update_template.return_value.ok = True
+        self.parser.env = 'staging, production'
+        self.parser.filenames = None
+        with patch("ntk.conf.load_configs", return_value=configs), patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        self.assertIn(call(store='https://staging.com', apikey='staging123'), mock_gateway.mock_calls)
+        self.assertIn(call(store='https://production.com', apikey='production123'), mock_gateway.mock_calls)
+        content = '{% load i18n %}\n\n<div class="mt-2">My home page</div>'
+        for theme_id in [1, 2]:
+            self.assertIn(
+                call().create_or_update_template(
+                    theme_id=theme_id, template_name='layout/base.html', content=content, files={}),
+                mock_gateway.mock_calls)
+        # local files are read once for the validation and once for all environments
+        self.assertEqual(self.mock_file.call_count, 2)
+        self.assertRegex(
+            cm.output[0], r'\[staging,production\] Uploading 1 files \(53 B\) to 2 environments$')
+        self.assertRegex(cm.output[1], r'^INFO:root:\[staging\] Uploaded 1 of 1 files to theme id 1 in ')
+        self.assertRegex(cm.output[2], r'^INFO:root:\[production\] Uploaded 1 of 1 files to theme id 2 in ')
+
+    @patch("ntk.command.Gateway", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_all_envs_should_report_failed_environment_and_push_the_others(
+        self, mock_get_accept_files, mock_gateway
+    ):
+        configs = {
+            'staging': {'apikey': 'staging123', 'store': 'https://staging.com', 'theme_id': 1},
+            'production': {'apikey': 'production123', 'store': 'https://production.com', 'theme_id': 2},
+        }
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html', f'{os.getcwd()}/layout/home.html']
+        staging_gateway, production_gateway = MagicMock(), MagicMock()
+        staging_gateway.create_or_update_template.return_value.ok = True
+        production_gateway.create_or_update_template.return_value.ok = False
+        production_gateway.create_or_update_template.return_value.status_code = 400
+        mock_gateway.side_effect = [staging_gateway, production_gateway]
+        self.parser.all_envs = True
+        self.parser.filenames = None
+        with patch("ntk.conf.load_configs", return_value=configs), \
+                patch("ntk.command.load_configs", return_value=configs), patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                exit_code = self.command.push(self.parser)
+
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(staging_gateway.create_or_update_template.call_count, 2)
+        self.assertEqual(production_gateway.create_or_update_template.call_count, 1)
+        self.assertRegex(cm.output[1], r'^INFO:root:\[staging\] Uploaded 2 of 2 files to theme id 1 in ')
+        self.assertRegex(
+            cm.output[2],
+            r'^ERROR:root:\[production\] Uploaded 0 of 2 files to theme id 2 in .*, failed on layout/base.html '
+            r'\(status 400\)$')
+
+    @patch("ntk.retry.time.sleep")
+    @patch("ntk.command.Gateway", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_envs_and_continue_on_error_should_retry_failed_files_of_each_environment(
+        self, mock_get_accept_files, mock_gateway, mock_sleep
+    ):
+        configs = {
+            'staging': {'apikey': 'staging123', 'store': 'https://staging.com', 'theme_id': 1},
+            'production': {'apikey': 'production123', 'store': 'https://production.com', 'theme_id': 2},
+        }
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html', f'{os.getcwd()}/layout/home.html']
+        staging_gateway, production_gateway = MagicMock(), MagicMock()
+        # staging fails base.html once, production is unreachable
+        staging_gateway.create_or_update_template.side_effect = [
+            MagicMock(ok=False, status_code=500), MagicMock(ok=True), MagicMock(ok=True)]
+        production_gateway.create_or_update_template.side_effect = ConnectionError('Connection refused')
+        mock_gateway.side_effect = [staging_gateway, production_gateway]
+        self.parser.env = 'staging,production'
+        self.parser.filenames = None
+        self.parser.continue_on_error = True
+        with patch("ntk.conf.load_configs", return_value=configs), patch("builtins.open", self.mock_file):
+            with self.assertLogs(level='INFO') as cm:
+                exit_code = self.command.push(self.parser)
+
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(staging_gateway.create_or_update_template.call_count, 3)
+        # both files, then both files again on each of the 3 retries
+        self.assertEqual(production_gateway.create_or_update_template.call_count, 8)
+        self.assertIn('INFO:root:[staging] Retrying 1 failed files in 2s (attempt 1 of 3)', cm.output)
+        self.assertTrue(any(
+            line.startswith('INFO:root:[staging] Uploaded 2 of 2 files to theme id 1 in ') for line in cm.output))
+        self.assertTrue(any(
+            line.startswith('ERROR:root:[production] Uploaded 0 of 2 files to theme id 2 in ')
+            and line.endswith('failed on layout/base.html (Connection refused), layout/home.html (Connection refused)')
+            for line in cm.output))
+
+    @patch("ntk.command.Gateway", autospec=True)
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_envs_and_trace_should_write_trace_file(self, mock_get_accept_files, mock_gateway):
+        configs = {
+            'staging': {'apikey': 'staging123', 'store': 'https://staging.com', 'theme_id': 1},
+            'production': {'apikey': 'production123', 'store': 'https://production.com', 'theme_id': 2},
+        }
+        mock_get_accept_files.return_value = [f'{os.getcwd()}/layout/base.html']
+        mock_gateway.return_value.create_or_update_template.return_value.ok = True
+        self.parser.env = 'staging,production'
+        self.parser.filenames = None
+        self.parser.trace = '.ntk/trace.json'
+        with patch("ntk.conf.load_configs", return_value=configs), patch("builtins.open", self.mock_file), \
+                patch("ntk.trace.Tracer.save") as mock_save:
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        mock_save.assert_called_once_with('.ntk/trace.json')
+        self.assertEqual(cm.output[-1], 'INFO:root:[staging,production] Trace was written to .ntk/trace.json')
+        events = [(event['name'], event['args']) for event in self.command.metrics.tracer.events]
+        self.assertIn(('read', {'template': 'layout/base.html'}), events)
+
+    def test_push_command_with_envs_missing_config_should_be_required_api_key_store_and_theme_id(self):
+        self.parser.env = 'staging,production'
+        with patch("ntk.conf.load_configs", return_value={'staging': {'apikey': 'a', 'store': 'b', 'theme_id': 1}}):
+            with self.assertRaises(TypeError) as error:
+                self.command.push(self.parser)
+        self.assertEqual(
+            str(error.exception), '[production] argument -a/--apikey, -s/--store, -t/--theme_id are required.')
+
+    @patch("ntk.command.Command._get_accept_files", autospec=True)
+    def test_push_command_with_trace_should_write_trace_file(self, mock_get_accept_files):
+        mock_get_accept_files.return_value = [
+            f'{os.getcwd()}/layout/base.html',
+        ]
+        self.mock_gateway.return_value.create_or_update_template.return_value.ok = True
+        self.command.config.parser_config(self.parser)
+        self.parser.filenames = None
+        self.parser.trace = '.ntk/trace.json'
+        with patch("builtins.open", self.mock_file), patch("ntk.trace.Tracer.save") as mock_save:
+            with self.assertLogs(level='INFO') as cm:
+                self.command.push(self.parser)
+
+        mock_save.assert_called_once_with('.ntk/trace.json')
+        self.assertEqual(cm.output[-1], 'INFO:root:[development] Trace was written to .ntk/trace.json')
+        events = [(event['name'], event['args']) for event in self.command.metrics.tracer.events]
+        self.assertIn(('read', {'template': 'layout/base.html'}), events)
+
     @patch("ntk.command.glob.glob", autospec=True)
     def test_push_command_ignores_invalid_file_extensions_when_filenames_provided(
         self, mock_glob
@@ -507,8 +1321,8 @@ class TestCommand(unittest.TestCase):
             self.command._handle_files_change(changes)
             mock_compile_sass.assert_called_once()
 
-    @patch("ntk.command.asyncio.run")
-    @patch("ntk.command.awatch", autospec=True)
+    @patch("asyncio.run")
+    @patch("watchfiles.awatch", autospec=True)
     def test_watch_command_uses_asyncio_run(self, mock_awatch, mock_asyncio_run):
         mock_asyncio_run.side_effect = lambda coro: coro.close()
         self.command.config.parser_config(self.parser)
@@ -533,6 +1347,20 @@ class TestCommand(unittest.TestCase):
         self.command._handle_files_change(changes)
         self.mock_gateway.return_value.delete_template.assert_not_called()
 
+    def test_watch_ignores_files_of_ntk_directory(self):
+        """The minify and image caches written during a push must not trigger another push."""
+        self.command.config.parser_config(self.parser)
+        changes = [
+            (Change.added, '.ntk/minify/abc.css'),
+            (Change.added, f'{os.getcwd()}/.ntk/images/abc.png'),
+            (Change.deleted, './.ntk/minify/abc.json'),
+        ]
+        with patch("ntk.command.Command._push_templates") as mock_push_templates:
+            with self.assertNoLogs(level='INFO'):
+                self.command._handle_files_change(changes)
+        mock_push_templates.assert_not_called()
+        self.mock_gateway.return_value.delete_template.assert_not_called()
+
     def test_watch_ignores_unknown_extensions(self):
         """Files with unrecognised extensions (.bak, .swp, .pyc, .tmp) should be ignored."""
         self.command.config.parser_config(self.parser)
@@ -564,7 +1392,8 @@ class TestCommand(unittest.TestCase):
             self.mock_gateway.reset_mock()
             mock_get_accept_files.return_value = [os.path.abspath(filepath.lstrip('./'))]
             changes = [(Change.added, filepath)]
-            with patch("builtins.open", self.mock_file):
+            mock_file = mock_open(read_data='{}') if filepath.endswith('.json') else self.mock_file
+            with patch("builtins.open", mock_file):
                 self.command._handle_files_change(changes)
             self.mock_gateway.return_value.create_or_update_template.assert_called_once()
 
@@ -628,10 +1457,259 @@ class TestCommand(unittest.TestCase):
     #####
     # sass
     #####
-    @patch("ntk.command.sass")
-    def test_compile_sass_command_error_should_return_log_we_expect(self, mock_sass):
+    def _create_sass_project(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        os.makedirs('sass/pages')
+        with open('sass/_colors.scss', 'w') as scss_file:
+            scss_file.write('$primary: red;')
+        with open('sass/theme.scss', 'w') as scss_file:
+            scss_file.write('@import "colors";\nbody { color: $primary; }')
+        with open('sass/pages/home.scss', 'w') as scss_file:
+            scss_file.write('h1 { margin: 0; }')
+
+    @patch("sass.compile")
+    def test_compile_sass_command_error_should_return_log_we_expect(self, mock_sass_compile):
+        self._create_sass_project()
+        mock_sass_compile.side_effect = Exception('Error: Invalid CSS')
+        self.command.config.parser_config(self.parser)
+        with self.assertLogs(level='INFO') as cm:
+            self.assertEqual(self.command._compile_sass(), [])
+
+        mock_sass_compile.assert_called_once_with(filename='sass/pages/home.scss', output_style='nested')
+        self.assertEqual(cm.output[-2:], [
+            'ERROR:root:[development] Sass processing failed, see error below.',
+            'ERROR:root:[development] Error: Invalid CSS',
+        ])
+
+    def test_compile_sass_should_only_write_changed_css_files(self):
+        self._create_sass_project()
+        self.command.config.parser_config(self.parser)
+
+        self.assertEqual(self.command._compile_sass(), ['assets/pages/home.css', 'assets/theme.css'])
+        self.assertFalse(os.path.exists('assets/_colors.css'))
+        with open('assets/theme.css') as css_file:
+            self.assertIn('color: red;', css_file.read())
+        mtime = os.stat('assets/pages/home.css').st_mtime_ns
+
+        with open('sass/_colors.scss', 'w') as scss_file:
+            scss_file.write('$primary: blue;')
+        with self.assertLogs(level='INFO') as cm:
+            self.assertEqual(self.command._compile_sass(), ['assets/theme.css'])
+
+        # the unchanged output is not rewritten, it doesn't fire a watch event
+        self.assertEqual(os.stat('assets/pages/home.css').st_mtime_ns, mtime)
+        self.assertEqual(cm.output[-1], 'INFO:root:[development] Sass successfully processed, 1 css files changed.')
+
+    def test_compile_sass_should_compile_indented_syntax_sources(self):
+        self._create_sass_project()
+        with open('sass/pages/about.sass', 'w') as sass_file:
+            sass_file.write('@import "../colors"\nh2\n  color: $primary\n')
+        self.command.config.parser_config(self.parser)
+
+        self.assertEqual(
+            self.command._compile_sass(), ['assets/pages/about.css', 'assets/pages/home.css', 'assets/theme.css'])
+        with open('assets/pages/about.css') as css_file:
+            self.assertIn('color: red;', css_file.read())
+
+    def test_watch_with_sass_change_should_push_source_and_changed_css_only_once(self):
+        self._create_sass_project()
+        self.command.config.parser_config(self.parser)
+        self.command._compile_sass()
+        with open('sass/_colors.scss', 'w') as scss_file:
+            scss_file.write('$primary: blue;')
+
+        self.command._handle_files_change({(Change.modified, os.path.abspath('sass/_colors.scss'))})
+        uploaded = [
+            template_call.kwargs['template_name']
+            for template_call in self.mock_gateway.return_value.create_or_update_template.call_args_list
+        ]
+        self.assertCountEqual(uploaded, ['assets/theme.css', 'sass/_colors.scss'])
+
+        # the watch event of the written css file doesn't push it again
+        self.command._handle_files_change({(Change.modified, os.path.abspath('assets/theme.css'))})
+        self.assertEqual(self.mock_gateway.return_value.create_or_update_template.call_count, 2)
+
+    def test_watch_with_failed_css_upload_should_push_it_again_on_its_watch_event(self):
+        self._create_sass_project()
+        self.command.config.parser_config(self.parser)
+        self.command._compile_sass()
+        with open('sass/_colors.scss', 'w') as scss_file:
+            scss_file.write('$primary: blue;')
+
+        css_uploads = []
+
+        def create_or_update_template(theme_id, template_name, content, files):
+            # the store rejects the first upload of the css output
+            if template_name == 'assets/theme.css':
+                css_uploads.append(template_name)
+            return MagicMock(ok=len(css_uploads) != 1 or template_name != 'assets/theme.css', status_code=500)
+
+        self.mock_gateway.return_value.create_or_update_template.side_effect = create_or_update_template
+        self.command._handle_files_change({(Change.modified, os.path.abspath('sass/_colors.scss'))})
+        self.assertNotIn('assets/theme.css', self.command.pushed_digests)
+
+        self.command._handle_files_change({(Change.modified, os.path.abspath('assets/theme.css'))})
+        uploaded = [
+            template_call.kwargs['template_name']
+            for template_call in self.mock_gateway.return_value.create_or_update_template.call_args_list
+        ]
+        self.assertEqual(uploaded.count('assets/theme.css'), 2)
+        self.assertIn('assets/theme.css', self.command.pushed_digests)
+
+    def test_watch_with_file_saved_unchanged_should_not_push_it_again(self):
+        self._create_sass_project()
         self.command.config.parser_config(self.parser)
         self.command._compile_sass()
 
-        mock_sass.compile.assert_called_once_with(
-            dirname=(conf.SASS_SOURCE, conf.SASS_DESTINATION), output_style='nested')
+        self.command._handle_files_change({(Change.modified, os.path.abspath('sass/pages/home.scss'))})
+        # saved again by the editor without changes
+        self.command._handle_files_change({(Change.modified, os.path.abspath('sass/pages/home.scss'))})
+        self.assertEqual(self.mock_gateway.return_value.create_or_update_template.call_count, 1)
+
+        with open('sass/pages/home.scss', 'w') as scss_file:
+            scss_file.write('h1 { margin: 1px; }')
+        self.command._handle_files_change({(Change.modified, os.path.abspath('sass/pages/home.scss'))})
+        # the source and its css output
+        self.assertEqual(self.mock_gateway.return_value.create_or_update_template.call_count, 3)
+
+    def _create_offline_watch(self):
+        import requests
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        os.makedirs('layouts')
+        for template_name in ['layouts/base.html', 'layouts/home.html']:
+            with open(template_name, 'w') as template_file:
+                template_file.write(template_name)
+        self.command.config.parser_config(self.parser)
+        self.command.offline_queue = self.command._open_offline_queue()
+        self.addCleanup(self.command.offline_queue.close)
+        self.mock_gateway.return_value.create_or_update_template.side_effect = (
+            requests.exceptions.ConnectionError('Network is unreachable'))
+
+    @patch("ntk.command.time.sleep", autospec=True)
+    def test_watch_with_unreachable_store_should_queue_changes_until_it_is_back(self, mock_sleep):
+        self._create_offline_watch()
+        gateway = self.mock_gateway.return_value
+
+        with self.assertLogs(level='INFO') as cm:
+            self.command._handle_files_change({(Change.modified, os.path.abspath('layouts/base.html'))})
+        self.assertIn(
+            'WARNING:root:[development] http://development.com is unreachable, 1 changes are queued until it is '
+            'back -> Network is unreachable', cm.output)
+
+        # not sent while offline, the delete replaces the queued upload
+        os.remove('layouts/base.html')
+        self.command._handle_files_change({
+            (Change.modified, os.path.abspath('layouts/home.html')),
+            (Change.deleted, os.path.abspath('layouts/base.html')),
+        })
+        self.assertEqual(gateway.create_or_update_template.call_count, 1)
+        gateway.delete_template.assert_not_called()
+        self.assertEqual(
+            OfflineQueue('.ntk/watch_queue-development-1234.jsonl').load(),
+            {'layouts/home.html': 'upload', 'layouts/base.html': 'delete'})
+
+        gateway.is_reachable.return_value = False
+        self.assertFalse(self.command._flush_offline_queue())
+
+        gateway.is_reachable.return_value = True
+        gateway.create_or_update_template.side_effect = None
+        gateway.create_or_update_template.reset_mock()
+        self.assertTrue(self.command._flush_offline_queue())
+
+        gateway.create_or_update_template.assert_called_once_with(
+            theme_id=1234, template_name='layouts/home.html', content='layouts/home.html', files={})
+        gateway.delete_template.assert_called_once_with(theme_id=1234, template_name='layouts/base.html')
+        self.assertFalse(os.path.exists('.ntk/watch_queue-development-1234.jsonl'))
+
+    @patch("asyncio.run")
+    @patch("watchfiles.awatch", autospec=True)
+    def test_watch_command_should_resume_changes_queued_by_last_watch(self, mock_awatch, mock_asyncio_run):
+        self._create_offline_watch()
+        self.command.offline_queue.add('upload', ['layouts/base.html', 'layouts/home.html'])
+        self.command.offline_queue.close()
+        mock_asyncio_run.side_effect = lambda coro: coro.close()
+
+        with self.assertLogs(level='INFO') as cm:
+            self.command.watch(self.parser)
+
+        self.assertIn('INFO:root:[development] Resuming 2 changes queued by the last watch', cm.output)
+        self.assertEqual(len(self.command.offline_queue), 2)
+
+    @patch("asyncio.run")
+    @patch("watchfiles.awatch", autospec=True)
+    def test_watch_command_should_not_resume_changes_queued_for_another_environment(
+        self, mock_awatch, mock_asyncio_run
+    ):
+        self._create_offline_watch()
+        self.command.offline_queue.add('upload', ['layouts/base.html'])
+        self.command.offline_queue.close()
+        mock_asyncio_run.side_effect = lambda coro: coro.close()
+        self.parser.env = 'production'
+        self.parser.theme_id = 5678
+
+        with self.assertLogs(level='INFO') as cm:
+            self.command.watch(self.parser)
+
+        self.assertEqual(len(self.command.offline_queue), 0)
+        self.assertFalse(any('Resuming' in line for line in cm.output))
+        self.assertTrue(self.command._flush_offline_queue())
+        self.mock_gateway.return_value.create_or_update_template.assert_not_called()
+        # kept for the next watch of the development theme
+        self.assertEqual(
+            OfflineQueue('.ntk/watch_queue-development-1234.jsonl').load(), {'layouts/base.html': 'upload'})
+
+    #####
+    # daemon
+    #####
+    def _get_discovery_globs(self, mock_glob):
+        return [glob_call for glob_call in mock_glob.call_args_list if os.path.isabs(glob_call.args[0])]
+
+    def test_daemon_request_push_should_upload_files_and_return_failed_ones(self):
+        self._create_sass_project()
+        self.command.config.parser_config(self.parser)
+        self.command.file_index = set(self.command._get_accept_files([]))
+        os.makedirs('layouts')
+        with open('layouts/base.html', 'w') as template_file:
+            template_file.write('base')
+        self.mock_gateway.return_value.create_or_update_template.return_value = MagicMock(ok=False, status_code=500)
+
+        with patch('ntk.command.glob.glob', wraps=glob.glob) as mock_glob:
+            response = self.command._handle_daemon_request(
+                {'action': 'push', 'filenames': [os.path.abspath('layouts/base.html')]})
+
+        self.assertEqual(response, {'ok': False, 'failed': {'layouts/base.html': 'status 500'}})
+        # the new file is not indexed yet, the files are globbed again to find it
+        self.assertTrue(self._get_discovery_globs(mock_glob))
+        self.assertIn(os.path.abspath('layouts/base.html'), self.command.file_index)
+
+    def test_daemon_request_should_use_file_index(self):
+        self._create_sass_project()
+        self.command.config.parser_config(self.parser)
+        self.command.file_index = set(self.command._get_accept_files([]))
+        self.mock_gateway.return_value.delete_template.return_value.ok = True
+
+        with patch('ntk.command.glob.glob', wraps=glob.glob) as mock_glob:
+            pushed = self.command._handle_daemon_request(
+                {'action': 'push', 'filenames': [os.path.abspath('sass/pages/home.scss')]})
+            os.remove('sass/pages/home.scss')
+            deleted = self.command._handle_daemon_request(
+                {'action': 'delete', 'filenames': [os.path.abspath('sass/pages/home.scss')]})
+
+        self.assertEqual(pushed, {'ok': True, 'failed': {}})
+        self.assertEqual(deleted, {'ok': True, 'failed': {}})
+        self.assertEqual(self._get_discovery_globs(mock_glob), [])
+        self.mock_gateway.return_value.delete_template.assert_called_once_with(
+            theme_id=1234, template_name='sass/pages/home.scss')
+
+    def test_daemon_request_with_unknown_action_should_return_error(self):
+        self.assertEqual(
+            self.command._handle_daemon_request({'action': 'sync'}), {'ok': False, 'error': 'Unknown action sync'})
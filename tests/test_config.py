@@ -1,6 +1,11 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, mock_open, patch
 
+import yaml
+
+from ntk import conf
 from ntk.conf import Config
 
 
@@ -75,11 +80,44 @@ class TestConfig(unittest.TestCase):
             }
         }
 
-        with patch('builtins.open', mock_open()):
+        with patch('builtins.open', mock_open()), patch('os.replace') as mock_replace:
             with open('config.yml') as f:
                 self.config.write_config()
                 mock_dump_yaml.assert_called_once_with(config, f)
 
+        # written to a temporary file which is renamed over config.yml
+        mock_replace.assert_called_once_with(f'{conf.CONFIG_FILE}.{os.getpid()}.tmp', conf.CONFIG_FILE)
+
+    def test_load_configs_should_parse_file_once_until_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'config.yml')
+            with open(path, 'w') as f:
+                f.write('development:\n  apikey: abc\n  theme_id: 1\n')
+
+            with patch('yaml.load', wraps=yaml.load) as mock_load_yaml:
+                self.assertEqual(conf.load_configs(path), {'development': {'apikey': 'abc', 'theme_id': 1}})
+                self.assertEqual(conf.load_configs(path), {'development': {'apikey': 'abc', 'theme_id': 1}})
+                mock_load_yaml.assert_called_once()
+                self.assertEqual(
+                    mock_load_yaml.call_args.kwargs['Loader'], getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+                with open(path, 'w') as f:
+                    f.write('development:\n  apikey: abcd\n  theme_id: 2\n')
+                self.assertEqual(conf.load_configs(path), {'development': {'apikey': 'abcd', 'theme_id': 2}})
+                self.assertEqual(mock_load_yaml.call_count, 2)
+
+    def test_dump_configs_should_replace_file_atomically_and_update_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'config.yml')
+            configs = {'development': {'apikey': 'abc', 'theme_id': 1}}
+
+            conf.dump_configs(configs, path)
+
+            self.assertEqual(os.listdir(tmp_dir), ['config.yml'])
+            with patch('yaml.load') as mock_load_yaml:
+                self.assertEqual(conf.load_configs(path), configs)
+            mock_load_yaml.assert_not_called()
+
     def test_validate_config_should_raise_expected_error(self):
         with self.assertRaises(TypeError) as error:
             self.config.apikey = None
@@ -0,0 +1,106 @@
+import logging
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from ntk.client import main, send_request
+from ntk.daemon import DaemonServer, is_running
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires Unix sockets')
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.socket_path = os.path.join(self.tmp_dir.name, '.ntk', 'daemon.sock')
+
+    def _start(self, handle_request):
+        server = DaemonServer(handle_request, socket_path=self.socket_path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        self.addCleanup(stop)
+        return server
+
+    def test_request_should_be_answered_with_response_and_log_of_handler(self):
+        def handle_request(request):
+            logging.info(f'Uploading {len(request["filenames"])} files')
+            return {'ok': True, 'failed': {}}
+
+        self._start(handle_request)
+        with self.assertLogs(level='INFO'):
+            response = send_request('push', ['layout/base.html'], socket_path=self.socket_path)
+
+        self.assertEqual(response, {'ok': True, 'failed': {}, 'log': ['INFO Uploading 1 files']})
+        # only the user who started the daemon may connect
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+    def test_request_should_send_absolute_paths(self):
+        handle_request = MagicMock(return_value={'ok': True})
+        self._start(handle_request)
+
+        send_request('pull', ['layout/base.html'], socket_path=self.socket_path)
+
+        handle_request.assert_called_once_with(
+            {'action': 'pull', 'filenames': [os.path.abspath('layout/base.html')]})
+
+    def test_invalid_request_should_return_error(self):
+        self._start(MagicMock())
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(self.socket_path)
+            client.sendall(b'push layout/base.html\n')
+            with client.makefile('r') as response_file:
+                response = response_file.readline()
+
+        self.assertIn('"error": "Invalid request -> ', response)
+
+    def test_stop_should_shut_down_and_remove_socket(self):
+        handle_request = MagicMock()
+        server = DaemonServer(handle_request, socket_path=self.socket_path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        self.assertEqual(send_request('stop', socket_path=self.socket_path), {'ok': True, 'log': []})
+        thread.join(timeout=5)
+        server.server_close()
+
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket_path))
+        handle_request.assert_not_called()
+
+    def test_start_should_fail_when_daemon_is_already_running(self):
+        self._start(MagicMock())
+        self.assertTrue(is_running(self.socket_path))
+
+        with self.assertRaises(TypeError) as error:
+            DaemonServer(MagicMock(), socket_path=self.socket_path)
+        self.assertEqual(str(error.exception), f'ntk daemon is already running on {self.socket_path}.')
+
+    def test_start_should_replace_socket_left_by_killed_daemon(self):
+        os.makedirs(os.path.dirname(self.socket_path))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(self.socket_path)
+        self.assertFalse(is_running(self.socket_path))
+
+        self._start(MagicMock(return_value={'ok': True}))
+
+        self.assertTrue(send_request('ping', socket_path=self.socket_path)['ok'])
+
+    def test_client_should_exit_with_status_of_response(self):
+        self._start(MagicMock(return_value={'ok': False, 'failed': {'layout/base.html': 'status 500'}}))
+
+        with self.assertRaises(SystemExit) as exit_error:
+            main(['push', 'layout/base.html', '--socket', self.socket_path])
+        self.assertEqual(exit_error.exception.code, 1)
+
+    def test_client_without_daemon_should_exit_with_status_2(self):
+        with self.assertRaises(SystemExit) as exit_error:
+            main(['push', 'layout/base.html', '--socket', self.socket_path])
+        self.assertEqual(exit_error.exception.code, 2)
@@ -1,7 +1,14 @@
+import io
 import unittest
 from unittest.mock import call, MagicMock, patch
 
-from ntk.gateway import Gateway
+from ntk.gateway import create_session, Gateway, is_unreachable
+
+try:
+    import httpx
+except ImportError:
+    # optional dependency, python -m pip install "next-theme-kit[http2]"
+    httpx = None
 
 
 class TestGateway(unittest.TestCase):
@@ -15,7 +22,7 @@ class TestGateway(unittest.TestCase):
     #####
     # _request
     #####
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_request(self, mock_request):
         mock_response_200 = MagicMock()
         mock_response_200.status_code = 200
@@ -42,7 +49,7 @@ class TestGateway(unittest.TestCase):
         ]
         assert mock_request.mock_calls == expected_calls
 
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_request_with_rate_limit_should_retry(self, mock_request):
         mock_response_429 = MagicMock()
         mock_response_429.status_code = 429
@@ -82,10 +89,126 @@ class TestGateway(unittest.TestCase):
         ]
         assert mock_request.mock_calls == expected_calls
 
+    @patch('requests.request', autospec=True)
+    def test_request_should_record_metrics(self, mock_request):
+        mock_response_429 = MagicMock(status_code=429, ok=False, content=b'throttled')
+        mock_response_429.request.body = b'name=assets%2Fbase.html'
+        mock_response_200 = MagicMock(status_code=200, ok=True, content=b'{"name": "assets/base.html"}')
+        mock_response_200.request.body = b'name=assets%2Fbase.html'
+        mock_request.side_effect = [mock_response_429, mock_response_200]
+
+        self.gateway._request('POST', 'http://simple.com/api/admin/themes/5/templates/', apikey=self.apikey)
+
+        metrics = self.gateway.metrics.to_dict()
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['retries'], 1)
+        self.assertEqual(metrics['throttled'], 1)
+        self.assertEqual(metrics['bytes_sent'], 46)
+        self.assertEqual(metrics['bytes_received'], 37)
+        self.assertEqual(metrics['endpoints']['POST /api/admin/themes/{id}/templates/']['count'], 2)
+        self.assertEqual(metrics['endpoints']['POST /api/admin/themes/{id}/templates/']['errors'], 1)
+
+    @patch('requests.Session.request', autospec=True)
+    def test_request_with_session_should_use_shared_connection_pool(self, mock_session_request):
+        mock_session_request.return_value.status_code = 200
+        self.gateway.session = create_session(pool_size=8)
+
+        self.gateway._request('GET', 'http://simple.com/api/admin/themes/', apikey=self.apikey)
+
+        mock_session_request.assert_called_once_with(
+            self.gateway.session, 'GET', 'http://simple.com/api/admin/themes/',
+            headers={'Authorization': 'Bearer apikey'}, data={}, files={})
+        adapter = self.gateway.session.get_adapter('https://simple.com')
+        self.assertEqual(adapter._pool_maxsize, 8)
+
+    def _create_http2_session(self, handler):
+        session = create_session(pool_size=8, http2=True)
+        session.client = httpx.Client(transport=httpx.MockTransport(handler))
+        return session
+
+    @unittest.skipUnless(httpx, 'requires httpx')
+    def test_request_with_http2_session_should_return_response_like_requests(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(
+                201, json={'name': 'assets/image.jpg'}, extensions={'http_version': b'HTTP/2'})
+
+        self.gateway.session = self._create_http2_session(handler)
+        files = {'file': ('assets/image.jpg', io.BytesIO(b'\xff\xd8'))}
+        response = self.gateway.create_or_update_template(theme_id=5, template_name='assets/image.jpg', files=files)
+
+        self.assertTrue(response.ok)
+        self.assertEqual(response.json(), {'name': 'assets/image.jpg'})
+        self.assertEqual(response.headers['content-type'], 'application/json')
+        self.assertEqual(requests[0].headers['authorization'], 'Bearer apikey')
+        # the content without value is left out like requests does
+        self.assertIn(b'name="name"\r\n\r\nassets/image.jpg', requests[0].content)
+        self.assertNotIn(b'name="content"', requests[0].content)
+        self.assertIn(b'\xff\xd8', requests[0].content)
+
+        metrics = self.gateway.metrics.to_dict()
+        self.assertEqual(metrics['http2_requests'], 1)
+        self.assertEqual(metrics['bytes_sent'], len(requests[0].content))
+        self.assertEqual(self.gateway.metrics.summary()[2], 'HTTP/2: 1 of 1 requests multiplexed')
+
+    @unittest.skipUnless(httpx, 'requires httpx')
+    def test_request_with_http2_session_over_http1_should_not_count_http2_requests(self):
+        self.gateway.session = self._create_http2_session(lambda request: httpx.Response(404, text='Not found'))
+        response = self.gateway._request('DELETE', 'http://simple.com/api/admin/themes/5/templates/?name=a.css')
+
+        self.assertFalse(response.ok)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.text, 'Not found')
+        self.assertEqual(self.gateway.metrics.to_dict()['http2_requests'], 0)
+
+    def test_create_session_with_http2_without_httpx_should_fall_back_to_requests(self):
+        import requests
+
+        with patch.dict('sys.modules', {'httpx': None}), self.assertLogs(level='WARNING') as log:
+            session = create_session(pool_size=8, http2=True)
+
+        self.assertIsInstance(session, requests.Session)
+        self.assertRegex(log.output[0], r'^WARNING:root:Falling back to HTTP/1.1, ')
+
+    #####
+    # is_reachable
+    #####
+    @patch('requests.request', autospec=True)
+    def test_is_reachable_should_be_true_whatever_the_status(self, mock_request):
+        mock_request.return_value.status_code = 503
+        mock_request.return_value.content = b''
+
+        self.assertTrue(self.gateway.is_reachable())
+        mock_request.assert_called_once_with('HEAD', 'http://simple.com', headers={}, data={}, files={})
+
+    @patch('requests.request', autospec=True)
+    def test_is_reachable_without_network_should_be_false(self, mock_request):
+        import requests
+
+        mock_request.side_effect = requests.exceptions.ConnectionError('Name or service not known')
+
+        self.assertFalse(self.gateway.is_reachable())
+
+    def test_is_unreachable_should_only_match_network_errors(self):
+        import requests
+
+        self.assertTrue(is_unreachable(requests.exceptions.ConnectTimeout()))
+        self.assertFalse(is_unreachable(requests.exceptions.HTTPError()))
+        self.assertFalse(is_unreachable(TypeError('Uploading failed.')))
+
+    @unittest.skipUnless(httpx, 'requires httpx')
+    def test_is_unreachable_with_http2_session_should_match_httpx_network_errors(self):
+        self.assertTrue(is_unreachable(httpx.ConnectError('Connection refused')))
+        self.assertFalse(is_unreachable(httpx.HTTPStatusError(
+            'Not found', request=httpx.Request('GET', 'http://simple.com'),
+            response=httpx.Response(404))))
+
     #####
     # get_themes
     #####
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_get_themes(self, mock_request):
         # check if call request failed
         mock_request.return_value.ok = True
@@ -109,7 +232,7 @@ class TestGateway(unittest.TestCase):
 
     ####
     # create_theme
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_create_theme(self, mock_request):
         # check if call request failed
         mock_request.return_value.headers = {'content-type': 'text/html'}
@@ -137,7 +260,7 @@ class TestGateway(unittest.TestCase):
     #####
     # get_templates
     #####
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_get_templates(self, mock_request):
         # check if call request failed
         mock_request.return_value.ok = True
@@ -164,7 +287,7 @@ class TestGateway(unittest.TestCase):
     #####
     # get_template
     #####
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_get_template(self, mock_request):
         template_name = 'assets/custom.css'
         # check if call request failed
@@ -192,7 +315,7 @@ class TestGateway(unittest.TestCase):
     #####
     # create_or_update_template
     #####
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_create_or_update_template(self, mock_request):
         # check if call request failed
         with self.assertLogs(level='INFO') as log:
@@ -226,7 +349,7 @@ class TestGateway(unittest.TestCase):
     #####
     # delete_template
     #####
-    @patch('ntk.gateway.requests.request', autospec=True)
+    @patch('requests.request', autospec=True)
     def test_delete_template(self, mock_request):
         mock_request.return_value.headers = {'content-type': 'application/json; charset=utf-8'}
         # check if call request failed
@@ -0,0 +1,91 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ntk.hashing import FileHasher, hash_content, hash_file
+
+
+class TestHashing(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        os.makedirs('layout')
+        os.makedirs('assets')
+        self.cache_path = os.path.join('.ntk', 'hashes.json')
+
+    def _write(self, pathfile, data, mtime=1000000000):
+        with open(pathfile, 'wb') as output_file:
+            output_file.write(data)
+        # old enough for its digest to be cached
+        os.utime(pathfile, (mtime, mtime))
+
+    def test_hash_content_of_text_should_normalize_newlines(self):
+        self.assertEqual(hash_content(b'a\r\nb\rc', text=True), hash_content(b'a\nb\nc'))
+        self.assertEqual(hash_content(b'a\r\nb'), (hashlib.sha256(b'a\r\nb').hexdigest(), 4))
+
+    @patch('ntk.hashing.MMAP_THRESHOLD', 16)
+    def test_hash_file_should_hash_large_files_from_memory_map(self):
+        data = os.urandom(1024)
+        self._write('assets/video.mp4', data)
+
+        with patch('ntk.hashing.mmap.mmap', wraps=mmap.mmap) as mock_mmap:
+            self.assertEqual(hash_file('assets/video.mp4'), (hashlib.sha256(data).hexdigest(), 1024))
+        mock_mmap.assert_called_once()
+
+    def test_digests_should_only_hash_files_changed_since_last_run(self):
+        self._write('layout/base.html', b'base\r\n')
+        self._write('assets/image.png', b'\x89PNG\r\n')
+
+        hasher = FileHasher(cache_path=self.cache_path)
+        digests = hasher.digests([os.path.abspath('layout/base.html'), os.path.abspath('assets/image.png')])
+        hasher.save()
+
+        self.assertEqual(digests, {
+            'layout/base.html': hash_content(b'base\n'),
+            'assets/image.png': hash_content(b'\x89PNG\r\n'),
+        })
+        self.assertEqual(hasher.hashed_count, 2)
+
+        self._write('layout/base.html', b'new base', mtime=1000000001)
+        hasher = FileHasher(cache_path=self.cache_path)
+        digests = hasher.digests(['layout/base.html', 'assets/image.png'])
+
+        self.assertEqual(digests['layout/base.html'], hash_content(b'new base'))
+        self.assertEqual(hasher.hashed_count, 1)
+
+    def test_digest_of_recently_modified_file_should_not_be_cached(self):
+        with open('layout/base.html', 'w') as template_file:
+            template_file.write('base')
+
+        hasher = FileHasher(cache_path=self.cache_path)
+        hasher.digest('layout/base.html')
+        hasher.save()
+
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_save_should_forget_deleted_files(self):
+        self._write('layout/base.html', b'base')
+        self._write('layout/home.html', b'home')
+        hasher = FileHasher(cache_path=self.cache_path)
+        hasher.digests(['layout/base.html', 'layout/home.html'])
+        os.remove('layout/home.html')
+        hasher.save()
+
+        self.assertEqual(list(FileHasher(cache_path=self.cache_path).load()), ['layout/base.html'])
+
+    def test_load_with_corrupted_cache_should_hash_again(self):
+        os.makedirs('.ntk')
+        with open(self.cache_path, 'w') as cache_file:
+            cache_file.write('{"version": 1, "fi')
+        self._write('layout/base.html', b'base')
+
+        hasher = FileHasher(cache_path=self.cache_path)
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(hasher.digest('layout/base.html'), hash_content(b'base'))
+        self.assertEqual(hasher.hashed_count, 1)
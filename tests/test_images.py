@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ntk.images import ImageOptimizer
+
+try:
+    from PIL import Image
+except ImportError:
+    # optional dependency, python -m pip install "next-theme-kit[images]"
+    Image = None
+
+
+@unittest.skipUnless(Image, 'requires Pillow')
+class TestImageOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        os.makedirs('assets')
+
+        # an uncompressed png of one color, recompressing it saves almost everything
+        self.image = Image.new('RGB', (200, 200), (200, 30, 30))
+        self.image.save('assets/banner.png', compress_level=0)
+        self.image.save('assets/photo.jpg', quality=100)
+        self.cache_directory = os.path.join(self.tmp_dir.name, 'images')
+
+    def test_optimize_should_recompress_png_losslessly(self):
+        optimizer = ImageOptimizer(cache_directory=self.cache_directory, workers=1)
+
+        upload_paths = optimizer.optimize(['assets/banner.png', 'assets/photo.jpg', 'layout/base.html'])
+
+        # jpeg images are only recompressed with a quality
+        self.assertEqual(list(upload_paths), ['assets/banner.png'])
+        self.assertLess(os.path.getsize(upload_paths['assets/banner.png']), os.path.getsize('assets/banner.png'))
+        with Image.open(upload_paths['assets/banner.png']) as optimized:
+            self.assertEqual(optimized.convert('RGB').tobytes(), self.image.tobytes())
+        self.assertRegex(
+            optimizer.report()[0], r'^Optimized 1 of 1 images \(0 from cache\), saved .* KB of .* KB \((9\d|100)%\)$')
+
+    def test_optimize_should_upload_animated_image_as_written(self):
+        frames = [Image.new('RGB', (200, 200), color) for color in [(200, 30, 30), (30, 200, 30)]]
+        frames[0].save('assets/spinner.png', save_all=True, append_images=frames[1:], compress_level=0)
+        optimizer = ImageOptimizer(cache_directory=self.cache_directory, workers=1)
+
+        upload_paths = optimizer.optimize(['assets/spinner.png'])
+
+        # a single frame would be smaller, but not lossless
+        self.assertEqual(upload_paths, {})
+        with Image.open('assets/spinner.png') as image:
+            self.assertEqual(image.n_frames, 2)
+
+    def test_optimize_with_quality_should_recompress_jpeg(self):
+        optimizer = ImageOptimizer(quality=70, cache_directory=self.cache_directory, workers=1)
+
+        upload_paths = optimizer.optimize(['assets/photo.jpg'])
+
+        self.assertLess(os.path.getsize(upload_paths['assets/photo.jpg']), os.path.getsize('assets/photo.jpg'))
+
+    def test_optimize_should_reuse_cached_output_of_unchanged_image(self):
+        ImageOptimizer(cache_directory=self.cache_directory, workers=1).optimize(['assets/banner.png'])
+        optimizer = ImageOptimizer(cache_directory=self.cache_directory, workers=1)
+
+        with patch('ntk.images.ProcessPoolExecutor', autospec=True) as mock_executor:
+            upload_paths = optimizer.optimize(['assets/banner.png'])
+
+        mock_executor.assert_not_called()
+        self.assertIn('assets/banner.png', upload_paths)
+        self.assertRegex(optimizer.report()[0], r'^Optimized 1 of 1 images \(1 from cache\)')
+
+    def test_optimize_should_upload_image_as_written_when_it_cannot_be_smaller(self):
+        Image.new('RGB', (1, 1)).save('assets/pixel.png', optimize=True)
+        optimizer = ImageOptimizer(cache_directory=self.cache_directory, workers=1)
+
+        self.assertEqual(optimizer.optimize(['assets/pixel.png']), {})
+        self.assertRegex(optimizer.report()[0], r'^Optimized 0 of 1 images \(0 from cache\), saved 0 B')
+
+    def test_optimize_without_pillow_should_upload_images_as_written(self):
+        optimizer = ImageOptimizer(cache_directory=self.cache_directory)
+        with patch.dict(sys.modules, {'PIL': None}):
+            with self.assertLogs(level='WARNING') as cm:
+                self.assertEqual(optimizer.optimize(['assets/banner.png']), {})
+        self.assertRegex(cm.output[0], r'^WARNING:root:Images are uploaded as written, ')
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from ntk.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'journal', 'push-development-1.jsonl')
+        self.journal = Journal(self.path)
+
+    def test_record_should_be_loaded_by_next_run(self):
+        self.journal.record('layout/base.html', mtime_ns=1, size=53)
+        self.journal.record('assets/image.png')
+        self.journal.close()
+
+        journal = Journal(self.path)
+        self.assertEqual(journal.load(), {'layout/base.html': {'mtime_ns': 1, 'size': 53}, 'assets/image.png': {}})
+        self.assertTrue(journal.is_completed('layout/base.html', mtime_ns=1, size=53))
+        self.assertTrue(journal.is_completed('assets/image.png'))
+
+    def test_is_completed_with_changed_state_should_return_false(self):
+        self.journal.record('layout/base.html', mtime_ns=1, size=53)
+
+        self.assertFalse(self.journal.is_completed('layout/base.html', mtime_ns=2, size=53))
+        self.assertFalse(self.journal.is_completed('layout/home.html'))
+
+    def test_load_should_ignore_line_cut_by_interrupted_write(self):
+        self.journal.record('layout/base.html')
+        self.journal.close()
+        with open(self.path, 'a', encoding='utf-8') as journal_file:
+            journal_file.write('{"name": "layout/ho')
+
+        self.assertEqual(Journal(self.path).load(), {'layout/base.html': {}})
+
+    def test_clear_should_remove_journal_file(self):
+        self.journal.record('layout/base.html')
+        self.journal.clear()
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.journal.completed, {})
+        self.assertEqual(Journal(self.path).load(), {})
@@ -0,0 +1,141 @@
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from ntk.gateway import Gateway
+from ntk.ntk_parser import Parser
+from ntk.objects import ObjectStore
+
+
+class TestLocalStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.root = os.path.join(self.tmp_dir.name, 'mirror')
+        self.gateway = Gateway(Path(self.root).as_uri(), None)
+
+    def test_create_theme_should_be_listed_by_get_themes(self):
+        response = self.gateway.create_theme(name='Staging')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'id': 1, 'name': 'Staging', 'active': False})
+        # a theme copied into the mirror by hand
+        os.makedirs(os.path.join(self.root, '7'))
+        self.assertEqual(self.gateway.get_themes().json()['results'], [
+            {'id': 1, 'name': 'Staging', 'active': False}, {'id': 7, 'name': 'Theme 7', 'active': False}])
+
+    def test_templates_should_be_written_listed_and_deleted_on_disk(self):
+        self.gateway.create_or_update_template(theme_id=5, template_name='layouts/base.html', content='<html>')
+        self.gateway.create_or_update_template(
+            theme_id=5, template_name='assets/logo.png', files={'file': ('assets/logo.png', io.BytesIO(b'\x89PNG'))})
+
+        logo_path = os.path.join(self.root, '5', 'assets', 'logo.png')
+        self.assertEqual(self.gateway.get_templates(theme_id=5).json(), [
+            {'theme': 5, 'name': 'assets/logo.png', 'content': '', 'file': Path(logo_path).as_uri()},
+            {'theme': 5, 'name': 'layouts/base.html', 'content': '<html>', 'file': None},
+        ])
+        self.assertEqual(
+            self.gateway.get_template(theme_id=5, template_name='layouts/base.html').json()['content'], '<html>')
+
+        self.assertEqual(self.gateway.delete_template(theme_id=5, template_name='layouts/base.html').status_code, 204)
+        self.assertEqual(self.gateway.delete_template(theme_id=5, template_name='layouts/base.html').status_code, 404)
+        self.assertEqual(self.gateway.get_template(theme_id=5, template_name='layouts/base.html').status_code, 404)
+
+    def test_template_name_should_not_leave_directory_of_theme(self):
+        response = self.gateway.create_or_update_template(theme_id=5, template_name='../6/base.html', content='x')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(os.path.exists(os.path.join(self.root, '6')))
+
+    def test_media_file_should_be_downloaded_conditionally(self):
+        self.gateway.create_or_update_template(
+            theme_id=5, template_name='assets/logo.png', files={'file': ('assets/logo.png', b'\x89PNG')})
+        url = self.gateway.get_templates(theme_id=5).json()[0]['file']
+
+        response = self.gateway._request('GET', url)
+        self.assertEqual(response.content, b'\x89PNG')
+        response = self.gateway._request('GET', url, headers={'If-None-Match': response.headers['etag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.gateway._request('GET', Path(self.tmp_dir.name).as_uri()).status_code, 404)
+
+    def test_requests_should_be_recorded_like_http_requests(self):
+        self.assertTrue(self.gateway.is_reachable())
+        self.gateway.create_or_update_template(theme_id=5, template_name='layouts/base.html', content='<html>')
+
+        metrics = self.gateway.metrics.to_dict()
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['bytes_sent'], 6)
+        self.assertEqual(metrics['endpoints']['POST /api/admin/themes/{id}/templates/']['count'], 1)
+
+    def test_push_status_and_pull_should_run_against_directory(self):
+        theme_dir = os.path.join(self.tmp_dir.name, 'theme')
+        os.makedirs(os.path.join(theme_dir, 'layouts'))
+        os.makedirs(os.path.join(theme_dir, 'assets'))
+        with open(os.path.join(theme_dir, 'layouts', 'base.html'), 'w') as template_file:
+            template_file.write('{% block content %}{% endblock %}')
+        with open(os.path.join(theme_dir, 'assets', 'logo.png'), 'wb') as media_file:
+            media_file.write(b'\x89PNG')
+        cwd = os.getcwd()
+        os.chdir(theme_dir)
+        self.addCleanup(os.chdir, cwd)
+
+        def run(*args):
+            ntk_parser = Parser()
+            ntk_parser.command.object_store = ObjectStore(directory=os.path.join(self.tmp_dir.name, 'objects'))
+            # no --apikey, a local directory needs none
+            args = ntk_parser.create_parser().parse_args(
+                [*args, '--store', Path(self.root).as_uri(), '--theme_id', '3'])
+            with self.assertLogs(level='INFO') as cm:
+                args.func(args)
+            return cm.output
+
+        run('push')
+        self.assertTrue(os.path.exists(os.path.join(self.root, '3', 'assets', 'logo.png')))
+        self.assertEqual(
+            run('status')[-1],
+            'INFO:root:[development] 0 added, 0 modified, 0 deleted, 1 unverified, 1 unchanged, 4 B to upload')
+
+        os.remove('layouts/base.html')
+        os.remove('assets/logo.png')
+        run('pull')
+        with open('layouts/base.html') as template_file:
+            self.assertEqual(template_file.read(), '{% block content %}{% endblock %}')
+        with open('assets/logo.png', 'rb') as media_file:
+            self.assertEqual(media_file.read(), b'\x89PNG')
+
+    def test_push_to_several_environments_should_prune_and_dry_run_each_of_them(self):
+        theme_dir = os.path.join(self.tmp_dir.name, 'theme')
+        os.makedirs(os.path.join(theme_dir, 'layouts'))
+        with open(os.path.join(theme_dir, 'layouts', 'base.html'), 'w') as template_file:
+            template_file.write('{% block content %}{% endblock %}')
+        roots = {env: os.path.join(self.tmp_dir.name, env) for env in ['staging', 'production']}
+        with open(os.path.join(theme_dir, 'config.yml'), 'w') as config_file:
+            for env, root in roots.items():
+                config_file.write(f'{env}:\n  store: {Path(root).as_uri()}\n  theme_id: 1\n')
+        for root in roots.values():
+            Gateway(Path(root).as_uri(), None).create_or_update_template(
+                theme_id=1, template_name='layouts/old.html', content='old')
+        cwd = os.getcwd()
+        os.chdir(theme_dir)
+        self.addCleanup(os.chdir, cwd)
+        # the path of config.yml is resolved when ntk.conf is imported
+        config_patcher = patch('ntk.conf.CONFIG_FILE', os.path.join(theme_dir, 'config.yml'))
+        config_patcher.start()
+        self.addCleanup(config_patcher.stop)
+
+        def run(*args):
+            ntk_parser = Parser()
+            args = ntk_parser.create_parser().parse_args(['push', '-e', 'staging,production', '--prune', *args])
+            with self.assertLogs(level='INFO'):
+                return args.func(args)
+
+        self.assertEqual(run('--dry_run'), 0)
+        for root in roots.values():
+            self.assertEqual(os.listdir(os.path.join(root, '1', 'layouts')), ['old.html'])
+
+        self.assertEqual(run(), 0)
+        for root in roots.values():
+            self.assertEqual(os.listdir(os.path.join(root, '1', 'layouts')), ['base.html'])
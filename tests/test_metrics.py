@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from ntk.metrics import get_endpoint, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def _response(self, ok=True, body=b'', content=b''):
+        response = MagicMock(ok=ok, content=content)
+        response.request.body = body
+        return response
+
+    def test_get_endpoint_should_group_theme_ids_and_media_files(self):
+        self.assertEqual(
+            get_endpoint('POST', 'http://simple.com/api/admin/themes/5/templates/'),
+            'POST /api/admin/themes/{id}/templates/')
+        self.assertEqual(
+            get_endpoint('GET', 'http://simple.com/api/admin/themes/5/templates/?name=assets/base.css'),
+            'GET /api/admin/themes/{id}/templates/')
+        self.assertEqual(
+            get_endpoint('GET', 'https://d36qje162qkq4w.cloudfront.net/media/sandbox/themes/5/assets/image.png'),
+            'GET d36qje162qkq4w.cloudfront.net/*')
+
+    def test_record_request_should_count_bytes_latency_and_network_time(self):
+        url = 'http://simple.com/api/admin/themes/5/templates/'
+        self.metrics.record_request('POST', url, self._response(body='name=a', content=b'{}'), 0.04)
+        self.metrics.record_request('POST', url, self._response(body=b'12345', content=b'{"a":1}'), 0.3)
+        self.metrics.record_request('POST', url, self._response(ok=False), 7, throttled=True)
+        self.metrics.record_retry()
+
+        result = self.metrics.to_dict()
+        self.assertEqual(result['requests'], 3)
+        self.assertEqual(result['retries'], 1)
+        self.assertEqual(result['throttled'], 1)
+        self.assertEqual(result['bytes_sent'], 11)
+        self.assertEqual(result['bytes_received'], 9)
+        self.assertEqual(result['phases']['network'], 7.34)
+
+        endpoint = result['endpoints']['POST /api/admin/themes/{id}/templates/']
+        self.assertEqual(endpoint['count'], 3)
+        self.assertEqual(endpoint['errors'], 1)
+        self.assertEqual(endpoint['max_ms'], 7000)
+        self.assertEqual(endpoint['p50_ms'], 500)
+        self.assertEqual(endpoint['histogram'], {
+            'le_50ms': 1, 'le_100ms': 0, 'le_250ms': 0, 'le_500ms': 1, 'le_1000ms': 0, 'le_2500ms': 0,
+            'le_5000ms': 0, 'inf': 1
+        })
+
+    def test_timer_should_add_elapsed_time_to_phase(self):
+        with self.metrics.timer('sass'):
+            pass
+        with self.assertRaises(ValueError):
+            with self.metrics.timer('io'):
+                raise ValueError()
+
+        self.assertGreater(self.metrics.phases['sass'], 0)
+        self.assertGreater(self.metrics.phases['io'], 0)
+
+    def test_summary_should_return_human_readable_lines(self):
+        url = 'http://simple.com/api/admin/themes/5/templates/'
+        self.metrics.record_request('GET', url, self._response(content=b'x' * 2048), 0.12)
+
+        lines = self.metrics.summary()
+        self.assertRegex(
+            lines[0], r'^Finished in \d+\.\d\ds: 1 requests, 0 retries, 0 throttled, 0 B sent, 2\.0 KB received$')
+        self.assertEqual(lines[1], 'Time split: discovery 0.00s, sass 0.00s, io 0.00s, network 0.12s')
+        self.assertEqual(
+            lines[2],
+            'GET /api/admin/themes/{id}/templates/ 1 requests, 0 errors, avg 120ms, p50 <=250ms, p95 <=250ms, '
+            'max 120ms')
+
+    def test_save_should_write_json_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'ci', 'metrics.json')
+            self.metrics.save(path)
+            with open(path) as metrics_file:
+                result = json.load(metrics_file)
+
+        self.assertEqual(result['requests'], 0)
+        self.assertEqual(list(result['phases']), ['discovery', 'sass', 'io', 'network'])
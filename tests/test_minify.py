@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from ntk.minify import Minifier
+
+
+class TestMinifier(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.minifier = Minifier(cache_directory=os.path.join(self.tmp_dir.name, 'minify'))
+
+    def test_minify_json_should_remove_whitespaces_and_report_bytes_saved(self):
+        content = '{\n    "name": "café",\n    "items": [1, 2]\n}\n'
+
+        minified = self.minifier.minify('assets/data.json', content)
+
+        self.assertEqual(minified, '{"name":"café","items":[1,2]}')
+        report = self.minifier.report()
+        self.assertEqual(report, [
+            'Minified assets/data.json 45 B -> 30 B, saved 15 B (33%)',
+            'Minified 1 files (0 from cache), saved 15 B of 45 B',
+        ])
+        self.assertEqual(self.minifier.report(), [])
+
+    def test_minify_should_reuse_cached_output_of_unchanged_content(self):
+        sass = MagicMock()
+        sass.compile.return_value = 'a{color:red}\n'
+        content = 'a {\n  color: red;\n}\n'
+        with patch.dict(sys.modules, {'sass': sass}):
+            first = self.minifier.minify('assets/base.css', content)
+            second = Minifier(cache_directory=self.minifier.cache_directory).minify('assets/base.css', content)
+
+        self.assertEqual(first, 'a{color:red}\n')
+        self.assertEqual(second, first)
+        sass.compile.assert_called_once_with(string=content, output_style='compressed')
+
+    def test_minify_should_skip_files_outside_assets(self):
+        content = '{\n    "title": "Home"\n}'
+        self.assertEqual(self.minifier.minify('locales/en.json', content), content)
+        self.assertEqual(self.minifier.minify('assets/base.html', content), content)
+        self.assertEqual(self.minifier.results, [])
+
+    def test_minify_with_invalid_content_should_keep_content_as_written(self):
+        content = '{"name": '
+        with self.assertLogs(level='WARNING') as cm:
+            self.assertEqual(self.minifier.minify('assets/data.json', content), content)
+        self.assertRegex(cm.output[0], r'^WARNING:root:Minifying assets/data.json failed, uploading it as written -> ')
+
+    def test_minify_js_without_rjsmin_should_warn_once(self):
+        content = 'var a = 1;\n'
+        with patch.dict(sys.modules, {'rjsmin': None}):
+            with self.assertLogs(level='WARNING') as cm:
+                self.assertEqual(self.minifier.minify('assets/app.js', content), content)
+                self.assertEqual(self.minifier.minify('assets/main.js', content), content)
+        self.assertEqual(len(cm.output), 1)
+        self.assertRegex(cm.output[0], r'^WARNING:root:\.js files are uploaded as written, ')
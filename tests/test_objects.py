@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+
+from ntk.objects import INDEX_FILE, ObjectStore
+
+URL = 'https://cdn.29next.store/media/logo.png'
+
+
+class TestObjectStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.directory = os.path.join(self.tmp_dir.name, 'objects')
+        self.object_store = ObjectStore(directory=self.directory)
+
+    def _touch(self, url, mtime, object_store=None):
+        digest = (object_store or self.object_store)._load()[url]['digest']
+        path = os.path.join(self.directory, digest[:2], digest[2:])
+        os.utime(path, (mtime, mtime))
+
+    def test_add_should_keep_content_by_digest_with_validators(self):
+        digest = self.object_store.add(URL, b'\x89PNG', etag='"abc"', last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+
+        self.assertEqual(digest, hashlib.sha256(b'\x89PNG').hexdigest())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, digest[:2], digest[2:])))
+        self.assertEqual(self.object_store.read(URL), b'\x89PNG')
+        self.assertEqual(self.object_store.get_validators(URL), {
+            'If-None-Match': '"abc"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+    def test_get_validators_should_be_empty_for_unknown_or_evicted_url(self):
+        self.assertEqual(self.object_store.get_validators(URL), {})
+
+        digest = self.object_store.add(URL, b'\x89PNG', etag='"abc"')
+        os.remove(os.path.join(self.directory, digest[:2], digest[2:]))
+
+        self.assertEqual(self.object_store.get_validators(URL), {})
+
+    def test_same_content_should_be_stored_once(self):
+        self.object_store.add(URL, b'\x89PNG', etag='"abc"')
+        self.object_store.add('https://cdn.29next.store/media/copy.png', b'\x89PNG', etag='"abc"')
+
+        self.assertEqual(self.object_store.stats(), (1, 4))
+        self.assertEqual(self.object_store.added_size, 4)
+
+    def test_save_should_write_index_read_by_next_run(self):
+        self.object_store.add(URL, b'\x89PNG', etag='"abc"')
+        self.object_store.save()
+
+        with open(os.path.join(self.directory, INDEX_FILE), 'r') as index_file:
+            self.assertEqual(json.load(index_file)[URL]['etag'], '"abc"')
+        self.assertEqual(ObjectStore(directory=self.directory).read(URL), b'\x89PNG')
+
+    def test_gc_should_evict_least_recently_used_files_and_their_urls(self):
+        urls = [f'https://cdn.29next.store/media/{index}.png' for index in range(3)]
+        for index, url in enumerate(urls):
+            self.object_store.add(url, bytes([index]) * 10)
+        self._touch(urls[0], 3000)
+        self._touch(urls[1], 1000)
+        self._touch(urls[2], 2000)
+
+        with self.assertLogs(level='INFO') as log:
+            self.assertEqual(self.object_store.gc(max_size=15), (2, 20))
+
+        self.assertIn('Evicted 2 files (20 B)', log.output[0])
+        self.assertEqual(self.object_store.stats(), (1, 10))
+        with open(os.path.join(self.directory, INDEX_FILE), 'r') as index_file:
+            self.assertEqual(list(json.load(index_file)), [urls[0]])
+
+    def test_save_should_evict_when_store_outgrows_max_size(self):
+        object_store = ObjectStore(directory=self.directory, max_size=10)
+        object_store.add('https://cdn.29next.store/media/old.png', b'a' * 10)
+        self._touch('https://cdn.29next.store/media/old.png', 1000, object_store)
+        object_store.add(URL, b'b' * 10)
+
+        with self.assertLogs(level='INFO'):
+            object_store.save()
+
+        self.assertEqual(object_store.stats(), (1, 10))
+        self.assertEqual(object_store.read(URL), b'b' * 10)
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from ntk.offline import OfflineQueue
+
+
+class TestOfflineQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, '.ntk', 'watch_queue.jsonl')
+        self.queue = OfflineQueue(self.path)
+        self.addCleanup(self.queue.close)
+
+    def test_add_should_keep_last_action_of_each_template(self):
+        self.queue.add('upload', ['layout/base.html', 'assets/image.png'])
+        self.queue.add('upload', ['layout/base.html'])
+        self.queue.add('delete', ['assets/image.png'])
+
+        self.assertEqual(self.queue.pending, {'layout/base.html': 'upload', 'assets/image.png': 'delete'})
+        self.assertEqual(len(self.queue), 2)
+
+    def test_add_should_be_loaded_by_next_watch(self):
+        self.queue.add('delete', ['layout/base.html'])
+        self.queue.add('upload', ['layout/base.html', 'assets/image.png'])
+        self.queue.close()
+
+        self.assertEqual(
+            OfflineQueue(self.path).load(), {'layout/base.html': 'upload', 'assets/image.png': 'upload'})
+
+    def test_load_should_ignore_line_cut_by_interrupted_write(self):
+        self.queue.add('upload', ['layout/base.html'])
+        self.queue.close()
+        with open(self.path, 'a', encoding='utf-8') as queue_file:
+            queue_file.write('{"name": "layout/ho')
+
+        self.assertEqual(OfflineQueue(self.path).load(), {'layout/base.html': 'upload'})
+
+    def test_take_should_keep_file_until_save(self):
+        self.queue.add('upload', ['layout/base.html', 'assets/image.png'])
+
+        self.assertEqual(self.queue.take(), {'layout/base.html': 'upload', 'assets/image.png': 'upload'})
+        self.assertEqual(len(self.queue), 0)
+        # a crash during the flush replays the whole queue
+        self.assertEqual(len(OfflineQueue(self.path).load()), 2)
+
+        self.queue.add('upload', ['assets/image.png'])
+        self.queue.save()
+        self.assertEqual(OfflineQueue(self.path).load(), {'assets/image.png': 'upload'})
+
+        self.queue.take()
+        self.queue.save()
+        self.assertFalse(os.path.exists(self.path))
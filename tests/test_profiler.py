@@ -0,0 +1,59 @@
+import os
+import pstats
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from ntk.__main__ import run_command
+from ntk.profiler import profile
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp_dir.name, 'reports', 'push')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_profile_should_write_cprofile_stats_and_memory_report(self):
+        with self.assertLogs(level='INFO') as log:
+            with profile(self.output):
+                data = [str(i) * 10 for i in range(1000)]  # noqa
+
+        stats = pstats.Stats(f'{self.output}.prof')
+        self.assertTrue(stats.total_calls > 0)
+
+        with open(f'{self.output}.memory.txt') as report_file:
+            report = report_file.read()
+        self.assertTrue(report.startswith('Top 25 allocations'))
+        self.assertIn('test_profiler.py', report)
+
+        self.assertEqual(log.output, [
+            f'INFO:root:Profile stats written to {self.output}.prof',
+            f'INFO:root:Memory allocations report written to {self.output}.memory.txt',
+        ])
+
+    def test_profile_should_write_reports_when_command_raises_error(self):
+        with self.assertRaises(TypeError):
+            with self.assertLogs(level='INFO'):
+                with profile(self.output):
+                    raise TypeError('[development] argument -t/--theme_id is required.')
+
+        self.assertTrue(os.path.exists(f'{self.output}.prof'))
+        self.assertTrue(os.path.exists(f'{self.output}.memory.txt'))
+
+    def test_run_command_with_profile_should_wrap_dispatched_command(self):
+        args = MagicMock(profile=True, profile_output=self.output)
+        with self.assertLogs(level='INFO'):
+            run_command(args)
+
+        args.func.assert_called_once_with(args)
+        self.assertTrue(os.path.exists(f'{self.output}.prof'))
+
+    def test_run_command_without_profile_should_not_write_reports(self):
+        args = MagicMock(profile=False, profile_output=self.output)
+        run_command(args)
+
+        args.func.assert_called_once_with(args)
+        self.assertFalse(os.path.exists(f'{self.output}.prof'))
@@ -0,0 +1,77 @@
+import io
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from ntk.progress import Progress, progress_bar
+
+
+class TtyStream(io.StringIO):
+    def isatty(self):
+        return True
+
+
+class TestProgress(unittest.TestCase):
+    def test_progress_on_terminal_should_redraw_at_capped_rate(self):
+        stream = TtyStream()
+        with patch('ntk.progress.time.monotonic', side_effect=[0, 0, 0.01, 0.02, 0.5, 0.6, 0.7]):
+            progress = Progress(3, prefix='[development] Progress:', suffix='Complete', length=10, stream=stream)
+            progress.start()    # drawn at once
+            progress.advance()  # skipped, 0.01s after the last draw
+            progress.advance()  # skipped
+            progress.advance()  # drawn
+            progress.close()
+
+        lines = stream.getvalue().split('\r')[1:]
+        self.assertEqual(len(lines), 3)
+        self.assertRegex(lines[0], r'\[development\] Progress: \|-{10}\| 0\.0% Complete \(0/3 files, 1 in flight\)')
+        self.assertRegex(lines[1], r'\|█{10}\| 100\.0% Complete \(3/3 files\)')
+        self.assertTrue(stream.getvalue().endswith('\n'))
+
+    def test_progress_without_terminal_should_print_periodic_summary_lines(self):
+        stream = io.StringIO()
+        metrics = MagicMock(bytes_sent=0, bytes_received=0)
+        with patch('ntk.progress.time.monotonic', side_effect=[0, 1, 11, 12, 12]):
+            progress = Progress(4, prefix='[development] Progress:', suffix='Complete', stream=stream, metrics=metrics)
+            metrics.bytes_sent = 2048
+            progress.advance()  # skipped, the first summary line comes after 10s
+            progress.advance()  # printed
+            progress.advance()  # skipped
+            progress.close()
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertNotIn('\r', stream.getvalue())
+        self.assertRegex(
+            lines[0], r'INFO \[development\] Progress: 50\.0% Complete \(2/4 files, 2\.0 KB at 186 B/s, ETA 11s\)$')
+        self.assertRegex(lines[1], r'75\.0% Complete \(3/4 files, 2\.0 KB at 171 B/s, ETA 4s\)$')
+
+    def test_progress_should_count_updates_of_several_workers(self):
+        stream = io.StringIO()
+        progress = Progress(stream=stream)
+
+        def work():
+            progress.add_total(100)
+            for _ in range(100):
+                progress.start()
+                progress.advance()
+
+        workers = [threading.Thread(target=work) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        progress.close()
+
+        self.assertEqual((progress.total, progress.completed, progress.in_flight), (800, 800, 0))
+        self.assertRegex(stream.getvalue(), r'100\.0%  \(800/800 files\)\n$')
+
+    def test_progress_bar_without_items_should_not_print(self):
+        stream = io.StringIO()
+        self.assertEqual(list(progress_bar([], stream=stream)), [])
+        self.assertEqual(stream.getvalue(), '')
+
+    def test_progress_bar_should_yield_every_item(self):
+        stream = io.StringIO()
+        self.assertEqual(list(progress_bar(['a', 'b'], stream=stream)), ['a', 'b'])
+        self.assertRegex(stream.getvalue(), r'100\.0%  \(2/2 files\)\n$')
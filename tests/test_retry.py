@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import call, MagicMock, patch
+
+from ntk.retry import RetryQueue
+
+
+@patch("ntk.retry.time.sleep", autospec=True)
+class TestRetryQueue(unittest.TestCase):
+    def setUp(self):
+        self.retry_queue = RetryQueue(attempts=3, backoff=1)
+
+    def test_retry_should_remove_succeeded_templates_with_exponential_backoff(self, mock_sleep):
+        self.retry_queue.add('upload', 'layout/base.html', 'status 500')
+        self.retry_queue.add('delete', 'layout/home.html', 'status 502')
+        upload = MagicMock(side_effect=['status 500', None])
+        delete = MagicMock(return_value=None)
+
+        self.assertTrue(self.retry_queue.retry({'upload': upload, 'delete': delete}))
+
+        self.assertEqual(mock_sleep.mock_calls, [call(1), call(2)])
+        self.assertEqual(upload.mock_calls, [call('layout/base.html'), call('layout/base.html')])
+        delete.assert_called_once_with('layout/home.html')
+        self.assertEqual(self.retry_queue.failures, {})
+
+    def test_retry_should_keep_reason_of_last_failure(self, mock_sleep):
+        self.retry_queue.add('upload', 'layout/base.html', 'status 500')
+        upload = MagicMock(side_effect=['status 502', ConnectionError('Connection aborted.'), 'status 400'])
+
+        self.assertFalse(self.retry_queue.retry({'upload': upload}))
+
+        self.assertEqual(upload.call_count, 3)
+        self.assertEqual(mock_sleep.mock_calls, [call(1), call(2), call(4)])
+        self.assertEqual(self.retry_queue.failures, {('upload', 'layout/base.html'): 'status 400'})
+
+    def test_retry_without_failures_should_not_wait(self, mock_sleep):
+        self.assertTrue(self.retry_queue.retry({}))
+        mock_sleep.assert_not_called()
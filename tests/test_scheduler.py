@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from ntk.scheduler import get_upload_priority, PRIORITY_ASSETS, PRIORITY_MEDIA, PRIORITY_TEMPLATES, schedule_uploads
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        self.sizes = {
+            'assets/video.mp4': 5000,
+            'assets/logo.png': 300,
+            'assets/main.css': 800,
+            'assets/app.js': 200,
+            'sass/main.scss': 400,
+            'layouts/base.html': 100,
+            'templates/index.html': 50,
+        }
+        for template_name, size in self.sizes.items():
+            os.makedirs(os.path.dirname(template_name), exist_ok=True)
+            with open(template_name, 'wb') as template_file:
+                template_file.write(b'x' * size)
+        self.template_names = [os.path.abspath(template_name) for template_name in self.sizes]
+
+    def test_get_upload_priority(self):
+        self.assertEqual(get_upload_priority('layouts/base.html'), PRIORITY_TEMPLATES)
+        self.assertEqual(get_upload_priority('locales/en.json'), PRIORITY_TEMPLATES)
+        self.assertEqual(get_upload_priority('assets/main.css'), PRIORITY_ASSETS)
+        self.assertEqual(get_upload_priority('sass/main.scss'), PRIORITY_ASSETS)
+        self.assertEqual(get_upload_priority('assets/logo.png'), PRIORITY_MEDIA)
+
+    def test_schedule_uploads_should_upload_smallest_files_first_in_each_priority(self):
+        self.assertEqual(schedule_uploads(self.template_names), [os.path.abspath(template_name) for template_name in [
+            'templates/index.html', 'layouts/base.html',
+            'assets/app.js', 'sass/main.scss', 'assets/main.css',
+            'assets/logo.png', 'assets/video.mp4',
+        ]])
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# heavy dependencies which must only be imported by the subcommands that need them
+LAZY_MODULES = ['asyncio', 'requests', 'sass', 'watchfiles', 'yaml']
+
+# generous budget for `ntk --help` on top of the bare interpreter startup, catches eager heavy imports
+STARTUP_OVERHEAD_BUDGET = 0.25
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _run(self, *args):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, *args], cwd=self.tmp_dir.name, env=self.env, capture_output=True, text=True)
+        return result, time.perf_counter() - start
+
+    def test_help_should_not_import_heavy_dependencies(self):
+        script = (
+            'import sys\n'
+            'from ntk.__main__ import main\n'
+            'sys.argv = ["ntk", "-h"]\n'
+            'try:\n'
+            '    main()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            f'print(",".join(name for name in {LAZY_MODULES!r} if name in sys.modules), file=sys.stderr)\n'
+        )
+        result, _ = self._run('-c', script)
+
+        self.assertIn('available commands:', result.stdout)
+        self.assertEqual(result.stderr.strip(), '')
+
+    def test_help_should_start_quickly(self):
+        # best of three runs to smooth out a busy machine
+        baseline = min(self._run('-c', 'pass')[1] for _ in range(3))
+        startup = min(self._run('-m', 'ntk', '-h')[1] for _ in range(3))
+
+        self.assertLess(
+            startup - baseline, STARTUP_OVERHEAD_BUDGET,
+            f'ntk --help took {startup:.3f}s, python alone {baseline:.3f}s')
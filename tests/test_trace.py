@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from ntk.metrics import Metrics
+from ntk.trace import Tracer
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+
+    def test_span_should_record_complete_event_with_args(self):
+        with self.tracer.span('read', 'io', template='layouts/base.html', size=None):
+            pass
+
+        self.assertEqual(len(self.tracer.events), 1)
+        event = self.tracer.events[0]
+        self.assertEqual(event['name'], 'read')
+        self.assertEqual(event['cat'], 'io')
+        self.assertEqual(event['ph'], 'X')
+        self.assertEqual(event['tid'], threading.get_ident())
+        self.assertEqual(event['args'], {'template': 'layouts/base.html'})
+        self.assertGreaterEqual(event['dur'], 0)
+
+    def test_metrics_with_tracer_should_record_timers_and_requests_as_spans(self):
+        metrics = Metrics(tracer=self.tracer)
+        with metrics.timer('io', 'write', template='assets/base.css'):
+            pass
+        response = MagicMock(ok=True, status_code=200, content=b'{}')
+        metrics.record_request(
+            'GET', 'http://simple.com/api/admin/themes/5/templates/?name=assets/base.css', response, 0.1)
+
+        names = [(event['cat'], event['name'], event['args']['template']) for event in self.tracer.events]
+        self.assertEqual(names, [
+            ('io', 'write', 'assets/base.css'),
+            ('network', 'GET /api/admin/themes/{id}/templates/', 'assets/base.css'),
+        ])
+        self.assertEqual(self.tracer.events[1]['args']['status'], 200)
+
+    def test_save_should_write_trace_event_json_with_thread_names(self):
+        with self.tracer.span('compile', 'sass'):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'trace.json')
+            self.tracer.save(path)
+            with open(path) as trace_file:
+                result = json.load(trace_file)
+
+        self.assertEqual(result['traceEvents'][0], {
+            'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': threading.get_ident(),
+            'args': {'name': threading.current_thread().name}
+        })
+        self.assertEqual(result['traceEvents'][1]['name'], 'compile')
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ntk.validation import validate_files, validate_json, validate_template
+
+
+class TestValidation(unittest.TestCase):
+    def test_validate_json_should_return_position_of_error(self):
+        self.assertIsNone(validate_json('{"title": "Home"}'))
+        self.assertEqual(
+            validate_json('{"title": "Home",\n}'),
+            'Expecting property name enclosed in double quotes: line 2 column 1 (char 18)')
+
+    def test_validate_template_with_balanced_tags_should_return_none(self):
+        content = '''{% extends "layouts/base.html" %}{% load i18n %}
+{% block content %}
+  {% for product in products %}{{ product.name }}{% empty %}{% trans "No products" %}{% endfor %}
+  {% if user %}{% elif guest %}{% else %}{% endif %}
+  {% comment %}{% if draft %}{% endcomment %}
+  {% verbatim %}{% endif %}{% endverbatim %}
+{% endblock %}'''
+        self.assertIsNone(validate_template(content))
+
+    def test_validate_template_should_ignore_tags_in_comments(self):
+        self.assertIsNone(validate_template('{# {% if x %} old #}\n<p>hi</p>'))
+        self.assertIsNone(validate_template('{% comment "old" %}\n{% for item in items %}\n{% endcomment %}'))
+        # the lines of the tags after a comment don't change
+        self.assertEqual(
+            validate_template('{% comment %}\n{% if x %}\n{% endcomment %}{# {% endif %} #}\n{% endif %}'),
+            'Unexpected {% endif %} on line 4')
+        self.assertEqual(validate_template('{% comment %}\n{% if x %}'), 'Unclosed {% comment %} on line 1')
+
+    def test_validate_template_with_unbalanced_tags_should_return_line_of_error(self):
+        self.assertEqual(
+            validate_template('{% block content %}\n{% if user %}\n{% endblock %}'),
+            'Unexpected {% endblock %} on line 3, expected {% endif %}')
+        self.assertEqual(
+            validate_template('{% for item in items %}\n{{ item }}'), 'Unclosed {% for %} on line 1')
+        self.assertEqual(validate_template('<p>\n{% endif %}'), 'Unexpected {% endif %} on line 2')
+        self.assertEqual(
+            validate_template('{% block a %}{% empty %}{% endblock %}'), 'Unexpected {% empty %} on line 1')
+        self.assertEqual(validate_template('{% load i18n %}{%  %}'), 'Empty tag on line 1')
+
+    def test_validate_files_should_report_every_invalid_file(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        files = {
+            'configs/settings.json': '{"color": "red"}',
+            'locales/en.json': '{"home": "Home"',
+            'templates/index.html': '{% if user %}',
+            'layouts/base.html': '{% block content %}{% endblock %}',
+            'assets/theme.css': '{% if %}',
+        }
+        for template_name, content in files.items():
+            pathfile = os.path.join(tmp_dir.name, template_name)
+            os.makedirs(os.path.dirname(pathfile), exist_ok=True)
+            with open(pathfile, 'w') as template_file:
+                template_file.write(content)
+        template_names = [os.path.join(tmp_dir.name, template_name) for template_name in files]
+        expected = {
+            os.path.join(tmp_dir.name, 'locales/en.json'): "Expecting ',' delimiter: line 1 column 16 (char 15)",
+            os.path.join(tmp_dir.name, 'templates/index.html'): 'Unclosed {% if %} on line 1',
+        }
+
+        self.assertEqual(validate_files(template_names), expected)
+        # large pushes are validated in a process pool
+        with patch('ntk.validation.POOL_THRESHOLD', 1), patch('ntk.validation.CHUNK_SIZE', 2):
+            self.assertEqual(validate_files(template_names, workers=2), expected)